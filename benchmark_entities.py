@@ -0,0 +1,130 @@
+"""
+Memory and throughput benchmark for the game's entity classes.
+
+Compares the __slots__ entity classes in game.py against dict-backed copies of the
+same classes (what they were before __slots__ was added):
+
+- memory: objects built from the largest levels, loaded many times over
+- throughput: HeadlessGame steps on the largest levels, after a warm-up pass, with the two
+  sets of classes taking turns over several repeats (the median run is reported)
+
+Run with:  python3 benchmark_entities.py
+"""
+
+import os
+import statistics
+import time
+import tracemalloc
+
+# No window or audio needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import game
+
+ENTITY_CLASSES = ["Player", "Platform", "Coin", "Spike", "Goal", "LevelPortal"]
+LEVEL_COPIES = 2000       # How many times to build the largest levels for the memory test
+STEPS_PER_LEVEL = 3000    # HeadlessGame steps per level for the throughput test
+THROUGHPUT_REPEATS = 7    # Timed throughput runs of each set of classes, alternating
+NUM_LARGEST_LEVELS = 3
+
+def make_dict_class(cls):
+    """Copy of a __slots__ class with a normal per-instance __dict__ instead"""
+    namespace = {name: value for name, value in cls.__dict__.items()
+                 if name not in cls.__slots__ and name not in ("__slots__", "__dict__", "__weakref__")}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+def use_classes(classes):
+    """Point game.py's module globals at the given entity classes"""
+    for name, cls in classes.items():
+        setattr(game, name, cls)
+
+def find_largest_levels(level_manager):
+    """(world, level) of the levels with the most platforms, coins and spikes"""
+    sizes = []
+    for info in level_manager.available_levels:
+        level_manager.current_world = info['world']
+        level_manager.current_level = info['level']
+        platforms, coins, _, spikes = level_manager.get_level()
+        sizes.append((len(platforms) + len(coins) + len(spikes), info['world'], info['level']))
+    sizes.sort(reverse=True)
+    return [(world, level) for _, world, level in sizes[:NUM_LARGEST_LEVELS]]
+
+def load_level_data(level_manager, levels):
+    """The JSON data of each level"""
+    level_data = []
+    for world, level in levels:
+        level_manager.current_world = world
+        level_manager.current_level = level
+        level_manager.get_level()
+        level_data.append(level_manager.get_current_level_data())
+    return level_data
+
+def measure_memory(level_data):
+    """Bytes allocated while building LEVEL_COPIES copies of each level's entities"""
+    tracemalloc.start()
+    kept = []
+    for _ in range(LEVEL_COPIES):
+        for data in level_data:
+            kept.append([game.Platform(p['x'], p['y'], p['width'], p['height']) for p in data.get('platforms', [])])
+            kept.append([game.Coin(c['x'], c['y']) for c in data.get('coins', [])])
+            kept.append([game.Spike(s['x'], s['y'], s.get('width', 30), s.get('height', 15)) for s in data.get('spikes', [])])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    objects = sum(len(group) for group in kept)
+    return current, objects
+
+def measure_steps(level_manager, levels):
+    """HeadlessGame steps per second with both players running right and jumping"""
+    inputs = {pygame.K_d, pygame.K_w, pygame.K_RIGHT, pygame.K_UP}
+    steps = 0
+    start = time.perf_counter()
+    for world, level in levels:
+        headless = game.HeadlessGame(world, level, level_manager=level_manager)
+        for _ in range(STEPS_PER_LEVEL):
+            headless.step(inputs)
+            steps += 1
+    return steps / (time.perf_counter() - start)
+
+def compare_steps(level_manager, levels, class_sets):
+    """Median steps/s of each set of classes; the sets take turns so drift hits both alike"""
+    for classes in class_sets.values():  # Warm-up: level caches, sprite and sound setup, CPU clocks
+        use_classes(classes)
+        measure_steps(level_manager, levels)
+    runs = {label: [] for label in class_sets}
+    for _ in range(THROUGHPUT_REPEATS):
+        for label, classes in class_sets.items():
+            use_classes(classes)
+            runs[label].append(measure_steps(level_manager, levels))
+    return {label: statistics.median(steps) for label, steps in runs.items()}
+
+def main():
+    pygame.font.init()
+    slotted = {name: getattr(game, name) for name in ENTITY_CLASSES}
+    dict_backed = {name: make_dict_class(cls) for name, cls in slotted.items()}
+
+    level_manager = game.LevelManager()
+    levels = find_largest_levels(level_manager)
+    level_data = load_level_data(level_manager, levels)
+    print(f"Largest levels: {', '.join(f'{world}-{level}' for world, level in levels)}")
+
+    class_sets = {"dict": dict_backed, "__slots__": slotted}
+    memory = {}
+    for label, classes in class_sets.items():
+        use_classes(classes)
+        memory[label] = measure_memory(level_data)
+    steps = compare_steps(level_manager, levels, class_sets)
+    use_classes(slotted)
+    results = {label: memory[label] + (steps[label],) for label in class_sets}
+
+    print(f"{'':12}{'memory':>12}{'bytes/obj':>12}{'steps/s':>12}")
+    for label, (memory, objects, steps_per_second) in results.items():
+        print(f"{label:12}{memory / 1024 / 1024:>10.1f}MB{memory / objects:>12.0f}{steps_per_second:>12.0f}")
+
+    old, new = results["dict"], results["__slots__"]
+    print(f"\n__slots__ uses {100 * (1 - new[0] / old[0]):.0f}% less memory, "
+          f"steps {new[2] / old[2]:.2f}x as fast (median of {THROUGHPUT_REPEATS} runs)")
+
+if __name__ == "__main__":
+    main()
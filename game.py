@@ -4,38 +4,34 @@ import math
 import random
 import json
 import os
+import zlib
+from collections import OrderedDict, deque
+from text_cache import text_cache
+from screen_effects import screen_effects
+from logical_display import logical_display
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()  # Initialize the mixer for sound playback
+try:
+    import numpy  # Optional: sound synthesis and BatchPhysics
+except ImportError:
+    numpy = None
+
+# Initialize Pygame fonts. The window and the mixer are only started by main(), so
+# importing this module (e.g. for HeadlessGame) never opens a display or audio device.
+pygame.font.init()
 
-# Set up the display
-infoObject = pygame.display.Info()
-SCREEN_WIDTH = infoObject.current_w
-SCREEN_HEIGHT = infoObject.current_h
+# Screen size - the game is drawn at this size (see LOGICAL_RESOLUTION)
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+screen = None  # Created by setup_display()
 
 # You can switch between fullscreen and windowed mode
 FULLSCREEN = False  # Changed to False to use windowed mode
 
-if FULLSCREEN:
-    try:
-        # Try fullscreen first
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-        print(f"Fullscreen mode: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
-    except pygame.error as e:
-        print(f"Fullscreen failed: {e}")
-        print("Falling back to windowed mode...")
-        FULLSCREEN = False
-        SCREEN_WIDTH = 1280
-        SCREEN_HEIGHT = 720
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-else:
-    SCREEN_WIDTH = 1280
-    SCREEN_HEIGHT = 720
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-
-print(f"Display mode: {'Fullscreen' if FULLSCREEN else 'Windowed'} - {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
-pygame.display.set_caption("Classroom Platformer")
+# Always draw at SCREEN_WIDTH x SCREEN_HEIGHT and scale the finished frame to the window or
+# monitor, with black bars if its shape differs. False draws at the monitor's resolution
+# in fullscreen instead (much more to fill on big displays, and levels no longer fit it).
+LOGICAL_RESOLUTION = True
+RENDER_SCALE_MODE = "fit"  # "fit", "integer" (sharp whole-number scaling) or "smooth" (see logical_display.py)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -49,10 +45,35 @@ GRAY = (128, 128, 128)
 BROWN = (139, 69, 19)
 EXPLOSION_COLORS = [(255, 0, 0), (255, 128, 0), (255, 255, 0), (255, 255, 255)]  # Red, Orange, Yellow, White
 
+# Players
+NUM_PLAYERS = 2  # How many players join the game
+PLAYER_COLORS = [BLUE, RED, GREEN, YELLOW, PURPLE, (255, 150, 50), (100, 255, 255), (255, 105, 180)]
+# Keyboard controls as (left, right, jump) by player number; players without an entry
+# get no keyboard input (e.g. bots driven through HeadlessGame)
+PLAYER_CONTROLS = {
+    1: (pygame.K_a, pygame.K_d, pygame.K_w),
+    2: (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP),
+    3: (pygame.K_j, pygame.K_l, pygame.K_i),
+    4: (pygame.K_KP4, pygame.K_KP6, pygame.K_KP8),
+}
+PLAYER_SWEEP_MARGIN = 20  # Players closer than this on x are tested against each other
+# Players that must stand on the goal (or a level select portal) together: everyone when
+# no more are playing. Only a few 40x40 players fit on a goal at once, so a class can't
+# all gather there.
+GOAL_PLAYERS_NEEDED = 2
+SPAWN_STACK_ROWS = 3  # Extra players stack at most this many deep around a level spawn before going higher
+
 # Clock for controlling frame rate
 clock = pygame.time.Clock()
 FPS = 60
 
+# Fixed-timestep simulation: physics always advances in steps of PHYSICS_DT seconds
+PHYSICS_HZ = 60
+PHYSICS_DT = 1.0 / PHYSICS_HZ
+MAX_PHYSICS_STEPS = 5  # Most physics steps to run in one rendered frame when catching up
+INTERPOLATION_SNAP_DISTANCE = 100  # Moves larger than this (respawns, teleports) are not smoothed
+DIRTY_RECT_RENDERING = False  # Only send the regions that changed to the window (see DirtyRegions)
+
 # Fonts
 font_large = pygame.font.Font(None, 72)
 font_medium = pygame.font.Font(None, 36)
@@ -64,88 +85,127 @@ JUMP_STRENGTH = -15
 MOVE_SPEED = 5
 FRICTION = 0.9
 
-# Synthesized sound generation functions
+# Deterministic mode: velocities are integers in 1/FIXED_POINT_SCALE pixels per step and all
+# randomness comes from one seeded session RNG, so a run depends only on its seed and inputs
+# (input-only replays, lockstep networking)
+FIXED_POINT_SCALE = 1000
+DETERMINISTIC_PHYSICS = False  # Use fixed-point physics in main() too
+SESSION_SEED = None  # Seed for the session RNG in main() (None picks a random one)
+
+# Broad-phase collision grid
+GRID_CELL_SIZE = 128  # Size of one spatial hash cell in pixels
+LOG_COLLIDER_COALESCING = False  # Print how many platforms each level load merged into colliders
+PARTICLE_POOL_SIZE = 2048  # Explosion particles alive at once, shared by every player
+
+# Adaptive quality: main() turns effects down while frames take longer than the frame budget
+# (1 / FPS) and back up when there's time to spare (see QualityGovernor)
+ADAPTIVE_QUALITY = True
+QUALITY_WINDOW = 30  # Frames in the rolling average of frame times
+SHOW_QUALITY_OVERLAY = False  # Show frame times and effect levels (toggle with F3)
+# Effect settings from full quality down: share of explosion particles, share of stars
+# drawn, spinning coins, and the white flash when a player explodes
+QUALITY_LEVELS = [
+    {'particles': 1.0, 'stars': 1.0, 'coin_spin': True, 'flash': True},
+    {'particles': 0.5, 'stars': 1.0, 'coin_spin': True, 'flash': True},
+    {'particles': 0.5, 'stars': 0.5, 'coin_spin': True, 'flash': True},
+    {'particles': 0.25, 'stars': 0.5, 'coin_spin': False, 'flash': True},
+    {'particles': 0.25, 'stars': 0.25, 'coin_spin': False, 'flash': False},
+]
+
+# Synthesized sound generation functions. Each sound is worked out for all of its samples
+# at once, as NumPy arrays over the sample times t; the arithmetic is done in the same
+# order as the one-sample-at-a-time formulas it replaced, so the samples come out the same.
+def make_stereo_sound(wave):
+    """A pygame Sound playing wave (floats) on both channels, each sample cut to an int like int() does"""
+    samples = wave.astype(numpy.int16)
+    return pygame.sndarray.make_sound(numpy.column_stack((samples, samples)))
+
+def note_schedule(melody, t):
+    """
+    For melody, a list of (frequency, duration) notes played back to back, the note playing
+    at each time in t: its frequency, the time since it started and its duration, plus
+    whether any note is playing (False after the melody ends).
+    """
+    freq = numpy.zeros_like(t)
+    note_t = numpy.zeros_like(t)
+    note_dur = numpy.ones_like(t)
+    playing = numpy.zeros(t.shape, dtype=bool)
+    note_time = 0
+    for note_freq, duration in melody:
+        current = ~playing & (note_time <= t) & (t < note_time + duration)
+        freq[current] = note_freq
+        note_t[current] = t[current] - note_time
+        note_dur[current] = duration
+        playing |= current
+        note_time += duration
+    return freq, note_t, note_dur, playing
+
 def generate_tone(frequency, duration, sample_rate=22050, volume=0.5):
     """Generate a sine wave tone"""
     frames = int(duration * sample_rate)
-    arr = []
-    for i in range(frames):
-        wave = 4096 * volume * math.sin(2 * math.pi * frequency * i / sample_rate)
-        arr.append([int(wave), int(wave)])
-    return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+    i = numpy.arange(frames)
+    wave = 4096 * volume * numpy.sin(2 * math.pi * frequency * i / sample_rate)
+    return make_stereo_sound(wave)
 
 def generate_coin_sound():
     """Generate a pleasant coin collection sound - melodic arpeggio"""
     sample_rate = 22050
     duration = 0.5
     frames = int(duration * sample_rate)
-    arr = []
+    t = numpy.arange(frames) / sample_rate
     
     # C major arpeggio: C5 -> E5 -> G5 -> C6
-    notes = [523, 659, 784, 1047]  # C5, E5, G5, C6
+    notes = numpy.array([523, 659, 784, 1047])  # C5, E5, G5, C6
     note_duration = duration / len(notes)
     
-    for i in range(frames):
-        t = i / sample_rate
-        note_index = min(int(t / note_duration), len(notes) - 1)
-        note_t = (t % note_duration) / note_duration
-        
-        freq = notes[note_index]
-        
-        # Add harmonics for richer sound
-        fundamental = math.sin(2 * math.pi * freq * t)
-        harmonic2 = 0.3 * math.sin(2 * math.pi * freq * 2 * t)
-        harmonic3 = 0.1 * math.sin(2 * math.pi * freq * 3 * t)
-        
-        # Bell-like envelope
-        envelope = math.exp(-note_t * 3) * math.sin(math.pi * note_t)
-        
-        wave = 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope
-        arr.append([int(wave), int(wave)])
+    note_index = numpy.minimum((t / note_duration).astype(int), len(notes) - 1)
+    note_t = (t % note_duration) / note_duration
+    freq = notes[note_index]
+    
+    # Add harmonics for richer sound
+    fundamental = numpy.sin(2 * math.pi * freq * t)
+    harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq * 2 * t)
+    harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq * 3 * t)
     
-    return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+    # Bell-like envelope
+    envelope = numpy.exp(-note_t * 3) * numpy.sin(math.pi * note_t)
+    
+    wave = 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope
+    return make_stereo_sound(wave)
 
 def generate_jump_sound():
     """Generate a melodic jump sound - perfect fifth interval"""
     sample_rate = 22050
     duration = 0.25
     frames = int(duration * sample_rate)
-    arr = []
+    t = numpy.arange(frames) / sample_rate
+    progress = t / duration
     
     # Perfect fifth: C4 to G4 (musical interval)
     start_freq, end_freq = 262, 392  # C4 to G4
     
-    for i in range(frames):
-        t = i / sample_rate
-        progress = t / duration
-        
-        # Smooth frequency transition using sine curve
-        freq_progress = 0.5 * (1 - math.cos(math.pi * progress))
-        freq = start_freq + (end_freq - start_freq) * freq_progress
-        
-        # Add harmonics for richer sound
-        fundamental = math.sin(2 * math.pi * freq * t)
-        harmonic2 = 0.2 * math.sin(2 * math.pi * freq * 2 * t)
-        
-        # Musical envelope - attack, sustain, decay
-        if progress < 0.1:  # Attack
-            envelope = progress / 0.1
-        elif progress < 0.7:  # Sustain
-            envelope = 1.0
-        else:  # Decay
-            envelope = (1.0 - progress) / 0.3
-        
-        wave = 2048 * 0.6 * (fundamental + harmonic2) * envelope
-        arr.append([int(wave), int(wave)])
+    # Smooth frequency transition using sine curve
+    freq_progress = 0.5 * (1 - numpy.cos(math.pi * progress))
+    freq = start_freq + (end_freq - start_freq) * freq_progress
+    
+    # Add harmonics for richer sound
+    fundamental = numpy.sin(2 * math.pi * freq * t)
+    harmonic2 = 0.2 * numpy.sin(2 * math.pi * freq * 2 * t)
     
-    return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+    # Musical envelope - attack, sustain, decay
+    envelope = numpy.select([progress < 0.1, progress < 0.7],
+                            [progress / 0.1, 1.0],
+                            (1.0 - progress) / 0.3)
+    
+    wave = 2048 * 0.6 * (fundamental + harmonic2) * envelope
+    return make_stereo_sound(wave)
 
 def generate_level_complete_sound():
     """Generate a melodic victory fanfare - classic video game melody"""
     sample_rate = 22050
     duration = 1.5
     frames = int(duration * sample_rate)
-    arr = []
+    t = numpy.arange(frames) / sample_rate
     
     # Classic victory melody: C-C-C-C-G-G-G-G-A-A-A-A-C6
     melody = [
@@ -154,51 +214,29 @@ def generate_level_complete_sound():
         (880, 0.15), (880, 0.15), (880, 0.15),           # A5 x3
         (1047, 0.4)                                       # C6 (long)
     ]
-    
-    current_time = 0
-    
-    for i in range(frames):
-        t = i / sample_rate
-        wave = 0
-        
-        # Find current note
-        note_time = 0
-        current_note = None
-        for note_freq, note_dur in melody:
-            if note_time <= t < note_time + note_dur:
-                current_note = (note_freq, t - note_time, note_dur)
-                break
-            note_time += note_dur
-        
-        if current_note:
-            freq, note_t, note_dur = current_note
-            
-            # Add harmonics for richer sound
-            fundamental = math.sin(2 * math.pi * freq * t)
-            harmonic2 = 0.3 * math.sin(2 * math.pi * freq * 2 * t)
-            harmonic3 = 0.1 * math.sin(2 * math.pi * freq * 3 * t)
-            
-            # Note envelope
-            note_progress = note_t / note_dur
-            if note_progress < 0.1:  # Attack
-                envelope = note_progress / 0.1
-            elif note_progress < 0.8:  # Sustain
-                envelope = 1.0
-            else:  # Release
-                envelope = (1.0 - note_progress) / 0.2
-            
-            wave = 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope
-        
-        arr.append([int(wave), int(wave)])
-    
-    return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+    freq, note_t, note_dur, playing = note_schedule(melody, t)
+    
+    # Add harmonics for richer sound
+    fundamental = numpy.sin(2 * math.pi * freq * t)
+    harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq * 2 * t)
+    harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq * 3 * t)
+    
+    # Note envelope - attack, sustain, release
+    note_progress = note_t / note_dur
+    envelope = numpy.select([note_progress < 0.1, note_progress < 0.8],
+                            [note_progress / 0.1, 1.0],
+                            (1.0 - note_progress) / 0.2)
+    
+    # Silence once the melody is over
+    wave = numpy.where(playing, 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope, 0)
+    return make_stereo_sound(wave)
 
 def generate_explosion_sound():
     """Generate a melodic death sound - sad descending melody"""
     sample_rate = 22050
     duration = 1.2
     frames = int(duration * sample_rate)
-    arr = []
+    t = numpy.arange(frames) / sample_rate
     
     # Sad, melodic descending phrase - like a "wah wah wah" cartoon death
     # Using a minor scale descent: G5 -> F5 -> Eb5 -> D5 -> C5
@@ -209,97 +247,83 @@ def generate_explosion_sound():
         (587, 0.3),   # D5
         (523, 0.3)    # C5 (longer, final note)
     ]
-    
-    for i in range(frames):
-        t = i / sample_rate
-        wave = 0
-        
-        # Find current note
-        note_time = 0
-        current_note = None
-        for note_freq, note_dur in melody:
-            if note_time <= t < note_time + note_dur:
-                current_note = (note_freq, t - note_time, note_dur)
-                break
-            note_time += note_dur
-        
-        if current_note:
-            freq, note_t, note_dur = current_note
-            note_progress = note_t / note_dur
-            
-            # Add vibrato for expressive effect
-            vibrato_freq = 5  # 5 Hz vibrato
-            vibrato_depth = 0.02  # 2% frequency modulation
-            freq_with_vibrato = freq * (1 + vibrato_depth * math.sin(2 * math.pi * vibrato_freq * t))
-            
-            # Generate rich harmonic content
-            fundamental = math.sin(2 * math.pi * freq_with_vibrato * t)
-            harmonic2 = 0.3 * math.sin(2 * math.pi * freq_with_vibrato * 2 * t)
-            harmonic3 = 0.1 * math.sin(2 * math.pi * freq_with_vibrato * 3 * t)
-            
-            # Sad, droopy envelope - starts strong, fades with a droop
-            if note_progress < 0.1:  # Quick attack
-                envelope = note_progress / 0.1
-            else:  # Sad, drooping decay
-                envelope = math.exp(-(note_progress - 0.1) * 2) * (1 - note_progress * 0.3)
-            
-            # Overall volume that decreases through the phrase
-            phrase_progress = t / duration
-            overall_volume = (1 - phrase_progress * 0.7)  # Fade to 30% by end
-            
-            wave = 2048 * 0.5 * (fundamental + harmonic2 + harmonic3) * envelope * overall_volume
-        
-        arr.append([int(wave), int(wave)])
-    
-    return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+    freq, note_t, note_dur, playing = note_schedule(melody, t)
+    note_progress = note_t / note_dur
+    
+    # Add vibrato for expressive effect
+    vibrato_freq = 5  # 5 Hz vibrato
+    vibrato_depth = 0.02  # 2% frequency modulation
+    freq_with_vibrato = freq * (1 + vibrato_depth * numpy.sin(2 * math.pi * vibrato_freq * t))
+    
+    # Generate rich harmonic content
+    fundamental = numpy.sin(2 * math.pi * freq_with_vibrato * t)
+    harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq_with_vibrato * 2 * t)
+    harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq_with_vibrato * 3 * t)
+    
+    # Sad, droopy envelope - quick attack, then a drooping decay
+    envelope = numpy.where(note_progress < 0.1,
+                           note_progress / 0.1,
+                           numpy.exp(-(note_progress - 0.1) * 2) * (1 - note_progress * 0.3))
+    
+    # Overall volume that decreases through the phrase
+    phrase_progress = t / duration
+    overall_volume = (1 - phrase_progress * 0.7)  # Fade to 30% by end
+    
+    # Silence once the melody is over
+    wave = numpy.where(playing, 2048 * 0.5 * (fundamental + harmonic2 + harmonic3) * envelope * overall_volume, 0)
+    return make_stereo_sound(wave)
 
-# Generate synthesized sounds
-try:
-    import numpy
+# Dummy sound objects that do nothing when played
+class DummySound:
+    def play(self): pass
+    def set_volume(self, vol): pass
+
+# Sounds stay silent until init_sounds() runs (main() calls it, headless runs never do)
+coin_sound = DummySound()
+level_complete_sound = DummySound()
+jump_sound = DummySound()
+explosion_sound = DummySound()
+
+def init_sounds():
+    """Start the mixer and generate synthesized sounds"""
+    global numpy, coin_sound, level_complete_sound, jump_sound, explosion_sound
     
-    coin_sound = generate_coin_sound()
-    level_complete_sound = generate_level_complete_sound()
-    jump_sound = generate_jump_sound()
-    explosion_sound = generate_explosion_sound()
+    try:
+        pygame.mixer.init()  # Initialize the mixer for sound playback
+    except pygame.error as e:
+        print(f"Warning: Could not open audio device: {e}")
+        print("Game will run without sound.")
+        return
     
-    print("Successfully generated synthesized sounds")
-except ImportError:
-    print("Warning: NumPy not available for sound synthesis. Installing fallback sounds...")
-    # Fallback to simple tones without numpy
     try:
-        coin_sound = generate_tone(523, 0.2, volume=0.3)  # C5 note
-        level_complete_sound = generate_tone(659, 0.5, volume=0.5)  # E5 note
-        jump_sound = generate_tone(300, 0.1, volume=0.2)  # Lower tone
-        explosion_sound = generate_tone(100, 0.3, volume=0.8)  # Low rumble
-        print("Using simple tone fallbacks")
+        import numpy
+        
+        coin_sound = generate_coin_sound()
+        level_complete_sound = generate_level_complete_sound()
+        jump_sound = generate_jump_sound()
+        explosion_sound = generate_explosion_sound()
+        
+        print("Successfully generated synthesized sounds")
+    except ImportError:
+        print("Warning: NumPy not available for sound synthesis. Installing fallback sounds...")
+        # Fallback to simple tones without numpy
+        try:
+            coin_sound = generate_tone(523, 0.2, volume=0.3)  # C5 note
+            level_complete_sound = generate_tone(659, 0.5, volume=0.5)  # E5 note
+            jump_sound = generate_tone(300, 0.1, volume=0.2)  # Lower tone
+            explosion_sound = generate_tone(100, 0.3, volume=0.8)  # Low rumble
+            print("Using simple tone fallbacks")
+        except Exception as e:
+            print(f"Warning: Could not generate sounds: {e}")
+            print("Game will run without sound.")
     except Exception as e:
-        print(f"Warning: Could not generate sounds: {e}")
+        print(f"Warning: Sound synthesis failed: {e}")
         print("Game will run without sound.")
-        # Create dummy sound objects that do nothing when played
-        class DummySound:
-            def play(self): pass
-            def set_volume(self, vol): pass
-        
-        coin_sound = DummySound()
-        level_complete_sound = DummySound()
-        jump_sound = DummySound()
-        explosion_sound = DummySound()
-except Exception as e:
-    print(f"Warning: Sound synthesis failed: {e}")
-    print("Game will run without sound.")
-    # Create dummy sound objects that do nothing when played
-    class DummySound:
-        def play(self): pass
-        def set_volume(self, vol): pass
-    
-    coin_sound = DummySound()
-    level_complete_sound = DummySound()
-    jump_sound = DummySound()
-    explosion_sound = DummySound()
 
 # Add these constants for the night sky
 NIGHT_SKY = (25, 25, 50)  # Dark blue for night sky
 STAR_COLOR = (255, 255, 200)  # Yellowish white for stars
+STAR_COUNT = 100
 
 # Game states
 GAME_STATE_LEVEL_SELECT = "LEVEL_SELECT"
@@ -309,27 +333,36 @@ def setup_display():
     """Setup display mode (fullscreen or windowed)"""
     global screen, SCREEN_WIDTH, SCREEN_HEIGHT, FULLSCREEN
     
+    logical_display.scale_mode = RENDER_SCALE_MODE
+    # With a logical resolution the window can be any size; the frame is scaled to fit it
+    window_flags = pygame.RESIZABLE if LOGICAL_RESOLUTION else 0
     if FULLSCREEN:
         try:
             # Get the current display info for fullscreen
             infoObject = pygame.display.Info()
-            SCREEN_WIDTH = infoObject.current_w
-            SCREEN_HEIGHT = infoObject.current_h
-            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-            print(f"Switched to fullscreen: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+            if not LOGICAL_RESOLUTION:
+                SCREEN_WIDTH = infoObject.current_w
+                SCREEN_HEIGHT = infoObject.current_h
+            screen = logical_display.set_mode((infoObject.current_w, infoObject.current_h), pygame.FULLSCREEN,
+                                              (SCREEN_WIDTH, SCREEN_HEIGHT))
+            print(f"Switched to fullscreen: {infoObject.current_w}x{infoObject.current_h}, "
+                  f"drawing at {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
         except pygame.error as e:
             print(f"Fullscreen failed: {e}")
             print("Falling back to windowed mode...")
             FULLSCREEN = False
             SCREEN_WIDTH = 1280
             SCREEN_HEIGHT = 720
-            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            screen = logical_display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), window_flags, (SCREEN_WIDTH, SCREEN_HEIGHT))
             print(f"Windowed mode: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
     else:
         SCREEN_WIDTH = 1280
         SCREEN_HEIGHT = 720
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        screen = logical_display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), window_flags, (SCREEN_WIDTH, SCREEN_HEIGHT))
         print(f"Switched to windowed mode: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+    
+    pygame.display.set_caption("Classroom Platformer")
+    static_level_layer.invalidate()  # Redraw the cached level in the new display format
 
 def get_text_color(background_color):
     """
@@ -359,8 +392,49 @@ def get_current_background_color(level_data):
     else:
         return (135, 206, 235)  # Sky blue for day time
 
+class FloatPhysics:
+    """Default movement units: float velocities in pixels per step"""
+    gravity = GRAVITY
+    jump_strength = JUMP_STRENGTH
+    move_speed = MOVE_SPEED
+    bounce_speed = MOVE_SPEED * 1.5  # Push away from the wall after a wall jump
+    
+    @staticmethod
+    def apply_friction(velocity):
+        return velocity * FRICTION
+    
+    @staticmethod
+    def to_pixels(velocity):
+        return int(velocity)
+
+class FixedPointPhysics:
+    """Deterministic movement units: integer velocities in 1/FIXED_POINT_SCALE pixels per step"""
+    gravity = round(GRAVITY * FIXED_POINT_SCALE)
+    jump_strength = round(JUMP_STRENGTH * FIXED_POINT_SCALE)
+    move_speed = round(MOVE_SPEED * FIXED_POINT_SCALE)
+    bounce_speed = round(MOVE_SPEED * 1.5 * FIXED_POINT_SCALE)
+    friction = round(FRICTION * FIXED_POINT_SCALE)
+    
+    @staticmethod
+    def apply_friction(velocity):
+        # Integer maths only, truncating toward zero like int() does
+        slowed = abs(velocity) * FixedPointPhysics.friction // FIXED_POINT_SCALE
+        return slowed if velocity >= 0 else -slowed
+    
+    @staticmethod
+    def to_pixels(velocity):
+        pixels = abs(velocity) // FIXED_POINT_SCALE
+        return pixels if velocity >= 0 else -pixels
+
 class Player:
-    def __init__(self, x, y, color, player_num):
+    __slots__ = ('rect', 'vel_x', 'vel_y', 'color', 'is_jumping', 'on_ground', 'player_num', 'spawn_x',
+                 'spawn_y', 'collected_coins', 'standing_on_player', 'touching_wall', 'can_wall_jump',
+                 'wall_slide_speed', 'wall_jump_direction', 'last_wall_id', 'bounce_timer',
+                 'ignore_wall_contact', 'happy_face', 'is_dying', 'death_timer',
+                 'death_sound_played', 'death_phase', 'death_center_x', 'death_center_y',
+                 'surprised_face', 'eye_direction', 'prev_x', 'prev_y', 'white_flash_timer', 'physics')
+    
+    def __init__(self, x, y, color, player_num, physics=FloatPhysics):
         self.rect = pygame.Rect(x, y, 40, 40)
         self.vel_x = 0
         self.vel_y = 0
@@ -382,25 +456,66 @@ class Player:
         self.happy_face = False  # New attribute to track if player should show happy face
         self.is_dying = False
         self.death_timer = 0
-        self.death_particles = []
         self.death_sound_played = False
         self.death_phase = 0  # 0: surprised, 1: move to center, 2: explode
         self.death_center_x = 0  # Target x position for center movement
         self.death_center_y = 0  # Target y position for center movement
         self.surprised_face = False  # For the "OH!" expression
+        self.white_flash_timer = 0  # Frames of white flash left after the explosion
         self.eye_direction = 0  # -1 for left, 0 for center, 1 for right
+        self.prev_x = x  # Position at the start of the last physics step (for interpolation)
+        self.prev_y = y
+        self.physics = physics  # FloatPhysics, or FixedPointPhysics for deterministic runs
+        
+    def get_sweep_extent(self):
+        """Left and right x this player can cover during the next step (for find_nearby_players)"""
+        left, right = self.rect.left, self.rect.right
+        if self.is_dying and self.death_timer <= 1:
+            # Respawning this step - also cover the spawn point we are about to jump to
+            left = min(left, self.spawn_x)
+            right = max(right, self.spawn_x + 40)
+        return left, right
+    
+    def save_previous_position(self):
+        """Remember where we were before this physics step so drawing can interpolate"""
+        self.prev_x = self.rect.x
+        self.prev_y = self.rect.y
+    
+    def time_of_impact(self, platforms, dx, dy):
+        """
+        Swept AABB test for a move along one axis (dx or dy is 0). Returns how far we can
+        move before touching the first platform in the way, and that platform (or None).
+        Platforms we already overlap are left to the overlap checks in update().
+        """
+        rect = self.rect
+        hit = None
+        for platform in platforms:
+            other = platform.rect
+            if dx > 0 and rect.right <= other.left < rect.right + dx and other.top < rect.bottom and rect.top < other.bottom:
+                dx, hit = other.left - rect.right, platform
+            elif dx < 0 and rect.left + dx < other.right <= rect.left and other.top < rect.bottom and rect.top < other.bottom:
+                dx, hit = other.right - rect.left, platform
+            elif dy > 0 and rect.bottom <= other.top < rect.bottom + dy and other.left < rect.right and rect.left < other.right:
+                dy, hit = other.top - rect.bottom, platform
+            elif dy < 0 and rect.top + dy < other.bottom <= rect.top and other.left < rect.right and rect.left < other.right:
+                dy, hit = other.bottom - rect.top, platform
+        return dx or dy, hit
+    
+    def update(self, platforms, coins, keys_pressed, other_players=None, platform_grid=None, level_bounds=None,
+               particles=None, camera=None):
+        # particles is the ParticlePool for this player's death explosion (the game's own if
+        # not given) and camera the view its death animation rises in (none: the screen)
         
-    def update(self, platforms, coins, keys_pressed, other_players=None):
         # If player is in dying animation, update particles and return
         if self.is_dying:
-            self.update_death_animation()
+            self.update_death_animation(particles)
             return
             
         # Handle bounce timer
         if self.bounce_timer > 0:
             self.bounce_timer -= 1
             # Force velocity in bounce direction while timer is active
-            self.vel_x = self.wall_jump_direction * MOVE_SPEED * 1.5
+            self.vel_x = self.wall_jump_direction * self.physics.bounce_speed
             
             # While bouncing, ignore wall contact with the same wall
             self.ignore_wall_contact = True
@@ -408,78 +523,70 @@ class Player:
             self.ignore_wall_contact = False
         
         # Handle input
-        if self.player_num == 1:
-            if keys_pressed[pygame.K_a]:
-                self.vel_x = -MOVE_SPEED
-                self.eye_direction = -1  # Look left
-            elif keys_pressed[pygame.K_d]:
-                self.vel_x = MOVE_SPEED
-                self.eye_direction = 1   # Look right
-            else:
-                self.vel_x *= FRICTION
-                self.eye_direction = 0   # Look center when not moving
-                
-            # Check if player can jump
-            can_normal_jump = self.on_ground or self.standing_on_player
-            can_do_wall_jump = self.can_wall_jump
+        move_left = move_right = jump = False
+        controls = PLAYER_CONTROLS.get(self.player_num)
+        if controls:
+            left_key, right_key, jump_key = controls
+            move_left = keys_pressed[left_key]
+            move_right = keys_pressed[right_key]
+            jump = keys_pressed[jump_key]
+        
+        if move_left:
+            self.vel_x = -self.physics.move_speed
+            self.eye_direction = -1  # Look left
+        elif move_right:
+            self.vel_x = self.physics.move_speed
+            self.eye_direction = 1   # Look right
+        else:
+            self.vel_x = self.physics.apply_friction(self.vel_x)
+            self.eye_direction = 0   # Look center when not moving
             
-            if keys_pressed[pygame.K_w] and self.bounce_timer <= 0 and (can_normal_jump or can_do_wall_jump):
-                self.vel_y = JUMP_STRENGTH
-                self.is_jumping = True
-                
-                if self.can_wall_jump:
-                    # Apply horizontal bounce away from wall
-                    self.vel_x = self.wall_jump_direction * MOVE_SPEED * 1.5
-                    self.can_wall_jump = False  # Use up the wall jump
-                    # Briefly prevent player from overriding the bounce direction
-                    self.bounce_timer = 10
-                
-                jump_sound.play()  # Play jump sound
-                
-        elif self.player_num == 2:
-            if keys_pressed[pygame.K_LEFT]:
-                self.vel_x = -MOVE_SPEED
-                self.eye_direction = -1  # Look left
-            elif keys_pressed[pygame.K_RIGHT]:
-                self.vel_x = MOVE_SPEED
-                self.eye_direction = 1   # Look right
-            else:
-                self.vel_x *= FRICTION
-                self.eye_direction = 0   # Look center when not moving
-                
-            # Check if player can jump
-            can_normal_jump = self.on_ground or self.standing_on_player
-            can_do_wall_jump = self.can_wall_jump
+        # Check if player can jump
+        can_normal_jump = self.on_ground or self.standing_on_player
+        can_do_wall_jump = self.can_wall_jump
+        
+        if jump and self.bounce_timer <= 0 and (can_normal_jump or can_do_wall_jump):
+            self.vel_y = self.physics.jump_strength
+            self.is_jumping = True
             
-            if keys_pressed[pygame.K_UP] and self.bounce_timer <= 0 and (can_normal_jump or can_do_wall_jump):
-                self.vel_y = JUMP_STRENGTH
-                self.is_jumping = True
-                
-                if self.can_wall_jump:
-                    # Apply horizontal bounce away from wall
-                    self.vel_x = self.wall_jump_direction * MOVE_SPEED * 1.5
-                    self.can_wall_jump = False  # Use up the wall jump
-                    # Briefly prevent player from overriding the bounce direction
-                    self.bounce_timer = 10
-                
-                jump_sound.play()  # Play jump sound
+            if self.can_wall_jump:
+                # Apply horizontal bounce away from wall
+                self.vel_x = self.wall_jump_direction * self.physics.bounce_speed
+                self.can_wall_jump = False  # Use up the wall jump
+                # Briefly prevent player from overriding the bounce direction
+                self.bounce_timer = 10
+            
+            jump_sound.play()  # Play jump sound
         
         # Apply gravity
-        self.vel_y += GRAVITY
+        self.vel_y += self.physics.gravity
         
         # Remove wall sliding - players now fall at normal speed when touching walls
         # if self.touching_wall and self.vel_y > 0 and not self.on_ground:
         #     self.vel_y = self.wall_slide_speed
         
-        # Move horizontally
-        self.rect.x += int(self.vel_x)
+        # Move horizontally, stopping at the first wall in the way so fast moves can't
+        # tunnel through thin platforms
+        dx = self.physics.to_pixels(self.vel_x)
+        # Only test platforms in the grid cells the move covers (if a grid was built for this level)
+        swept_rect = self.rect.union(self.rect.move(dx, 0))
+        nearby_platforms = platform_grid.query(swept_rect) if platform_grid else platforms
+        # Each level platform counts as its own wall for wall jumps (a wall of stacked tiles
+        # is many walls), so against merged colliders the move is resolved with the level
+        # platforms of the ones it reaches. Moves that reach nothing skip this.
+        reached = [platform for platform in nearby_platforms
+                   if isinstance(platform, MergedPlatform) and platform.rect.colliderect(swept_rect)]
+        if reached:
+            nearby_platforms = merged_parts(reached)
+        dx, wall = self.time_of_impact(nearby_platforms, dx, 0)
+        self.rect.x += dx
         
         # Check for horizontal collisions with platforms
         self.touching_wall = False  # Reset wall contact status
         current_wall_id = None
         
-        for platform in platforms:
-            if self.rect.colliderect(platform.rect):
+        for platform in nearby_platforms:
+            if platform is wall or self.rect.colliderect(platform.rect):
                 if self.vel_x > 0:  # Moving right
                     self.rect.right = platform.rect.left
                     # Only set touching_wall if we're not ignoring wall contact
@@ -511,15 +618,19 @@ class Player:
             self.can_wall_jump = True
             self.last_wall_id = current_wall_id  # Remember this wall
         
-        # Move vertically
-        self.rect.y += int(self.vel_y)
+        # Move vertically, stopping at the first floor or ceiling in the way
+        dy = self.physics.to_pixels(self.vel_y)
+        swept_rect = self.rect.union(self.rect.move(0, dy))
+        nearby_platforms = platform_grid.query(swept_rect) if platform_grid else platforms
+        dy, floor = self.time_of_impact(nearby_platforms, 0, dy)
+        self.rect.y += dy
         
         # Check for vertical collisions with platforms
         self.on_ground = False
         self.standing_on_player = False
         
-        for platform in platforms:
-            if self.rect.colliderect(platform.rect):
+        for platform in nearby_platforms:
+            if platform is floor or self.rect.colliderect(platform.rect):
                 if self.vel_y > 0:  # Falling
                     self.rect.bottom = platform.rect.top
                     self.on_ground = True
@@ -548,39 +659,40 @@ class Player:
                     self.standing_on_player = True
         
         # Collect coins
-        for coin in coins[:]:  # Create a copy of the list to safely remove items
-            if self.rect.colliderect(coin.rect):
-                coins.remove(coin)
-                self.collected_coins += 1
-                coin_sound.play()  # Play coin sound
+        collected = coins.collect(self.rect)
+        if collected:
+            self.collected_coins += collected
+            coin_sound.play()  # Play coin sound
         
         # Reset jumping state and wall jump tracking if on ground
         if self.on_ground:
             self.is_jumping = False
             self.last_wall_id = None  # Reset wall tracking when touching ground
         
-        # Check if player has fallen off the screen
-        if self.rect.top > SCREEN_HEIGHT:
-            self.start_death_animation()
+        # Check if player has fallen off the bottom of the level (the screen, unless it scrolls)
+        fall_limit = level_bounds.bottom if level_bounds else SCREEN_HEIGHT
+        if self.rect.top > fall_limit:
+            self.start_death_animation(particles, camera)
             return
         
-    def start_death_animation(self):
+    def start_death_animation(self, particles=None, camera=None):
         self.is_dying = True
         self.death_timer = 90  # Longer animation (1.5 seconds)
-        self.death_particles = []
+        (particles or particle_pool).release(self.player_num)
         self.death_sound_played = False
         self.death_phase = 0  # Start with surprised face
         self.surprised_face = True
         
         # Set target position (straight up from current position)
         self.death_center_x = self.rect.centerx  # Keep same X position
-        self.death_center_y = SCREEN_HEIGHT // 3  # Go up to 1/3 of screen height
+        view_top = camera.y if camera else 0
+        self.death_center_y = view_top + SCREEN_HEIGHT // 3  # Go up to 1/3 of the view's height
         
         # Play explosion sound at higher volume
         explosion_sound.set_volume(1.0)  # Ensure maximum volume
         explosion_sound.play()
     
-    def update_death_animation(self):
+    def update_death_animation(self, particles=None):
         # Update death animation phases
         if self.death_phase == 0:  # Surprised face phase
             if self.death_timer <= 75:  # After 15 frames (0.25 seconds)
@@ -625,14 +737,9 @@ class Player:
                 
                 # If we've reached near maximum size, create explosion
                 if growth_factor >= 2.8:
-                    # Create explosion particles
-                    for _ in range(80):  # Fewer particles for smaller explosion
-                        particle = ExplosionParticle(self.rect.centerx, self.rect.centery)
-                        # Smaller explosion
-                        particle.size = random.randint(3, 8)  # Smaller particles
-                        particle.vel_x = random.uniform(-10, 10)  # Moderate speed particles
-                        particle.vel_y = random.uniform(-10, 10)  # Particles in all directions
-                        self.death_particles.append(particle)
+                    # Create explosion particles (80 for a smaller explosion, fewer at lower quality), moved by update_players
+                    particle_count = round(80 * quality_governor.settings['particles'])
+                    (particles or particle_pool).spawn(self.rect.centerx, self.rect.centery, particle_count, self.player_num)
                     
                     # Play explosion sound again for the final explosion
                     explosion_sound.play()
@@ -643,14 +750,7 @@ class Player:
         
         elif self.death_phase == 3:  # White flash and explosion phase
             # Decrement white flash timer
-            if hasattr(self, 'white_flash_timer'):
-                self.white_flash_timer -= 1
-        
-        # Update all particles
-        for particle in self.death_particles[:]:
-            particle.update()
-            if particle.life <= 0:
-                self.death_particles.remove(particle)
+            self.white_flash_timer -= 1
         
         # Decrement timer
         self.death_timer -= 1
@@ -662,95 +762,67 @@ class Player:
             # Reset size before respawning
             self.rect.width = 40
             self.rect.height = 40
-            self.respawn()
+            self.respawn(particles)
     
-    def respawn(self):
+    def respawn(self, particles=None):
         self.rect.x = self.spawn_x
         self.rect.y = self.spawn_y
         self.vel_x = 0
         self.vel_y = 0
         self.last_wall_id = None
         self.can_wall_jump = False    # Reset can_wall_jump on respawn
-        
-    def draw(self, screen):
-        # If in white flash phase, draw a fading white overlay
-        if self.is_dying and self.death_phase == 3 and hasattr(self, 'white_flash_timer') and self.white_flash_timer > 0:
-            # Create a white surface with alpha for the flash
+        self.prev_x = self.rect.x     # Don't interpolate across the respawn jump
+        self.prev_y = self.rect.y
+        (particles or particle_pool).release(self.player_num)  # Explosion ends with the death animation
+    
+    def get_interpolated_position(self, alpha):
+        """Top-left blended between the previous and current physics step"""
+        dx = self.rect.x - self.prev_x
+        dy = self.rect.y - self.prev_y
+        if abs(dx) < INTERPOLATION_SNAP_DISTANCE and abs(dy) < INTERPOLATION_SNAP_DISTANCE:
+            # alpha is how far we are into the next step, so start from the previous position
+            return self.prev_x + int(round(dx * alpha)), self.prev_y + int(round(dy * alpha))
+        return self.rect.x, self.rect.y
+    
+    def is_flashing(self):
+        """Whether the white flash of the explosion covers the screen this frame"""
+        return (self.is_dying and self.death_phase == 3 and self.white_flash_timer > 0 and
+                quality_governor.settings['flash'])
+    
+    def draw_interpolated(self, screen, alpha, camera=None, particles=None):
+        """Draw at a position blended between the previous and current physics step"""
+        particles = particles or particle_pool
+        offset_x, offset_y = (camera.x, camera.y) if camera else (0, 0)
+        actual_x, actual_y = self.rect.x, self.rect.y
+        x, y = self.get_interpolated_position(alpha)
+        self.rect.x, self.rect.y = x - offset_x, y - offset_y
+        self.draw(screen, (offset_x, offset_y), particles)
+        drawn_rect = self.rect.inflate(4, 4)
+        self.rect.x, self.rect.y = actual_x, actual_y
+        
+        # Return what we covered, for dirty-rect rendering
+        if self.is_dying:
+            particle_bounds = particles.get_bounds(self.player_num)
+            if particle_bounds:
+                drawn_rect.union_ip(particle_bounds.move(-offset_x, -offset_y))
+        return drawn_rect
+        
+    def draw(self, screen, offset=(0, 0), particles=None):
+        # offset is the camera position; self.rect is already on screen, the particles aren't
+        # If in white flash phase, draw a fading white overlay (unless quality turned it off)
+        if self.is_flashing():
+            # Blend the shared white overlay over the screen for the flash
             flash_alpha = min(200, self.white_flash_timer * 25)  # Max 200 alpha, fading out
-            flash_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            flash_surface.fill((255, 255, 255, flash_alpha))
-            screen.blit(flash_surface, (0, 0))
+            screen_effects.flash(screen, flash_alpha)
         
         if self.is_dying:
             if self.death_phase < 3 and self.death_timer > 15:  # Still showing player with surprised face
-                # Draw player body
-                pygame.draw.rect(screen, self.color, self.rect)
-                pygame.draw.rect(screen, BLACK, self.rect, 2)
-                
-                # Scale eye and mouth sizes based on player size
-                scale_factor = self.rect.width / 40
-                
-                # Draw surprised eyes (bigger)
-                eye_size = int(10 * scale_factor)
-                left_eye_x = self.rect.left + int(12 * scale_factor)
-                right_eye_x = self.rect.right - int(12 * scale_factor)
-                eye_y = self.rect.top + int(15 * scale_factor)
-                
-                pygame.draw.circle(screen, WHITE, (left_eye_x, eye_y), eye_size)
-                pygame.draw.circle(screen, WHITE, (right_eye_x, eye_y), eye_size)
-                
-                # Draw surprised pupils (smaller)
-                pupil_size = int(3 * scale_factor)
-                pygame.draw.circle(screen, BLACK, (left_eye_x, eye_y), pupil_size)
-                pygame.draw.circle(screen, BLACK, (right_eye_x, eye_y), pupil_size)
-                
-                # Draw surprised "O" mouth (larger circle)
-                mouth_size = int(8 * scale_factor)
-                mouth_y = self.rect.top + int(28 * scale_factor)
-                
-                # Draw a filled black circle for the mouth - keep it black inside
-                pygame.draw.circle(screen, BLACK, (self.rect.centerx, mouth_y), mouth_size)
+                screen.blit(player_sprites.get(self.color, self.rect.size, surprised_face=True), self.rect)
             
             # Draw explosion particles
-            for particle in self.death_particles:
-                particle.draw(screen)
+            (particles or particle_pool).draw(screen, self.player_num, offset)
         else:
-            pygame.draw.rect(screen, self.color, self.rect)
-            pygame.draw.rect(screen, BLACK, self.rect, 2)
-            
-            # Draw eyes
-            eye_size = 8
-            left_eye_center = (self.rect.left + 12, self.rect.top + 15)
-            right_eye_center = (self.rect.right - 12, self.rect.top + 15)
-            pygame.draw.circle(screen, WHITE, left_eye_center, eye_size)
-            pygame.draw.circle(screen, WHITE, right_eye_center, eye_size)
-            
-            # Draw pupils with directional movement
-            pupil_size = 4
-            pupil_offset = 2  # How far pupils move from center
-            
-            # Calculate pupil positions based on eye direction
-            if self.eye_direction == -1:  # Looking left
-                left_pupil_pos = (left_eye_center[0] - pupil_offset, left_eye_center[1])
-                right_pupil_pos = (right_eye_center[0] - pupil_offset, right_eye_center[1])
-            elif self.eye_direction == 1:  # Looking right
-                left_pupil_pos = (left_eye_center[0] + pupil_offset, left_eye_center[1])
-                right_pupil_pos = (right_eye_center[0] + pupil_offset, right_eye_center[1])
-            else:  # Looking center
-                left_pupil_pos = left_eye_center
-                right_pupil_pos = right_eye_center
-            
-            pygame.draw.circle(screen, BLACK, left_pupil_pos, pupil_size)
-            pygame.draw.circle(screen, BLACK, right_pupil_pos, pupil_size)
-            
-            # Draw mouth - happy face if all coins collected, normal face otherwise
-            mouth_y = self.rect.top + 28
-            if self.happy_face:
-                # Draw happy mouth (smile)
-                pygame.draw.arc(screen, BLACK, (self.rect.left + 10, mouth_y - 5, 20, 15), math.pi, 2*math.pi, 2)
-            else:
-                # Draw normal mouth (straight line)
-                pygame.draw.arc(screen, BLACK, (self.rect.left + 10, mouth_y, 20, 10), 0, math.pi, 2)
+            screen.blit(player_sprites.get(self.color, self.rect.size, self.eye_direction, self.happy_face), self.rect)
             
             # Visual indicator for wall sliding
             if self.touching_wall and not self.on_ground:
@@ -760,7 +832,107 @@ class Player:
                 elif self.wall_jump_direction == 1:  # Wall is on the left
                     pygame.draw.rect(screen, WHITE, (self.rect.left, self.rect.y + 5, 3, self.rect.height - 10))
 
+class PlayerSprites:
+    """
+    Player bodies with their faces, drawn once per look and reused, so drawing a player is
+    a blit. A look is the colour, size (the body grows while dying), eye direction, and
+    happy or surprised face. Built on first use; past MAX_SPRITES the least recently used
+    is dropped, which only happens with many player colours.
+    """
+    MAX_SPRITES = 256
+    
+    def __init__(self):
+        self.sprites = OrderedDict()
+    
+    def get(self, color, size, eye_direction=0, happy_face=False, surprised_face=False):
+        if surprised_face:
+            eye_direction, happy_face = 0, False  # The surprised face ignores both
+        key = (tuple(color), size, eye_direction, happy_face, surprised_face)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        sprite = self.sprites[key] = self.build(*key)
+        if len(self.sprites) > self.MAX_SPRITES:
+            self.sprites.popitem(last=False)
+        return sprite
+    
+    def build(self, color, size, eye_direction, happy_face, surprised_face):
+        sprite = pygame.Surface(size)
+        if pygame.display.get_surface():
+            sprite = sprite.convert()
+        rect = sprite.get_rect()
+        
+        # Draw player body
+        pygame.draw.rect(sprite, color, rect)
+        pygame.draw.rect(sprite, BLACK, rect, 2)
+        
+        if surprised_face:
+            # Scale eye and mouth sizes based on player size
+            scale_factor = rect.width / 40
+            
+            # Draw surprised eyes (bigger)
+            eye_size = int(10 * scale_factor)
+            left_eye_x = rect.left + int(12 * scale_factor)
+            right_eye_x = rect.right - int(12 * scale_factor)
+            eye_y = rect.top + int(15 * scale_factor)
+            
+            pygame.draw.circle(sprite, WHITE, (left_eye_x, eye_y), eye_size)
+            pygame.draw.circle(sprite, WHITE, (right_eye_x, eye_y), eye_size)
+            
+            # Draw surprised pupils (smaller)
+            pupil_size = int(3 * scale_factor)
+            pygame.draw.circle(sprite, BLACK, (left_eye_x, eye_y), pupil_size)
+            pygame.draw.circle(sprite, BLACK, (right_eye_x, eye_y), pupil_size)
+            
+            # Draw surprised "O" mouth (larger circle)
+            mouth_size = int(8 * scale_factor)
+            mouth_y = rect.top + int(28 * scale_factor)
+            
+            # Draw a filled black circle for the mouth - keep it black inside
+            pygame.draw.circle(sprite, BLACK, (rect.centerx, mouth_y), mouth_size)
+            return sprite
+        
+        # Draw eyes
+        eye_size = 8
+        left_eye_center = (rect.left + 12, rect.top + 15)
+        right_eye_center = (rect.right - 12, rect.top + 15)
+        pygame.draw.circle(sprite, WHITE, left_eye_center, eye_size)
+        pygame.draw.circle(sprite, WHITE, right_eye_center, eye_size)
+        
+        # Draw pupils with directional movement
+        pupil_size = 4
+        pupil_offset = 2  # How far pupils move from center
+        
+        # Calculate pupil positions based on eye direction
+        if eye_direction == -1:  # Looking left
+            left_pupil_pos = (left_eye_center[0] - pupil_offset, left_eye_center[1])
+            right_pupil_pos = (right_eye_center[0] - pupil_offset, right_eye_center[1])
+        elif eye_direction == 1:  # Looking right
+            left_pupil_pos = (left_eye_center[0] + pupil_offset, left_eye_center[1])
+            right_pupil_pos = (right_eye_center[0] + pupil_offset, right_eye_center[1])
+        else:  # Looking center
+            left_pupil_pos = left_eye_center
+            right_pupil_pos = right_eye_center
+        
+        pygame.draw.circle(sprite, BLACK, left_pupil_pos, pupil_size)
+        pygame.draw.circle(sprite, BLACK, right_pupil_pos, pupil_size)
+        
+        # Draw mouth - happy face if all coins collected, normal face otherwise
+        mouth_y = rect.top + 28
+        if happy_face:
+            # Draw happy mouth (smile)
+            pygame.draw.arc(sprite, BLACK, (rect.left + 10, mouth_y - 5, 20, 15), math.pi, 2*math.pi, 2)
+        else:
+            # Draw normal mouth (straight line)
+            pygame.draw.arc(sprite, BLACK, (rect.left + 10, mouth_y, 20, 10), 0, math.pi, 2)
+        return sprite
+
+player_sprites = PlayerSprites()
+
 class Platform:
+    __slots__ = ('rect', 'color')
+    
     def __init__(self, x, y, width, height, color=BROWN):
         self.rect = pygame.Rect(x, y, width, height)
         self.color = color
@@ -769,29 +941,241 @@ class Platform:
         pygame.draw.rect(screen, self.color, self.rect)
         pygame.draw.rect(screen, BLACK, self.rect, 2)
 
+class MergedPlatform(Platform):
+    """
+    A collision rect made by coalesce_platforms(). parts holds the level platforms it was
+    merged from, as (level index, platform), so wall contact can still be worked out per
+    level platform (see merged_parts()).
+    """
+    __slots__ = ('parts',)
+    
+    def __init__(self, x, y, width, height, color, parts):
+        super().__init__(x, y, width, height, color)
+        self.parts = parts
+
+def merged_parts(colliders):
+    """The level platforms the given merged colliders were made from, in level order"""
+    parts = sorted(part for collider in colliders for part in collider.parts)
+    return [platform for _, platform in parts]
+
+class PlatformGrid:
+    """
+    Uniform-grid spatial hash so collision checks only look at nearby platforms
+    (works for anything with a rect, CoinStore uses it for coins)
+    """
+    def __init__(self, platforms, cell_size=GRID_CELL_SIZE):
+        self.platforms = platforms
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> indices into platforms
+        
+        for index, platform in enumerate(platforms):
+            for cell in self.cells_for_rect(platform.rect):
+                self.cells.setdefault(cell, []).append(index)
+    
+    def cells_for_rect(self, rect):
+        """Yield every grid cell a rect overlaps"""
+        size = self.cell_size
+        left = rect.left // size
+        right = max(rect.left, rect.right - 1) // size
+        top = rect.top // size
+        bottom = max(rect.top, rect.bottom - 1) // size
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                yield (cell_x, cell_y)
+    
+    def query_indices(self, rect):
+        """Return the indices of the platforms sharing a cell with rect, in level order"""
+        indices = set()
+        for cell in self.cells_for_rect(rect):
+            indices.update(self.cells.get(cell, ()))
+        # Keep level order so collision resolution matches a full scan of the list
+        return sorted(indices)
+    
+    def query(self, rect):
+        """Return the platforms sharing a cell with rect, in their original level order"""
+        return [self.platforms[index] for index in self.query_indices(rect)]
+
+class HazardGrid(PlatformGrid):
+    """Static grid over a level's spikes, built once at load, for the per-step death checks"""
+    def contacts(self, players):
+        """
+        Return (player, spike) for every spike touching a player, in player then level
+        order. Dying players are skipped, they can't die again.
+        """
+        hits = []
+        for player in players:
+            if player.is_dying:
+                continue
+            for spike in self.query(player.rect):
+                if player.rect.colliderect(spike.rect):
+                    hits.append((player, spike))
+        return hits
+
+def coalesce_platforms(platforms):
+    """
+    Merge adjacent or overlapping same-colour platforms into as few collision rects as possible.
+    Rects are only merged when their union is itself a rectangle, so the solid area of the
+    level is unchanged. Returns (colliders, number_of_colliders_removed); the colliders are
+    MergedPlatforms that remember which platforms they cover.
+    """
+    rects = [(tuple(platform.color), pygame.Rect(platform.rect)) for platform in platforms]
+    
+    # Drop rects that are completely covered by another rect of the same colour; the
+    # covering rect takes over their platforms
+    kept = []
+    covered_by = {}  # Index of a dropped rect -> index of the rect covering it
+    for index, (color, rect) in enumerate(rects):
+        for other_index, (other_color, other_rect) in enumerate(rects):
+            if other_index == index or other_color != color or not other_rect.contains(rect):
+                continue
+            # For exact duplicates keep the first one
+            if other_rect != rect or other_index < index:
+                covered_by[index] = other_index
+                break
+        else:
+            kept.append((color, rect, [index]))
+    owners = {indices[0]: indices for _, _, indices in kept}
+    for index in covered_by:
+        covering = covered_by[index]
+        while covering in covered_by:  # A dropped rect can be covered by another dropped one
+            covering = covered_by[covering]
+        owners[covering].append(index)
+    rects = kept
+    
+    # Alternate merging horizontal runs (same row) and vertical runs (same column) until stable
+    changed = True
+    while changed:
+        changed = False
+        for horizontal in (True, False):
+            if horizontal:
+                ordered = sorted(rects, key=lambda item: (item[0], item[1].y, item[1].height, item[1].x))
+            else:
+                ordered = sorted(rects, key=lambda item: (item[0], item[1].x, item[1].width, item[1].y))
+            
+            merged = []
+            for color, rect, indices in ordered:
+                if merged:
+                    last_color, last_rect, last_indices = merged[-1]
+                    if horizontal:
+                        touching = (last_rect.y == rect.y and last_rect.height == rect.height and
+                                    rect.left <= last_rect.right)
+                    else:
+                        touching = (last_rect.x == rect.x and last_rect.width == rect.width and
+                                    rect.top <= last_rect.bottom)
+                    if last_color == color and touching:
+                        merged[-1] = (color, last_rect.union(rect), last_indices + indices)
+                        continue
+                merged.append((color, rect, indices))
+            
+            if len(merged) < len(rects):
+                changed = True
+            rects = merged
+    
+    colliders = [MergedPlatform(rect.x, rect.y, rect.width, rect.height, color,
+                                sorted((index, platforms[index]) for index in indices))
+                 for color, rect, indices in rects]
+    # Back in level order (of each collider's first platform): the grid, Player.update and
+    # BatchPhysics all let the first platform in level order win ties, as a full scan does
+    colliders.sort(key=lambda collider: collider.parts[0][0])
+    return colliders, len(platforms) - len(colliders)
+
 class Coin:
+    __slots__ = ('rect', 'color')
+    
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, 30, 30)
         self.color = YELLOW
+    
+    def draw(self, screen, angle=0):
+        # Draw rotating coin (every coin spins in step, see CoinStore.angle)
+        sprite = coin_sprites.get(angle)
+        return screen.blit(sprite, sprite.get_rect(center=self.rect.center))
+
+class CoinSprites:
+    """
+    Every frame of the coin spin, rendered once and anti-aliased (drawn at SUPERSAMPLE times
+    the size, then smoothscaled down), so drawing a coin is a single blit. CoinStore turns
+    the coins ANGLE_STEP degrees per step, so a full turn is 360 / ANGLE_STEP frames, all
+    built on the first draw.
+    """
+    ANGLE_STEP = 2
+    SIZE = 34  # Coin radius 15 plus the outline, with a pixel to spare for the smoothing
+    SUPERSAMPLE = 4
+    
+    def __init__(self):
+        self.frames = None
+    
+    def build(self):
+        self.frames = []
+        big = self.SIZE * self.SUPERSAMPLE
+        center = big / 2
+        radius = 15 * self.SUPERSAMPLE
+        for frame in range(360 // self.ANGLE_STEP):
+            points = []
+            for i in range(8):
+                angle_i = math.radians(frame * self.ANGLE_STEP + i * 45)
+                points.append((center + radius * math.cos(angle_i), center + radius * math.sin(angle_i)))
+            surface = pygame.Surface((big, big), pygame.SRCALPHA)
+            pygame.draw.polygon(surface, YELLOW, points)
+            pygame.draw.polygon(surface, BLACK, points, 2 * self.SUPERSAMPLE)
+            sprite = pygame.transform.smoothscale(surface, (self.SIZE, self.SIZE))
+            if pygame.display.get_surface():
+                sprite = sprite.convert_alpha()
+            self.frames.append(sprite)
+    
+    def get(self, angle):
+        if self.frames is None:
+            self.build()
+        return self.frames[angle % 360 // self.ANGLE_STEP]
+
+coin_sprites = CoinSprites()
+
+class CoinStore:
+    """
+    A level's coins, indexed in a PlatformGrid with an alive flag per coin, so collecting
+    is a grid lookup and removing a coin is O(1). All coins share one spin angle, so a
+    step advances the animation once instead of once per coin. len() and iteration only
+    see coins that haven't been collected, like the plain coin list it replaces.
+    """
+    def __init__(self, coins=()):
+        self.coins = list(coins)
+        self.alive = bytearray([1]) * len(self.coins)
+        self.remaining = len(self.coins)
+        self.grid = PlatformGrid(self.coins)
         self.angle = 0
     
-    def update(self):
-        self.angle += 2
+    def __len__(self):
+        return self.remaining
     
-    def draw(self, screen):
-        # Draw rotating coin
-        center = self.rect.center
-        points = []
-        for i in range(8):
-            angle = self.angle + i * 45
-            x = center[0] + 15 * math.cos(math.radians(angle))
-            y = center[1] + 15 * math.sin(math.radians(angle))
-            points.append((x, y))
-        
-        pygame.draw.polygon(screen, self.color, points)
-        pygame.draw.polygon(screen, BLACK, points, 2)
+    def __iter__(self):
+        return (coin for coin, alive in zip(self.coins, self.alive) if alive)
+    
+    def update(self):
+        self.angle += CoinSprites.ANGLE_STEP
+    
+    def collect(self, rect):
+        """Remove every coin touching rect and return how many were collected"""
+        collected = 0
+        for index in self.grid.query_indices(rect):
+            if self.alive[index] and rect.colliderect(self.coins[index].rect):
+                self.alive[index] = 0
+                collected += 1
+        self.remaining -= collected
+        return collected
+    
+    def draw(self, screen, camera=None, spin=True):
+        """Draw the coins (only those in the camera's view) and return the rects they cover"""
+        angle = self.angle if spin else 0  # Not spinning, every coin is the same unturned sprite
+        if camera is None:
+            return [coin.draw(screen, angle) for coin in self]
+        # The coin sprite is a little bigger than the coin's rect
+        view = camera.get_view().inflate(CoinSprites.SIZE, CoinSprites.SIZE)
+        return [camera.draw(screen, self.coins[index], angle)
+                for index in self.grid.query_indices(view) if self.alive[index]]
 
 class Goal:
+    __slots__ = ('rect', 'color', 'is_door', 'door_open')
+    
     def __init__(self, x, y, is_door=False):
         self.rect = pygame.Rect(x, y, 60, 80)
         self.color = GREEN
@@ -833,6 +1217,8 @@ class Goal:
             ])
 
 class Spike:
+    __slots__ = ('rect', 'color')
+    
     def __init__(self, x, y, width=30, height=15):
         self.rect = pygame.Rect(x, y, width, height)
         self.color = (200, 200, 200)  # Silver/gray color for spikes
@@ -841,38 +1227,394 @@ class Spike:
         # Draw the base of the spike
         pygame.draw.rect(screen, self.color, (self.rect.x, self.rect.y + self.rect.height - 5, self.rect.width, 5))
         
-        # Draw the triangular spikes
-        num_spikes = self.rect.width // 10
-        for i in range(num_spikes):
-            spike_x = self.rect.x + i * 10 + 5
-            pygame.draw.polygon(screen, self.color, [
-                (spike_x - 5, self.rect.y + self.rect.height - 5),  # Bottom left
-                (spike_x, self.rect.y),                            # Top middle
-                (spike_x + 5, self.rect.y + self.rect.height - 5)   # Bottom right
+        # Draw the triangular spikes, one 10px tooth per 10px of width, from the pre-drawn strip
+        spike_strips.draw(screen, self.rect, self.color)
+
+class SpikeStrips:
+    """
+    A row of TEETH spike teeth per (height, colour), drawn once, so a spike bed of any
+    width is one blit per TEETH teeth instead of a polygon per tooth. Fewer teeth are the
+    right-hand end of the strip, which ends the way the last polygon drawn over a wide
+    spike ends (a tooth's right corner overlaps the next tooth's left one).
+    """
+    TEETH = 32
+    
+    def __init__(self):
+        self.strips = {}  # (height, colour) -> (strip Surface, its top relative to the spike)
+    
+    def get(self, height, color):
+        key = (height, tuple(color))
+        strip = self.strips.get(key)
+        if strip is None:
+            strip = self.strips[key] = self.build(*key)
+        return strip
+    
+    def build(self, height, color):
+        # The teeth run from the spike's top down to the top of its 5px base (up, for spikes
+        # under 5px tall)
+        top = min(0, height - 5)
+        base_y = height - 5 - top
+        tip_y = -top
+        surface = pygame.Surface((self.TEETH * 10 + 1, abs(height - 5) + 1), pygame.SRCALPHA)
+        for i in range(self.TEETH):
+            pygame.draw.polygon(surface, color, [
+                (i * 10, base_y),       # Bottom left
+                (i * 10 + 5, tip_y),    # Top middle
+                (i * 10 + 10, base_y)   # Bottom right
             ])
+        if pygame.display.get_surface():
+            surface = surface.convert_alpha()
+        return surface, top
+    
+    def draw(self, screen, rect, color):
+        """Draw the teeth of a spike occupying rect (not its base)"""
+        strip, top = self.get(rect.height, color)
+        x = rect.x
+        teeth = rect.width // 10
+        while teeth > 0:
+            count = min(teeth, self.TEETH)
+            width = count * 10 + 1
+            screen.blit(strip, (x, rect.y + top), (strip.get_width() - width, 0, width, strip.get_height()))
+            x += count * 10
+            teeth -= count
 
-class ExplosionParticle:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.size = random.randint(3, 8)
-        self.color = random.choice(EXPLOSION_COLORS)
-        self.vel_x = random.uniform(-5, 5)
-        self.vel_y = random.uniform(-8, -2)
+spike_strips = SpikeStrips()
+
+class Camera:
+    """
+    The part of the level on screen. follow() centres it on the living players, where they
+    are drawn this frame, and keeps it inside the level bounds, so a level no bigger than
+    the screen never scrolls. Drawing code subtracts (x, y) from level positions and skips
+    anything outside get_view().
+    """
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+    
+    def reset(self):
+        self.x = 0
+        self.y = 0
+    
+    def get_view(self):
+        """The visible part of the level, in level coordinates"""
+        return pygame.Rect(self.x, self.y, SCREEN_WIDTH, SCREEN_HEIGHT)
+    
+    def follow(self, players, alpha, level_bounds):
+        living = [player for player in players if not player.is_dying]
+        if not living or not level_bounds:
+            return  # Hold still while everyone's death animation plays
+        positions = [player.get_interpolated_position(alpha) for player in living]
+        center_x = sum(x for x, _ in positions) // len(positions) + living[0].rect.width // 2
+        center_y = sum(y for _, y in positions) // len(positions) + living[0].rect.height // 2
+        self.x = max(level_bounds.left, min(center_x - SCREEN_WIDTH // 2, level_bounds.right - SCREEN_WIDTH))
+        self.y = max(level_bounds.top, min(center_y - SCREEN_HEIGHT // 2, level_bounds.bottom - SCREEN_HEIGHT))
+    
+    def draw(self, surface, game_object, *args):
+        """Draw a level object where it is on screen; returns whatever its draw() returns"""
+        game_object.rect.move_ip(-self.x, -self.y)
+        drawn = game_object.draw(surface, *args)
+        game_object.rect.move_ip(self.x, self.y)
+        return drawn
+
+camera = Camera()
+
+class StaticLevelLayer:
+    """
+    The loaded level's platforms, spikes and goal drawn once in level coordinates onto
+    screen-sized chunk Surfaces in the display format, so a frame draws all of them with
+    a blit per chunk in view (one, for a level no bigger than the screen). Scrolling only
+    moves where the chunks are blitted; a chunk is drawn the first time it comes into view.
+    The chunks are dropped when the level is reloaded (a new platforms list), the door
+    opens or closes, or invalidate() is called, which setup_display() does whenever the
+    display mode changes. Past MAX_CHUNKS the least recently drawn chunk is dropped.
+    
+    Each chunk reaches MARGIN pixels past its edges, so shapes cut off by the chunk edge
+    are drawn whole up to it (pygame's clipped outlines and polygons can come out a pixel
+    different right at a surface edge); only the inside of a chunk is blitted.
+    """
+    MARGIN = 8
+    MAX_CHUNKS = 32
+    
+    def __init__(self):
+        self.chunks = OrderedDict()  # (column, row) -> Surface of that chunk plus the margin
+        self.chunk_size = None
+        self.level = None  # (platforms, spikes, goal) the chunks were drawn from
+        self.key = None
+        self.view = None  # Where the last frame was blitted from
+        self.platform_grid = None
+        self.spike_grid = None
+    
+    def invalidate(self):
+        self.chunks.clear()
+        self.view = None
+    
+    def build_chunk(self, column, row, goal, background_color):
+        """Draw the objects on one chunk (and its margin)"""
+        margin = self.MARGIN
+        width, height = self.chunk_size
+        area = pygame.Rect(column * width, row * height, width, height).inflate(margin * 2, margin * 2)
+        if background_color is None:
+            chunk = pygame.Surface(area.size, pygame.SRCALPHA).convert_alpha()
+            chunk.fill((0, 0, 0, 0))
+        else:
+            chunk = pygame.Surface(area.size).convert()
+            chunk.fill(background_color)
+        
+        # Draw through a camera at the chunk's corner, so level positions land on the chunk
+        chunk_camera = Camera()
+        chunk_camera.x, chunk_camera.y = area.topleft
+        for platform in self.platform_grid.query(area):
+            chunk_camera.draw(chunk, platform)
+        for spike in self.spike_grid.query(area):
+            chunk_camera.draw(chunk, spike)
+        if goal:
+            chunk_camera.draw(chunk, goal)
+        return chunk
+    
+    def draw(self, screen, platforms, spikes, goal, background_color=None, camera=None):
+        """
+        Blit the level. With a background_color the layer is opaque and replaces screen.fill();
+        without one it is transparent, for drawing over a background that changes (the night sky).
+        Returns True if the layer changed everywhere on screen (it was redrawn or scrolled).
+        """
+        camera = camera or Camera()
+        level = (platforms, spikes, goal)
+        key = (goal.door_open if goal else None, background_color, screen.get_size())
+        if self.level is None or any(new is not old for new, old in zip(level, self.level)):
+            self.level = level
+            self.platform_grid = PlatformGrid(platforms)
+            self.spike_grid = PlatformGrid(spikes)
+            self.invalidate()
+        if key != self.key:
+            self.key = key
+            self.chunk_size = screen.get_size()
+            self.invalidate()
+        
+        view = pygame.Rect((camera.x, camera.y), screen.get_size())
+        changed = view != self.view
+        self.view = view
+        margin = self.MARGIN
+        width, height = self.chunk_size
+        inside = pygame.Rect(margin, margin, width, height)
+        for row in range(view.top // height, (view.bottom - 1) // height + 1):
+            for column in range(view.left // width, (view.right - 1) // width + 1):
+                chunk = self.chunks.get((column, row))
+                if chunk is None:
+                    chunk = self.chunks[(column, row)] = self.build_chunk(column, row, goal, background_color)
+                    changed = True
+                    if len(self.chunks) > self.MAX_CHUNKS:
+                        self.chunks.popitem(last=False)
+                else:
+                    self.chunks.move_to_end((column, row))
+                screen.blit(chunk, (column * width - view.x, row * height - view.y), inside)
+        return changed
+
+static_level_layer = StaticLevelLayer()
+
+class DirtyRegions:
+    """
+    Opt-in dirty-rectangle presenting (DIRTY_RECT_RENDERING), for software-rendered displays
+    where a full flip eats the frame. Drawing code add()s the bounds of whatever moved or
+    changed; present() then updates only those regions plus last frame's, so anything that
+    moved away is erased too. Frames that change everywhere pass full=True and flip.
+    """
+    def __init__(self, enabled=DIRTY_RECT_RENDERING):
+        self.enabled = enabled
+        self.current = []
+        self.previous = None  # None after a full frame, so the next one is full as well
+    
+    def add(self, rect):
+        if rect:  # Skip None and empty rects from draws that touched nothing
+            self.current.append(pygame.Rect(rect))
+    
+    def present(self, full=False):
+        if not self.enabled or full or self.previous is None:
+            logical_display.present()
+        else:
+            logical_display.present(self.previous + self.current)
+        self.previous = None if full else self.current
+        self.current = []
+
+class QualityGovernor:
+    """
+    Trades effects for frame rate on slow machines. record() is given the time each frame
+    took to update and draw (not counting the wait for the frame cap). Whenever window
+    frames have been recorded, their average is judged: over the frame budget drops quality
+    one QUALITY_LEVELS step, and RECOVERY_WINDOWS averages in a row under UP_THRESHOLD of
+    the budget raise it one step again, so a brief quiet moment doesn't bring back the
+    effects that slowed the game down. Effects read the current level from settings.
+    """
+    UP_THRESHOLD = 0.6  # Share of the frame budget used that counts as headroom
+    RECOVERY_WINDOWS = 3
+    
+    def __init__(self, budget=1.0 / FPS, window=QUALITY_WINDOW, enabled=ADAPTIVE_QUALITY):
+        self.budget = budget
+        self.enabled = enabled
+        self.frame_times = deque(maxlen=window)
+        self.average = 0.0  # Seconds per frame over the last full window
+        self.calm_windows = 0  # Windows in a row with headroom
+        self.set_level(0)
+    
+    def set_level(self, level):
+        self.level = level
+        self.settings = QUALITY_LEVELS[level]
+        self.frame_times.clear()  # Judge the new level on its own frames
+        self.calm_windows = 0
+    
+    def record(self, frame_time):
+        if not self.enabled:
+            return
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+        self.average = sum(self.frame_times) / len(self.frame_times)
+        self.frame_times.clear()
+        if self.average > self.budget:
+            self.calm_windows = 0
+            if self.level < len(QUALITY_LEVELS) - 1:
+                self.set_level(self.level + 1)
+        elif self.average < self.budget * self.UP_THRESHOLD:
+            self.calm_windows += 1
+            if self.calm_windows >= self.RECOVERY_WINDOWS and self.level > 0:
+                self.set_level(self.level - 1)
+        else:
+            self.calm_windows = 0
+    
+    def draw_overlay(self, screen, font):
+        """Draw the frame time and every effect's current level in the top right corner"""
+        settings = self.settings
+        lines = [
+            f"Frame {self.average * 1000:.1f} ms / {self.budget * 1000:.1f} ms budget",
+            f"Quality {len(QUALITY_LEVELS) - self.level}/{len(QUALITY_LEVELS)}" + ("" if self.enabled else " (fixed)"),
+            f"Particles {settings['particles']:.0%}",
+            f"Stars {settings['stars']:.0%}",
+            f"Coin spin {'on' if settings['coin_spin'] else 'off'}",
+            f"Flash {'on' if settings['flash'] else 'off'}",
+        ]
+        texts = [text_cache.render(font, line, True, WHITE) for line in lines]
+        line_height = font.get_linesize()
+        box = pygame.Rect(0, 0, max(text.get_width() for text in texts) + 20, line_height * len(texts) + 16)
+        box.topright = (screen.get_width() - 10, 10)
+        pygame.draw.rect(screen, BLACK, box)
+        for i, text in enumerate(texts):
+            screen.blit(text, (box.x + 10, box.y + 8 + i * line_height))
+        return box
+
+quality_governor = QualityGovernor()
+
+class ParticlePool:
+    """
+    Every explosion particle in the game, held in preallocated NumPy arrays. update()
+    moves all live particles in one vectorized step and dead slots are reused by the next
+    explosion. Each particle remembers the player that spawned it, so a player's death
+    animation draws its own particles and they vanish when it respawns.
+    Without NumPy the game runs without explosion particles.
+    """
+    def __init__(self, capacity=PARTICLE_POOL_SIZE):
+        self.capacity = capacity
+        self.enabled = numpy is not None
+        self.circle_sprites = {}  # (color index, radius) -> pre-drawn circle
+        if not self.enabled:
+            return
+        self.x = numpy.zeros(capacity)
+        self.y = numpy.zeros(capacity)
+        self.vel_x = numpy.zeros(capacity)
+        self.vel_y = numpy.zeros(capacity)
+        self.size = numpy.zeros(capacity)
+        self.life = numpy.zeros(capacity, dtype=numpy.int64)   # Frames left, 0 for a free slot
+        self.color = numpy.zeros(capacity, dtype=numpy.int64)  # Index into EXPLOSION_COLORS
+        self.owner = numpy.zeros(capacity, dtype=numpy.int64)  # player_num of the spawning player
         self.gravity = 0.2
-        self.life = random.randint(20, 40)  # Frames the particle will live
+        self.rng = numpy.random.default_rng()
+    
+    def seed(self, seed):
+        if self.enabled:
+            self.rng = numpy.random.default_rng(seed)
+    
+    def spawn(self, x, y, count, owner):
+        """Burst count particles out of (x, y) in all directions, using free slots only"""
+        if not self.enabled:
+            return
+        slots = numpy.flatnonzero(self.life <= 0)[:count]
+        count = len(slots)
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vel_x[slots] = self.rng.uniform(-10, 10, count)
+        self.vel_y[slots] = self.rng.uniform(-10, 10, count)
+        self.size[slots] = self.rng.integers(3, 9, count)
+        self.life[slots] = self.rng.integers(20, 41, count)
+        self.color[slots] = self.rng.integers(0, len(EXPLOSION_COLORS), count)
+        self.owner[slots] = owner
     
     def update(self):
-        self.vel_y += self.gravity
-        self.x += self.vel_x
-        self.y += self.vel_y
-        self.life -= 1
+        if not self.enabled:
+            return
+        live = self.life > 0
+        if not live.any():
+            return
+        self.vel_y[live] += self.gravity
+        self.x[live] += self.vel_x[live]
+        self.y[live] += self.vel_y[live]
+        self.life[live] -= 1
         # Fade out by reducing size
-        if self.life < 10:
-            self.size = max(1, self.size - 0.2)
-    
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(self.size))
+        fading = live & (self.life < 10)
+        self.size[fading] = numpy.maximum(1, self.size[fading] - 0.2)
+    
+    def release(self, owner):
+        """Free every particle spawned by owner"""
+        if self.enabled:
+            self.life[self.owner == owner] = 0
+    
+    def get_circle_sprite(self, color_index, radius):
+        key = (color_index, radius)
+        sprite = self.circle_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((radius * 2, radius * 2))
+            sprite.set_colorkey(BLACK)
+            pygame.draw.circle(sprite, EXPLOSION_COLORS[color_index], (radius, radius), radius)
+            self.circle_sprites[key] = sprite
+        return sprite
+    
+    def get_bounds(self, owner):
+        """Rect around owner's live particles, or None if it has none"""
+        if not self.enabled:
+            return None
+        slots = numpy.flatnonzero((self.life > 0) & (self.owner == owner))
+        if len(slots) == 0:
+            return None
+        radius = int(self.size[slots].max()) + 1
+        left = int(self.x[slots].min()) - radius
+        top = int(self.y[slots].min()) - radius
+        return pygame.Rect(left, top, int(self.x[slots].max()) + radius - left + 1,
+                           int(self.y[slots].max()) + radius - top + 1)
+    
+    def draw(self, screen, owner, offset=(0, 0)):
+        """Draw owner's live particles with a single blits() call, shifted back by offset (the camera)"""
+        if not self.enabled:
+            return
+        slots = numpy.flatnonzero((self.life > 0) & (self.owner == owner))
+        if len(slots) == 0:
+            return
+        xs = self.x[slots].astype(int) - offset[0]
+        ys = self.y[slots].astype(int) - offset[1]
+        radii = self.size[slots].astype(int)
+        colors = self.color[slots]
+        screen.blits([(self.get_circle_sprite(color, radius), (x - radius, y - radius))
+                      for x, y, radius, color in zip(xs.tolist(), ys.tolist(), radii.tolist(), colors.tolist())],
+                     doreturn=False)
+
+particle_pool = ParticlePool()
+
+# All of the game's randomness (stars, explosions) comes from here; seed_session() makes it repeatable
+session_rng = random.Random()
+
+def seed_session(seed=None):
+    """Start a new session RNG. The same seed gives the same stars and explosions on every machine."""
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    session_rng.seed(seed)
+    particle_pool.seed(seed)
+    return seed
 
 class LevelManager:
     def __init__(self):
@@ -882,6 +1624,11 @@ class LevelManager:
         self.available_levels = self.scan_available_levels()
         self.max_worlds = max([level['world'] for level in self.available_levels]) if self.available_levels else 1
         self.max_levels = max([level['level'] for level in self.available_levels if level['world'] == self.current_world]) if self.available_levels else 1
+        self.collision_platforms = []  # Coalesced colliders for the loaded level
+        self.colliders_removed = 0
+        self.platform_grid = None  # Spatial hash over collision_platforms
+        self.hazard_grid = None  # Spatial hash over the loaded level's spikes
+        self.level_bounds = None  # Rect holding the whole loaded level, see calculate_level_bounds()
     
     def scan_available_levels(self):
         """Scan the levels directory for available JSON level files"""
@@ -965,10 +1712,28 @@ class LevelManager:
         
         total_coins = len(coins)
         
+        # Build the collision geometry once per level load
+        self.build_colliders(platforms, spikes)
+        
         # Store additional level info
         self.current_level_data = level_data
-        
-        return platforms, coins, total_coins, spikes
+        self.level_bounds = self.calculate_level_bounds(platforms, coins, spikes, level_data)
+        
+        return platforms, CoinStore(coins), total_coins, spikes
+    
+    def calculate_level_bounds(self, platforms, coins, spikes, level_data):
+        """
+        The rect holding every object, goal and spawn point in the level, and at least the
+        screen. The camera scrolls within it and players die once they fall out of its bottom.
+        """
+        bounds = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        for game_object in platforms + coins + spikes:
+            bounds.union_ip(game_object.rect)
+        goal_data = level_data.get('goal', {})
+        bounds.union_ip(pygame.Rect(goal_data.get('x', SCREEN_WIDTH - 100), goal_data.get('y', SCREEN_HEIGHT - 120), 60, 80))
+        for spawn in level_data.get('player_spawns', []):
+            bounds.union_ip(pygame.Rect(spawn.get('x', 0), spawn.get('y', 0), 40, 40))
+        return bounds
     
     def create_fallback_level(self):
         """Create a simple fallback level if JSON loading fails"""
@@ -978,10 +1743,22 @@ class LevelManager:
             Platform(0, 0, 20, SCREEN_HEIGHT - 40),
             Platform(SCREEN_WIDTH - 20, 0, 20, SCREEN_HEIGHT - 40),
         ]
-        coins = [Coin(250, SCREEN_HEIGHT - 200)]
+        coins = CoinStore([Coin(250, SCREEN_HEIGHT - 200)])
         spikes = []
+        self.build_colliders(platforms, spikes)
+        self.level_bounds = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
         return platforms, coins, 1, spikes
     
+    def build_colliders(self, platforms, spikes=()):
+        """Coalesce the level's platforms into collision rects and index them and the spikes in spatial grids"""
+        # The original platforms are still returned to the caller for drawing
+        self.collision_platforms, self.colliders_removed = coalesce_platforms(platforms)
+        self.platform_grid = PlatformGrid(self.collision_platforms)
+        self.hazard_grid = HazardGrid(list(spikes))
+        if self.colliders_removed and LOG_COLLIDER_COALESCING:
+            print(f"Coalesced {len(platforms)} platforms into {len(self.collision_platforms)} colliders "
+                  f"({self.colliders_removed} removed)")
+    
     def get_level(self):
         return self.load_level_from_json(self.current_world, self.current_level)
     
@@ -1480,7 +2257,19 @@ def create_goal_from_level_data(level_manager):
     
     return Goal(x, y, is_door)
 
-def update_player_spawn_points(level_manager, player1, player2):
+def create_players(num_players=NUM_PLAYERS, physics=FloatPhysics):
+    """Create the players, placed at their level select start positions"""
+    players = []
+    for index in range(num_players):
+        x, y = get_level_select_start(index)
+        players.append(Player(x, y, PLAYER_COLORS[index % len(PLAYER_COLORS)], index + 1, physics))
+    return players
+
+def get_level_select_start(index):
+    """Start position in the World 1 area of the level select map (rows of four)"""
+    return 150 + (index % 4) * 50, SCREEN_HEIGHT - 100 - (index // 4) * 45
+
+def update_player_spawn_points(level_manager, players):
     """Update player spawn coordinates based on current level data"""
     level_data = level_manager.get_current_level_data()
     player_spawns = level_data.get('player_spawns', [
@@ -1488,33 +2277,567 @@ def update_player_spawn_points(level_manager, player1, player2):
         {'x': 150, 'y': SCREEN_HEIGHT - 100}
     ])
     
-    player1.spawn_x = player_spawns[0]['x']
-    player1.spawn_y = player_spawns[0]['y']
-    player2.spawn_x = player_spawns[1]['x']
-    player2.spawn_y = player_spawns[1]['y']
+    taken = []  # Rects of the spawn slots handed out so far
+    for index, player in enumerate(players):
+        # Levels define two spawns; extra players get a free slot around them
+        spawn = player_spawns[index % len(player_spawns)]
+        if index < len(player_spawns):
+            x, y = spawn['x'], spawn['y']
+        else:
+            x, y = find_spawn_slot(level_manager, spawn['x'], spawn['y'], taken,
+                                   index // len(player_spawns))
+        player.spawn_x = x
+        player.spawn_y = y
+        taken.append(pygame.Rect(x, y, 40, 40))
+
+def find_spawn_slot(level_manager, spawn_x, spawn_y, taken, row):
+    """
+    Top-left of the free spawn slot nearest (spawn_x, spawn_y) for an extra player: up to
+    SPAWN_STACK_ROWS deep on top of the spawn, then in columns beside it, alternating right
+    and left across the level, then the same again SPAWN_STACK_ROWS higher. A slot must be
+    inside the level, clear of platforms, spikes and the other players' slots, with a
+    platform somewhere below to land on. With no such slot (a full level) the player stacks
+    row rows above the spawn, as they all used to.
+    """
+    bounds = level_manager.level_bounds or pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+    platform_grid = level_manager.platform_grid
+    hazard_grid = level_manager.hazard_grid
+    rows = (spawn_y - bounds.top) // 45 + 1  # Rows that fit between the spawn and the level top
+    for first_row in range(0, rows, SPAWN_STACK_ROWS):
+        for column in range(2 * (bounds.width // 45) + 1):
+            offset = (column + 1) // 2 * 45 * (1 if column % 2 else -1)
+            for stack_row in range(first_row, min(first_row + SPAWN_STACK_ROWS, rows)):
+                slot = pygame.Rect(spawn_x + offset, spawn_y - stack_row * 45, 40, 40)
+                if is_free_spawn_slot(slot, bounds, platform_grid, hazard_grid, taken):
+                    return slot.topleft
+    return spawn_x, spawn_y - row * 45
+
+def is_free_spawn_slot(slot, bounds, platform_grid, hazard_grid, taken):
+    """Whether a player can spawn at slot (see find_spawn_slot)"""
+    if not bounds.contains(slot) or slot.collidelist(taken) != -1:
+        return False
+    if platform_grid and any(slot.colliderect(platform.rect) for platform in platform_grid.query(slot)):
+        return False
+    if hazard_grid and any(slot.colliderect(spike.rect) for spike in hazard_grid.query(slot)):
+        return False
+    # Something to land on, so the player doesn't fall out of the level as it spawns
+    below = pygame.Rect(slot.x, slot.bottom, slot.width, max(1, bounds.bottom - slot.bottom))
+    return not platform_grid or any(below.colliderect(platform.rect) for platform in platform_grid.query(below))
+
+def players_needed(players):
+    """How many players have to be at the goal or a portal together (see GOAL_PLAYERS_NEEDED)"""
+    return min(len(players), GOAL_PLAYERS_NEEDED)
+
+def players_needed_text(num_players=NUM_PLAYERS):
+    """"all players", or how many are needed when that is fewer, for on-screen instructions"""
+    needed = min(num_players, GOAL_PLAYERS_NEEDED)
+    return "all players" if needed == num_players else f"{needed} players"
+
+def enough_players_at(rect, players):
+    """Whether at least players_needed() of the players are touching rect"""
+    touching = sum(1 for player in players if rect.colliderect(player.rect))
+    return touching >= players_needed(players)
+
+def find_nearby_players(players, margin=PLAYER_SWEEP_MARGIN):
+    """
+    Sort-and-sweep broad phase on x. Returns {player: [other players within margin on x]},
+    each list in the original players order so collisions resolve the same as a full scan.
+    """
+    nearby = {player: [] for player in players}
+    order = {player: index for index, player in enumerate(players)}
+    extents = sorted((player.get_sweep_extent(), order[player], player) for player in players)
+    active = []  # (right edge, player) of everyone still overlapping the sweep line
+    for (left, right), _, player in extents:
+        # Drop players that end too far left to reach this one (or anything after it)
+        active = [(other_right, other) for other_right, other in active if left - other_right <= margin]
+        for _, other in active:
+            nearby[player].append(other)
+            nearby[other].append(player)
+        active.append((right, player))
+    
+    for others in nearby.values():
+        others.sort(key=order.get)
+    return nearby
+
+def update_players(players, platforms, coins, keys_pressed, platform_grid=None, level_bounds=None, particles=None,
+                   camera=None):
+    """
+    Update every player, testing player-vs-player contact only for pairs close on x.
+    particles is the players' ParticlePool (the game's own if not given) and camera the
+    view death animations rise in (none: the screen).
+    """
+    nearby = find_nearby_players(players)
+    for player in players:
+        player.update(platforms, coins, keys_pressed, nearby[player], platform_grid, level_bounds, particles, camera)
+    (particles or particle_pool).update()  # All death explosions in one step
+
+def update_playing_state(players, platforms, coins, spikes, goal, keys_pressed, platform_grid=None, hazard_grid=None,
+                         level_bounds=None, particles=None, camera=None):
+    """
+    Advance one physics step of a level: players, coins, spikes, goal and door.
+    Returns (spike_collision, level_won). Shared by main() and HeadlessGame, which pass
+    their own particles and camera (see update_players).
+    """
+    update_players(players, platforms, coins, keys_pressed, platform_grid, level_bounds, particles, camera)
+    
+    # Check for spike collisions, only against spikes near each living player
+    if hazard_grid is None:
+        hazard_grid = HazardGrid(spikes)
+    spike_collision = False
+    for player, spike in hazard_grid.contacts(players):
+        if not player.is_dying:  # First spike touched kills, the rest don't matter
+            player.start_death_animation(particles, camera)
+            spike_collision = True
+    
+    coins.update()
+    
+    # Check win condition - enough players have to reach the goal together
+    level_won = bool(goal and len(coins) == 0 and enough_players_at(goal.rect, players))
+    
+    # Update player faces and door based on coin collection
+    for player in players:
+        player.happy_face = len(coins) == 0
+    if goal and goal.is_door:
+        goal.door_open = len(coins) == 0
+    
+    return spike_collision, level_won
+
+class KeyState:
+    """Stand-in for pygame.key.get_pressed() built from the set of keys held this step"""
+    def __init__(self, held_keys=()):
+        self.held_keys = set(held_keys)
+    
+    def __getitem__(self, key):
+        return key in self.held_keys
+
+class HeadlessGame:
+    """
+    Runs a level's game logic with no window and no audio, as fast as the CPU allows.
+    Used for automated level testing and performance runs:
+    
+        game = HeadlessGame(world=1, level=1)
+        state = game.step({pygame.K_d, pygame.K_RIGHT})
+    
+    With deterministic=True the players use FixedPointPhysics, so replaying the same seed
+    and input frames gives the same state_checksum() on every machine.
+    
+    Each instance has its own camera (following its players, as main() does on screen),
+    explosion particles and seed, passed to the players each step, and leaves the game's
+    camera, particle_pool and session_rng alone, so several can run side by side, or next
+    to the game.
+    """
+    def __init__(self, world=1, level=1, level_manager=None, num_players=NUM_PLAYERS,
+                 deterministic=False, seed=None):
+        self.level_manager = level_manager or LevelManager()
+        self.camera = Camera()
+        self.particle_pool = ParticlePool()
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)  # Keep it to replay this run
+        self.particle_pool.seed(self.seed)
+        self.players = create_players(num_players, FixedPointPhysics if deterministic else FloatPhysics)
+        self.load_level(world, level)
+    
+    def load_level(self, world, level):
+        """Load a level through LevelManager and put every player on its spawn"""
+        self.level_manager.current_world = world
+        self.level_manager.current_level = level
+        self.platforms, self.coins, self.total_coins, self.spikes = self.level_manager.get_level()
+        self.goal = create_goal_from_level_data(self.level_manager)
+        
+        update_player_spawn_points(self.level_manager, self.players)
+        for player in self.players:
+            player.is_dying = False
+            player.rect.width = 40
+            player.rect.height = 40
+            player.respawn(self.particle_pool)
+            player.collected_coins = 0
+        
+        self.camera.reset()
+        self.camera.follow(self.players, 1, self.level_manager.level_bounds)
+        self.frame = 0
+        self.deaths = 0
+        self.level_complete = False
+    
+    def step(self, inputs=()):
+        """
+        Advance one physics step. inputs is the collection of pygame key codes held down
+        this step (see PLAYER_CONTROLS). Returns the new state.
+        """
+        if not self.level_complete:
+            was_dying = [player.is_dying for player in self.players]
+            _, level_won = update_playing_state(
+                self.players, self.platforms, self.coins, self.spikes, self.goal,
+                KeyState(inputs), self.level_manager.platform_grid, self.level_manager.hazard_grid,
+                self.level_manager.level_bounds, self.particle_pool, self.camera)
+            self.camera.follow(self.players, 1, self.level_manager.level_bounds)
+            
+            # Count deaths from spikes and from falling off the screen
+            for player, dying_before in zip(self.players, was_dying):
+                if player.is_dying and not dying_before:
+                    self.deaths += 1
+            self.level_complete = level_won
+        
+        self.frame += 1
+        return self.get_state()
+    
+    def run(self, input_frames):
+        """Step once per entry of input_frames and return the final state"""
+        state = self.get_state()
+        for inputs in input_frames:
+            state = self.step(inputs)
+        return state
+    
+    def get_state(self):
+        """Snapshot of the simulation as plain Python data"""
+        players = []
+        for player in self.players:
+            players.append({
+                'x': player.rect.x,
+                'y': player.rect.y,
+                'vel_x': player.vel_x,
+                'vel_y': player.vel_y,
+                'on_ground': player.on_ground,
+                'is_dying': player.is_dying,
+                'collected_coins': player.collected_coins,
+            })
+        return {
+            'frame': self.frame,
+            'world': self.level_manager.current_world,
+            'level': self.level_manager.current_level,
+            'players': players,
+            'coins_remaining': len(self.coins),
+            'total_coins': self.total_coins,
+            'deaths': self.deaths,
+            'level_complete': self.level_complete,
+        }
+    
+    def state_checksum(self):
+        """CRC of get_state(), for spotting lockstep peers or replays that have diverged"""
+        return zlib.crc32(json.dumps(self.get_state(), sort_keys=True).encode())
+
+class BatchPhysics:
+    """
+    Struct-of-arrays version of Player.update for simulating many agents at once
+    (bots, level testing). Every agent follows the same movement, wall-jump, platform,
+    fall and spike rules as a Player, but agents pass through each other and do not
+    collect coins. Needs NumPy:
+    
+        level_manager.get_level()
+        physics = BatchPhysics(level_manager.collision_platforms, [(100, 500)], 1000, spikes)
+        physics.step(move_left, move_right, jump)  # one bool array per input
+    """
+    def __init__(self, platforms, spawns, num_agents, spikes=(), level_bounds=None):
+        if numpy is None:
+            raise ImportError("BatchPhysics needs NumPy")
+        self.fall_limit = level_bounds.bottom if level_bounds else SCREEN_HEIGHT
+        
+        # Platforms and spikes as (left, top, right, bottom) rows, in level order so the
+        # first hit matches the first platform Player.update would resolve against
+        self.platform_rects = self.rects_to_array([platform.rect for platform in platforms])
+        # Walls are the level platforms merged colliders were made from, so each one counts as
+        # its own wall for wall jumps, as it does for a Player
+        if platforms and all(isinstance(platform, MergedPlatform) for platform in platforms):
+            walls = merged_parts(platforms)
+        else:
+            walls = platforms
+        self.wall_rects = self.rects_to_array([wall.rect for wall in walls])
+        self.spike_rects = self.rects_to_array([spike.rect for spike in spikes])
+        
+        # Agent i starts on spawns[i % len(spawns)]
+        self.spawn_x = numpy.array([spawns[i % len(spawns)][0] for i in range(num_agents)], dtype=numpy.int64)
+        self.spawn_y = numpy.array([spawns[i % len(spawns)][1] for i in range(num_agents)], dtype=numpy.int64)
+        self.size = 40
+        
+        self.x = self.spawn_x.copy()
+        self.y = self.spawn_y.copy()
+        self.vel_x = numpy.zeros(num_agents)
+        self.vel_y = numpy.zeros(num_agents)
+        self.on_ground = numpy.zeros(num_agents, dtype=bool)
+        self.touching_wall = numpy.zeros(num_agents, dtype=bool)
+        self.can_wall_jump = numpy.zeros(num_agents, dtype=bool)
+        self.wall_jump_direction = numpy.zeros(num_agents, dtype=numpy.int64)
+        self.bounce_timer = numpy.zeros(num_agents, dtype=numpy.int64)
+        self.last_wall = numpy.full(num_agents, -1, dtype=numpy.int64)  # Platform index, -1 for none
+        self.death_timer = numpy.zeros(num_agents, dtype=numpy.int64)   # > 0 while dying
+        self.deaths = numpy.zeros(num_agents, dtype=numpy.int64)
+        self.frame = 0
+    
+    @staticmethod
+    def rects_to_array(rects):
+        # Zero-size rects never collide in pygame, so leave them out
+        rows = [(rect.left, rect.top, rect.right, rect.bottom) for rect in rects
+                if rect.width > 0 and rect.height > 0]
+        return numpy.array(rows, dtype=numpy.int64).reshape(-1, 4)
+    
+    def first_overlap(self, rects, mask, touching=None):
+        """
+        For each agent in mask, whether it overlaps any of rects (same test as
+        Rect.colliderect) or the rect index in touching, and the index of the first one
+        """
+        num_agents = len(self.x)
+        if len(rects) == 0:
+            return numpy.zeros(num_agents, dtype=bool), numpy.zeros(num_agents, dtype=numpy.int64)
+        left = self.x[:, None]
+        top = self.y[:, None]
+        overlap = ((left < rects[:, 2]) & (rects[:, 0] < left + self.size) &
+                   (top < rects[:, 3]) & (rects[:, 1] < top + self.size))
+        if touching is not None:
+            overlap |= numpy.arange(len(rects)) == touching[:, None]
+        overlap &= mask[:, None]
+        return overlap.any(axis=1), overlap.argmax(axis=1)
+    
+    def time_of_impact(self, move, axis, rects):
+        """
+        Player.time_of_impact for every agent at once, along x (axis 0) or y (axis 1),
+        against rects (platform_rects or wall_rects). Returns the moves clamped to the
+        first rect in the way and that rect's index (-1 where nothing is hit).
+        """
+        if len(rects) == 0:
+            return move, numpy.full(len(move), -1, dtype=numpy.int64)
+        pos = (self.x, self.y)[axis][:, None]
+        across = (self.y, self.x)[axis][:, None]
+        steps = move[:, None]
+        
+        # Gap between each agent's leading face and each platform's facing side
+        gap = numpy.where(steps > 0, rects[:, axis] - (pos + self.size), pos - rects[:, axis + 2])
+        in_path = ((gap >= 0) & (gap < numpy.abs(steps)) &
+                   (rects[:, 1 - axis] < across + self.size) & (across < rects[:, 3 - axis]))
+        gap = numpy.where(in_path, gap, numpy.iinfo(numpy.int64).max)
+        
+        first = gap.argmin(axis=1)  # Ties go to the first platform in level order
+        hit = in_path.any(axis=1)
+        nearest = gap[numpy.arange(len(move)), first]
+        move = numpy.where(hit, numpy.sign(move) * nearest, move)
+        return move, numpy.where(hit, first, -1)
+    
+    def step(self, move_left, move_right, jump):
+        """Advance every agent one physics step. Inputs are bool arrays, one entry per agent."""
+        move_left = numpy.asarray(move_left, dtype=bool)
+        move_right = numpy.asarray(move_right, dtype=bool)
+        jump = numpy.asarray(jump, dtype=bool)
+        
+        # Dying agents only count down, then respawn (Player.update_death_animation)
+        dying = self.death_timer > 0
+        self.death_timer[dying] -= 1
+        respawning = dying & (self.death_timer == 0)
+        self.x[respawning] = self.spawn_x[respawning]
+        self.y[respawning] = self.spawn_y[respawning]
+        self.vel_x[respawning] = 0
+        self.vel_y[respawning] = 0
+        self.last_wall[respawning] = -1
+        self.can_wall_jump[respawning] = False
+        active = ~dying
+        
+        # Bounce timer forces the wall-jump velocity and ignores the wall just left
+        bouncing = active & (self.bounce_timer > 0)
+        self.bounce_timer[bouncing] -= 1
+        self.vel_x[bouncing] = self.wall_jump_direction[bouncing] * MOVE_SPEED * 1.5
+        
+        # Input (left wins over right, like Player.update)
+        going_left = active & move_left
+        going_right = active & move_right & ~move_left
+        coasting = active & ~move_left & ~move_right
+        self.vel_x[going_left] = -MOVE_SPEED
+        self.vel_x[going_right] = MOVE_SPEED
+        self.vel_x[coasting] *= FRICTION
+        
+        jumping = active & jump & (self.bounce_timer <= 0) & (self.on_ground | self.can_wall_jump)
+        self.vel_y[jumping] = JUMP_STRENGTH
+        wall_jumping = jumping & self.can_wall_jump
+        self.vel_x[wall_jumping] = self.wall_jump_direction[wall_jumping] * MOVE_SPEED * 1.5
+        self.can_wall_jump[wall_jumping] = False
+        self.bounce_timer[wall_jumping] = 10
+        
+        self.vel_y[active] += GRAVITY
+        
+        # Move horizontally up to the first wall in the way; only the first platform hit
+        # pushes back, as in Player.update
+        dx = numpy.where(active, numpy.trunc(self.vel_x), 0).astype(numpy.int64)
+        dx, wall = self.time_of_impact(dx, 0, self.wall_rects)
+        self.x += dx
+        hit, first = self.first_overlap(self.wall_rects, active, wall)
+        hit_rects = self.wall_rects[first] if len(self.wall_rects) else None
+        hit_right = hit & (self.vel_x > 0)
+        hit_left = hit & (self.vel_x < 0)
+        if hit_rects is not None:
+            self.x[hit_right] = hit_rects[hit_right, 0] - self.size
+            self.x[hit_left] = hit_rects[hit_left, 2]
+        wall_contact = (hit_right | hit_left) & ~(bouncing & (first == self.last_wall))
+        self.touching_wall = numpy.where(active, wall_contact, self.touching_wall)
+        self.wall_jump_direction[hit_right & wall_contact] = -1
+        self.wall_jump_direction[hit_left & wall_contact] = 1
+        self.vel_x[hit] = 0
+        
+        # Enable wall jump on a new wall while in the air
+        new_wall = wall_contact & ~self.on_ground & (first != self.last_wall)
+        self.can_wall_jump[new_wall] = True
+        self.last_wall[new_wall] = first[new_wall]
+        
+        # Move vertically up to the first floor or ceiling in the way
+        dy = numpy.where(active, numpy.trunc(self.vel_y), 0).astype(numpy.int64)
+        dy, floor = self.time_of_impact(dy, 1, self.platform_rects)
+        self.y += dy
+        hit, first = self.first_overlap(self.platform_rects, active, floor)
+        hit_rects = self.platform_rects[first] if len(self.platform_rects) else None
+        landed = hit & (self.vel_y > 0)
+        bumped = hit & (self.vel_y < 0)
+        if hit_rects is not None:
+            self.y[landed] = hit_rects[landed, 1] - self.size
+            self.y[bumped] = hit_rects[bumped, 3]
+        self.vel_y[hit] = 0
+        self.on_ground = numpy.where(active, landed, self.on_ground)
+        self.last_wall[active & self.on_ground] = -1
+        
+        # Falling off the level or touching a spike starts the death countdown
+        fell = active & (self.y > self.fall_limit)
+        spiked, _ = self.first_overlap(self.spike_rects, active & ~fell)
+        killed = fell | spiked
+        self.death_timer[killed] = 90
+        self.deaths[killed] += 1
+        
+        self.frame += 1
+    
+    def get_state(self):
+        """Current arrays by name (live views, copy them to keep a snapshot)"""
+        return {
+            'frame': self.frame,
+            'x': self.x,
+            'y': self.y,
+            'vel_x': self.vel_x,
+            'vel_y': self.vel_y,
+            'on_ground': self.on_ground,
+            'is_dying': self.death_timer > 0,
+            'deaths': self.deaths,
+        }
 
 # Create a Star class for the night sky background
-class Star:
-    def __init__(self):
-        self.x = random.randint(0, SCREEN_WIDTH)
-        self.y = random.randint(0, SCREEN_HEIGHT - 100)  # Keep stars above ground level
-        self.size = random.randint(1, 3)
-        self.twinkle_speed = random.uniform(0.01, 0.05)
-        self.brightness = random.uniform(0.5, 1.0)
-        self.twinkle_offset = random.uniform(0, 2 * math.pi)
+class Starfield:
+    """
+    The night sky's stars, held in NumPy arrays. update() works out every star's twinkle
+    in one vectorized step and draw() writes the star pixels straight into a cached layer
+    of the sky colour through surfarray, then blits the layer - which also replaces the
+    screen.fill() under the stars. Stars are spread over bounds (the level) and only the
+    ones in the camera's view are drawn, so a big level's thousands of stars cost little
+    more than a screenful. Without NumPy the stars are drawn one circle at a time.
+    """
+    def __init__(self, count=STAR_COUNT, bounds=None):
+        self.bounds = bounds or pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.x, self.y, self.size, self.twinkle_speed, self.twinkle_offset = [], [], [], [], []
+        for _ in range(count):
+            self.x.append(session_rng.randint(self.bounds.left, self.bounds.right))
+            self.y.append(session_rng.randint(self.bounds.top, self.bounds.bottom - 100))  # Keep stars above ground level
+            self.size.append(session_rng.randint(1, 3))
+            self.twinkle_speed.append(session_rng.uniform(0.01, 0.05))
+            self.twinkle_offset.append(session_rng.uniform(0, 2 * math.pi))
+        self.brightness = [1.0] * count
+        self.shown = count  # Only the first stars are drawn at lower quality (set_density())
+        if numpy is not None:
+            self.x, self.y, self.size = numpy.array(self.x), numpy.array(self.y), numpy.array(self.size)
+            self.twinkle_speed, self.twinkle_offset = numpy.array(self.twinkle_speed), numpy.array(self.twinkle_offset)
+            self.brightness = numpy.ones(count)
+            # The pixels pygame.draw.circle() sets for each star size, around the star's centre
+            self.circle_offsets = {}
+            for radius in numpy.unique(self.size).tolist():
+                stamp = pygame.Surface((radius * 2 + 3, radius * 2 + 3))
+                pygame.draw.circle(stamp, WHITE, (radius + 1, radius + 1), radius)
+                self.circle_offsets[radius] = numpy.argwhere(pygame.surfarray.array_red(stamp)) - (radius + 1)
+        self.layer = None
+        self.layer_key = None  # (size, background colour) the layer was built for
+        self.view = None       # Camera view the star pixels were placed for
+        self.placed_shown = None  # self.shown when they were placed
+        self.rects = []        # Each visible star's bounds on screen, for dirty-rect rendering
+    
+    @classmethod
+    def for_level(cls, level_bounds):
+        """As many stars per screenful as the default sky, spread over the whole level"""
+        screens = level_bounds.width * level_bounds.height / (SCREEN_WIDTH * SCREEN_HEIGHT)
+        return cls(round(STAR_COUNT * screens), level_bounds)
+    
+    def set_density(self, density):
+        """Draw only this share of the stars; they're in random order, so any share is spread evenly"""
+        self.shown = round(len(self.brightness) * density)
     
     def update(self, time):
         # Make stars twinkle by varying brightness
-        self.brightness = 0.5 + 0.5 * math.sin(time * self.twinkle_speed + self.twinkle_offset)
-    
-    def draw(self, screen):
-        # Calculate color based on brightness
-        color = (int(STAR_COLOR[0] * self.brightness), 
-                 int(STAR_COLOR[1] * self.brightness), 
-                 int(STAR_COLOR[2] * self.brightness))
-        pygame.draw.circle(screen, color, (self.x, self.y), self.size)
+        if numpy is None:
+            self.brightness = [0.5 + 0.5 * math.sin(time * speed + offset)
+                               for speed, offset in zip(self.twinkle_speed, self.twinkle_offset)]
+        else:
+            self.brightness = 0.5 + 0.5 * numpy.sin(time * self.twinkle_speed + self.twinkle_offset)
+    
+    def place_stars(self, view):
+        """Work out the layer pixels of every star in view (level coordinates) and which star each is"""
+        self.view = view
+        self.placed_shown = self.shown
+        x, y = self.x[:self.shown], self.y[:self.shown]
+        visible = numpy.flatnonzero((x + 3 >= view.left) & (x - 3 < view.right) &
+                                    (y + 3 >= view.top) & (y - 3 < view.bottom))
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        pixels_x, pixels_y, pixels_star = [empty], [empty], [empty]
+        for radius, offsets in self.circle_offsets.items():
+            group = visible[self.size[visible] == radius]
+            group_x = (self.x[group] - view.left)[:, numpy.newaxis] + offsets[:, 0]
+            group_y = (self.y[group] - view.top)[:, numpy.newaxis] + offsets[:, 1]
+            pixels_x.append(group_x.ravel())
+            pixels_y.append(group_y.ravel())
+            pixels_star.append(numpy.repeat(group, len(offsets)))
+        pixels_x = numpy.concatenate(pixels_x)
+        pixels_y = numpy.concatenate(pixels_y)
+        pixels_star = numpy.concatenate(pixels_star)
+        # Drop pixels off the layer and put the rest back in star order, so overlapping
+        # stars cover each other the same way whatever their size
+        on_layer = numpy.flatnonzero((pixels_x >= 0) & (pixels_x < view.width) &
+                                     (pixels_y >= 0) & (pixels_y < view.height))
+        on_layer = on_layer[numpy.argsort(pixels_star[on_layer], kind='stable')]
+        self.pixels_x = pixels_x[on_layer]
+        self.pixels_y = pixels_y[on_layer]
+        self.pixels_star = pixels_star[on_layer]
+        
+        layer_rect = pygame.Rect((0, 0), view.size)
+        self.rects = [pygame.Rect(x - radius, y - radius, radius * 2, radius * 2).clip(layer_rect)
+                      for x, y, radius in zip((self.x[visible] - view.left).tolist(),
+                                              (self.y[visible] - view.top).tolist(),
+                                              self.size[visible].tolist())]
+    
+    def draw(self, screen, background_color, camera=None):
+        """Draw the sky and its stars over the whole screen; returns the stars' rects"""
+        view = camera.get_view() if camera else pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        view.size = screen.get_size()
+        if numpy is None:
+            screen.fill(background_color)
+            rects = []
+            for x, y, size, brightness in zip(self.x[:self.shown], self.y[:self.shown], self.size, self.brightness):
+                if not view.inflate(6, 6).collidepoint(x, y):
+                    continue
+                # Calculate color based on brightness
+                color = (int(STAR_COLOR[0] * brightness),
+                         int(STAR_COLOR[1] * brightness),
+                         int(STAR_COLOR[2] * brightness))
+                rects.append(pygame.draw.circle(screen, color, (x - view.x, y - view.y), size))
+            return rects
+        
+        if self.layer is None or self.layer_key != (screen.get_size(), background_color):
+            self.layer = pygame.Surface(screen.get_size())
+            if pygame.display.get_surface():
+                self.layer = self.layer.convert()
+            self.layer.fill(background_color)
+            self.layer_key = (screen.get_size(), background_color)
+            self.view = None
+        pixels = pygame.surfarray.pixels3d(self.layer)
+        if view != self.view or self.shown != self.placed_shown:
+            # The camera moved (or the quality changed): clear the old star pixels and find the ones now in view
+            if self.view is not None:
+                pixels[self.pixels_x, self.pixels_y] = background_color
+            self.place_stars(view)
+        colors = (numpy.array(STAR_COLOR) * self.brightness[:, numpy.newaxis]).astype(numpy.uint8)
+        pixels[self.pixels_x, self.pixels_y] = colors[self.pixels_star]
+        del pixels  # Unlock the layer before blitting it
+        screen.blit(self.layer, (0, 0))
+        return self.rects
 
 class LevelPortal:
+    __slots__ = ('rect', 'world', 'level', 'portal_type', 'is_available', 'glow_time',
+                 'enough_players_touching', 'color', 'accent_color')
+    
     def __init__(self, x, y, world, level, portal_type="door"):
         self.rect = pygame.Rect(x, y, 80, 100)
         self.world = world
@@ -1522,7 +2845,7 @@ class LevelPortal:
         self.portal_type = portal_type  # "door", "pipe", "portal"
         self.is_available = True
         self.glow_time = 0
-        self.both_players_touching = False
+        self.enough_players_touching = False
         
         # Portal-specific colors
         if world == 1:
@@ -1538,11 +2861,9 @@ class LevelPortal:
             self.color = GRAY
             self.accent_color = WHITE
     
-    def update(self, player1, player2):
-        # Check if both players are touching this portal
-        p1_touching = self.rect.colliderect(player1.rect)
-        p2_touching = self.rect.colliderect(player2.rect)
-        self.both_players_touching = p1_touching and p2_touching
+    def update(self, players):
+        # Check if enough players are touching this portal to enter it
+        self.enough_players_touching = enough_players_at(self.rect, players)
         
         # Update glow animation
         self.glow_time += 0.1
@@ -1567,7 +2888,7 @@ class LevelPortal:
             pygame.draw.circle(screen, YELLOW, (knob_x, knob_y), 5)
             
             # Draw level number on door
-            level_text = font_medium.render(f"{self.level}", True, WHITE)
+            level_text = text_cache.render(font_medium, f"{self.level}", True, WHITE)
             text_rect = level_text.get_rect(center=(self.rect.centerx, self.rect.centery))
             screen.blit(level_text, text_rect)
             
@@ -1584,7 +2905,7 @@ class LevelPortal:
             pygame.draw.rect(screen, BLACK, opening_rect, 3)
             
             # Level number
-            level_text = font_medium.render(f"{self.level}", True, WHITE)
+            level_text = text_cache.render(font_medium, f"{self.level}", True, WHITE)
             text_rect = level_text.get_rect(center=(self.rect.centerx, self.rect.centery))
             screen.blit(level_text, text_rect)
             
@@ -1603,19 +2924,19 @@ class LevelPortal:
             pygame.draw.circle(screen, (0, 0, 0), self.rect.center, 25)
             
             # Level number
-            level_text = font_medium.render(f"{self.level}", True, self.accent_color)
+            level_text = text_cache.render(font_medium, f"{self.level}", True, self.accent_color)
             text_rect = level_text.get_rect(center=self.rect.center)
             screen.blit(level_text, text_rect)
         
-        # Draw glow effect if both players are touching
-        if self.both_players_touching:
+        # Draw glow effect if enough players are touching
+        if self.enough_players_touching:
             glow_surface = pygame.Surface((self.rect.width + 20, self.rect.height + 20), pygame.SRCALPHA)
             pygame.draw.rect(glow_surface, (*WHITE, glow_alpha//2), 
                            (0, 0, self.rect.width + 20, self.rect.height + 20), 5)
             screen.blit(glow_surface, (self.rect.x - 10, self.rect.y - 10))
         
         # Draw world label above portal
-        world_text = font_small.render(f"World {self.world}", True, WHITE)
+        world_text = text_cache.render(font_small, f"World {self.world}", True, WHITE)
         world_rect = world_text.get_rect(center=(self.rect.centerx, self.rect.y - 15))
         screen.blit(world_text, world_rect)
 
@@ -1624,6 +2945,7 @@ class LevelSelectMap:
         self.level_manager = level_manager
         self.platforms = []
         self.portals = []
+        self.background = None  # Cached static map, built by draw()
         self.create_level_select_map()
     
     def create_level_select_map(self):
@@ -1686,64 +3008,93 @@ class LevelSelectMap:
         # World 3: Floating magical platforms
         self.platforms.append(Platform(880, SCREEN_HEIGHT - 380, 20, 20, (100, 50, 150)))  # Magic block
         self.platforms.append(Platform(1180, SCREEN_HEIGHT - 380, 20, 20, (100, 50, 150)))  # Magic block
+        
+        self.platform_grid = PlatformGrid(self.platforms)
     
-    def update(self, player1, player2):
+    def update(self, players):
         # Update all portals
         for portal in self.portals:
-            portal.update(player1, player2)
+            portal.update(players)
     
-    def check_portal_activation(self, player1, player2):
+    def check_portal_activation(self, players):
         # Check if players want to enter a portal
         for portal in self.portals:
-            if portal.both_players_touching:
+            if portal.enough_players_touching:
                 return portal.world, portal.level
         return None, None
     
-    def draw(self, screen):
+    def invalidate(self):
+        # Drop the cached background; the next draw() rebuilds it
+        self.background = None
+    
+    def build_background(self, size):
+        """
+        Draw everything on the map that never moves - the gradient sky, the platforms, the
+        world labels, the title and the instructions - onto one Surface in the display format.
+        """
+        width, height = size
+        background = pygame.Surface(size).convert()
+        
         # Draw gradient sky background for level select
-        for y in range(SCREEN_HEIGHT):
-            ratio = y / SCREEN_HEIGHT
+        for y in range(height):
+            ratio = y / height
             r = int(135 * (1 - ratio) + 100 * ratio)
             g = int(206 * (1 - ratio) + 150 * ratio)
             b = int(235 * (1 - ratio) + 200 * ratio)
-            pygame.draw.line(screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+            pygame.draw.line(background, (r, g, b), (0, y), (width, y))
         
         # Draw platforms
         for platform in self.platforms:
-            platform.draw(screen)
-        
-        # Draw portals
-        for portal in self.portals:
-            portal.draw(screen)
+            platform.draw(background)
         
         # Draw world area labels
-        world1_text = font_large.render("WORLD 1", True, (139, 69, 19))
-        world1_rect = world1_text.get_rect(center=(200, SCREEN_HEIGHT - 300))
-        screen.blit(world1_text, world1_rect)
+        world1_text = text_cache.render(font_large, "WORLD 1", True, (139, 69, 19))
+        world1_rect = world1_text.get_rect(center=(200, height - 300))
+        background.blit(world1_text, world1_rect)
         
-        world2_text = font_large.render("WORLD 2", True, (75, 75, 75))
-        world2_rect = world2_text.get_rect(center=(600, SCREEN_HEIGHT - 460))
-        screen.blit(world2_text, world2_rect)
+        world2_text = text_cache.render(font_large, "WORLD 2", True, (75, 75, 75))
+        world2_rect = world2_text.get_rect(center=(600, height - 460))
+        background.blit(world2_text, world2_rect)
         
-        world3_text = font_large.render("WORLD 3", True, (50, 50, 100))
-        world3_rect = world3_text.get_rect(center=(1025, SCREEN_HEIGHT - 620))
-        screen.blit(world3_text, world3_rect)
+        world3_text = text_cache.render(font_large, "WORLD 3", True, (50, 50, 100))
+        world3_rect = world3_text.get_rect(center=(1025, height - 620))
+        background.blit(world3_text, world3_rect)
         
         # Draw title
-        title_text = font_large.render("LEVEL SELECT", True, BLACK)
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 50))
+        title_text = text_cache.render(font_large, "LEVEL SELECT", True, BLACK)
+        title_rect = title_text.get_rect(center=(width//2, 50))
         # Add background for title
-        pygame.draw.rect(screen, WHITE, title_rect.inflate(40, 20))
-        pygame.draw.rect(screen, BLACK, title_rect.inflate(40, 20), 3)
-        screen.blit(title_text, title_rect)
+        pygame.draw.rect(background, WHITE, title_rect.inflate(40, 20))
+        pygame.draw.rect(background, BLACK, title_rect.inflate(40, 20), 3)
+        background.blit(title_text, title_rect)
         
         # Draw instructions
-        instruction_text = font_medium.render("Walk both players to a level entrance and press SPACE to enter!", True, BLACK)
-        instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH//2, 100))
-        pygame.draw.rect(screen, WHITE, instruction_rect.inflate(20, 10))
-        screen.blit(instruction_text, instruction_rect)
+        instruction_text = text_cache.render(font_medium, f"Walk {players_needed_text()} to a level entrance and press SPACE to enter!", True, BLACK)
+        instruction_rect = instruction_text.get_rect(center=(width//2, 100))
+        pygame.draw.rect(background, WHITE, instruction_rect.inflate(20, 10))
+        background.blit(instruction_text, instruction_rect)
+        return background
+    
+    def draw(self, screen):
+        # The static map is drawn once and only rebuilt when the window size changes or
+        # invalidate() is called, which main() does after setup_display() on F11
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.background = self.build_background(screen.get_size())
+        screen.blit(self.background, (0, 0))
+        
+        # Draw portals (animated, so they are drawn every frame)
+        for portal in self.portals:
+            portal.draw(screen)
 
 def main():
+    # Start the window and audio (importing this module alone does neither)
+    pygame.init()
+    setup_display()
+    init_sounds()
+    session_seed = seed_session(SESSION_SEED)
+    if DETERMINISTIC_PHYSICS:
+        print(f"Deterministic physics, session seed {session_seed}")
+    
     level_manager = LevelManager()
     
     # Initialize game state
@@ -1753,18 +3104,21 @@ def main():
     level_select_map = LevelSelectMap(level_manager)
     
     # Create players for level select (start in World 1 area)
-    player1 = Player(150, SCREEN_HEIGHT - 100, BLUE, 1)
-    player2 = Player(200, SCREEN_HEIGHT - 100, RED, 2)
+    players = create_players(physics=FixedPointPhysics if DETERMINISTIC_PHYSICS else FloatPhysics)
     
     # Game state variables
     platforms = []
-    coins = []
+    coins = CoinStore()
     total_coins = 0
     spikes = []
     goal = None
     
     # Create stars for night sky (World 2)
-    stars = [Star() for _ in range(100)]
+    starfield = Starfield()
+    
+    # Regions of the window to update each frame (everything unless DIRTY_RECT_RENDERING is on)
+    dirty_regions = DirtyRegions()
+    show_quality_overlay = SHOW_QUALITY_OVERLAY
     
     running = True
     game_complete = False
@@ -1772,13 +3126,14 @@ def main():
     time_elapsed = 0  # For star twinkling
     show_spike_message = False
     spike_message_timer = 0
+    accumulator = 0.0  # Real time not yet simulated by a physics step
+    frame_time = PHYSICS_DT  # Seconds the previous frame took
     
     while running:
-        time_elapsed += 0.1  # Increment time for animations
         keys_pressed = pygame.key.get_pressed()
         
-        # Handle events
-        for event in pygame.event.get():
+        # Handle events (mouse and touch positions mapped to the logical screen)
+        for event in map(logical_display.map_event, pygame.event.get()):
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
@@ -1786,22 +3141,17 @@ def main():
                     if game_state == GAME_STATE_PLAYING:
                         # Return to level select
                         game_state = GAME_STATE_LEVEL_SELECT
-                        player1.rect.x = 150
-                        player1.rect.y = SCREEN_HEIGHT - 100
-                        player2.rect.x = 200 
-                        player2.rect.y = SCREEN_HEIGHT - 100
-                        player1.vel_x = 0
-                        player1.vel_y = 0
-                        player2.vel_x = 0
-                        player2.vel_y = 0
-                        player1.collected_coins = 0
-                        player2.collected_coins = 0
+                        for index, player in enumerate(players):
+                            player.rect.x, player.rect.y = get_level_select_start(index)
+                            player.vel_x = 0
+                            player.vel_y = 0
+                            player.collected_coins = 0
                     else:
                         running = False
                 elif event.key == pygame.K_SPACE:
                     if game_state == GAME_STATE_LEVEL_SELECT:
                         # Check if players want to enter a portal
-                        target_world, target_level = level_select_map.check_portal_activation(player1, player2)
+                        target_world, target_level = level_select_map.check_portal_activation(players)
                         if target_world and target_level:
                             # Enter the selected level
                             level_manager.current_world = target_world
@@ -1809,31 +3159,17 @@ def main():
                             platforms, coins, total_coins, spikes = level_manager.get_level()
                             goal = create_goal_from_level_data(level_manager)
                             
-                            # Get player spawn positions from level data
-                            level_data = level_manager.get_current_level_data()
-                            player_spawns = level_data.get('player_spawns', [
-                                {'x': 100, 'y': SCREEN_HEIGHT - 100},
-                                {'x': 150, 'y': SCREEN_HEIGHT - 100}
-                            ])
+                            # Update spawn coordinates from level data so respawn works correctly
+                            update_player_spawn_points(level_manager, players)
                             
                             # Reset players to level spawn positions
-                            player1.rect.x = player_spawns[0]['x']
-                            player1.rect.y = player_spawns[0]['y']
-                            player2.rect.x = player_spawns[1]['x']
-                            player2.rect.y = player_spawns[1]['y']
-                            # Update spawn coordinates so respawn works correctly
-                            player1.spawn_x = player_spawns[0]['x']
-                            player1.spawn_y = player_spawns[0]['y']
-                            player2.spawn_x = player_spawns[1]['x']
-                            player2.spawn_y = player_spawns[1]['y']
-                            player1.vel_x = 0
-                            player1.vel_y = 0
-                            player2.vel_x = 0
-                            player2.vel_y = 0
-                            player1.collected_coins = 0
-                            player2.collected_coins = 0
-                            player1.is_dying = False
-                            player2.is_dying = False
+                            for player in players:
+                                player.rect.x = player.spawn_x
+                                player.rect.y = player.spawn_y
+                                player.vel_x = 0
+                                player.vel_y = 0
+                                player.collected_coins = 0
+                                player.is_dying = False
                             
                             game_state = GAME_STATE_PLAYING
                             game_complete = False
@@ -1850,11 +3186,10 @@ def main():
                     goal = create_goal_from_level_data(level_manager)
                     
                     # Update spawn points before respawning
-                    update_player_spawn_points(level_manager, player1, player2)
-                    player1.respawn()
-                    player2.respawn()
-                    player1.collected_coins = 0
-                    player2.collected_coins = 0
+                    update_player_spawn_points(level_manager, players)
+                    for player in players:
+                        player.respawn()
+                        player.collected_coins = 0
                     game_complete = False
                 elif event.key == pygame.K_n and game_complete and not all_levels_complete and game_state == GAME_STATE_PLAYING:
                     # Next level
@@ -1863,24 +3198,23 @@ def main():
                         goal = create_goal_from_level_data(level_manager)
                         
                         # Update spawn points before respawning
-                        update_player_spawn_points(level_manager, player1, player2)
-                        player1.respawn()
-                        player2.respawn()
-                        player1.collected_coins = 0
-                        player2.collected_coins = 0
+                        update_player_spawn_points(level_manager, players)
+                        for player in players:
+                            player.respawn()
+                            player.collected_coins = 0
                         game_complete = False
                         
                         # Show world transition message if we just moved to a new world
                         if level_manager.current_level == 1 and level_manager.current_world > 1:
                             # Display world transition message
-                            transition_text = font_large.render(f"ENTERING WORLD {level_manager.current_world}!", True, GREEN)
+                            transition_text = text_cache.render(font_large, f"ENTERING WORLD {level_manager.current_world}!", True, GREEN)
                             transition_rect = transition_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
                             pygame.draw.rect(screen, WHITE, transition_rect.inflate(40, 20))
                             pygame.draw.rect(screen, BLACK, transition_rect.inflate(40, 20), 3)
                             screen.blit(transition_text, transition_rect)
                             
                             # Update display and pause briefly
-                            pygame.display.flip()
+                            logical_display.present()
                             pygame.time.delay(2000)  # 2 second pause
                     else:
                         all_levels_complete = True
@@ -1889,81 +3223,69 @@ def main():
                     global FULLSCREEN
                     FULLSCREEN = not FULLSCREEN
                     setup_display()
-        
-        # Update game logic based on current state
-        if game_state == GAME_STATE_LEVEL_SELECT:
-            # Update level select map
-            level_select_map.update(player1, player2)
+                    level_select_map.invalidate()
+                elif event.key == pygame.K_F3:
+                    # Toggle the frame time / effect quality overlay
+                    show_quality_overlay = not show_quality_overlay
+        
+        # Run game logic at a fixed rate no matter how fast we render. When rendering falls
+        # behind, catch up with several steps, but never more than MAX_PHYSICS_STEPS per frame.
+        accumulator += min(frame_time, MAX_PHYSICS_STEPS * PHYSICS_DT)
+        physics_steps = 0
+        while accumulator >= PHYSICS_DT and physics_steps < MAX_PHYSICS_STEPS:
+            for player in players:
+                player.save_previous_position()
+            time_elapsed += 0.1  # Increment time for animations
             
-            # Update players in level select (they use level select platforms)
-            player1.update(level_select_map.platforms, [], keys_pressed, [player2])
-            player2.update(level_select_map.platforms, [], keys_pressed, [player1])
+            # Update game logic based on current state
+            if game_state == GAME_STATE_LEVEL_SELECT:
+                # Update level select map
+                level_select_map.update(players)
             
-        elif game_state == GAME_STATE_PLAYING and not game_complete:
-            # Update game objects in playing state
-            player1.update(platforms, coins, keys_pressed, [player2])
-            player2.update(platforms, coins, keys_pressed, [player1])
+                # Update players in level select (they use level select platforms)
+                update_players(players, level_select_map.platforms, CoinStore(), keys_pressed, level_select_map.platform_grid)
             
-            # Check for spike collisions
-            if not player1.is_dying and not player2.is_dying:  # Only check if not already dying
-                spike_collision = False
-                for spike in spikes:
-                    if player1.rect.colliderect(spike.rect) and not player1.is_dying:
-                        player1.start_death_animation()
-                        spike_collision = True
-                        break  # Stop checking after first collision
-                
-                for spike in spikes:
-                    if player2.rect.colliderect(spike.rect) and not player2.is_dying:
-                        player2.start_death_animation()
-                        spike_collision = True
-                        break  # Stop checking after first collision
+            elif game_state == GAME_STATE_PLAYING and not game_complete:
+                # Update game objects in playing state
+                spike_collision, level_won = update_playing_state(
+                    players, platforms, coins, spikes, goal, keys_pressed, level_manager.platform_grid,
+                    level_manager.hazard_grid, level_manager.level_bounds, particle_pool, camera)
                 
                 # Show message if spike collision occurred
                 if spike_collision:
                     show_spike_message = True
                     spike_message_timer = 60
+                
+                if level_won:
+                    game_complete = True
             
-            for coin in coins:
-                coin.update()
-            
-            # Check win condition
-            if (goal and player1.rect.colliderect(goal.rect) and 
-                player2.rect.colliderect(goal.rect) and 
-                len(coins) == 0):
-                game_complete = True
-            
-            # Update player faces and door based on coin collection
-            if len(coins) == 0:
-                player1.happy_face = True
-                player2.happy_face = True
-                if goal and goal.is_door:
-                    goal.door_open = True
-            else:
-                player1.happy_face = False
-                player2.happy_face = False
-                if goal and goal.is_door:
-                    goal.door_open = False
+            accumulator -= PHYSICS_DT
+            physics_steps += 1
+        
+        # Fraction of a physics step that has passed since the last one, for smooth drawing
+        alpha = accumulator / PHYSICS_DT
         
         # Draw everything to screen based on current state
+        full_frame = True  # The playing state below can narrow this down to dirty regions
         if game_state == GAME_STATE_LEVEL_SELECT:
-            # Draw level select screen
+            # Draw level select screen (it never scrolls)
+            camera.reset()
             level_select_map.draw(screen)
             
             # Draw players
-            player1.draw(screen)
-            player2.draw(screen)
+            for player in players:
+                player.draw_interpolated(screen, alpha)
             
             # Draw additional UI for level select
-            controls_text = font_small.render("Player 1: WASD | Player 2: Arrow Keys | Both players on portal + SPACE to enter", True, BLACK)
+            controls_text = text_cache.render(font_small, f"Player 1: WASD | Player 2: Arrow Keys | {players_needed_text().capitalize()} on portal + SPACE to enter", True, BLACK)
             controls_rect = controls_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30))
             pygame.draw.rect(screen, WHITE, controls_rect.inflate(20, 10))
             screen.blit(controls_text, controls_rect)
             
             # Show portal entry prompt if both players are on a portal
-            target_world, target_level = level_select_map.check_portal_activation(player1, player2)
+            target_world, target_level = level_select_map.check_portal_activation(players)
             if target_world and target_level:
-                prompt_text = font_large.render(f"Press SPACE to enter World {target_world} Level {target_level}!", True, GREEN)
+                prompt_text = text_cache.render(font_large, f"Press SPACE to enter World {target_world} Level {target_level}!", True, GREEN)
                 prompt_rect = prompt_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
                 pygame.draw.rect(screen, WHITE, prompt_rect.inflate(40, 20))
                 pygame.draw.rect(screen, BLACK, prompt_rect.inflate(40, 20), 3)
@@ -1976,34 +3298,34 @@ def main():
             background_color = get_current_background_color(level_data)
             text_color = get_text_color(background_color)
             
+            # Scroll to the players; everything in the level is drawn relative to the camera
+            level_bounds = level_manager.level_bounds
+            camera.follow(players, alpha, level_bounds)
+            
+            # Draw platforms, spikes and goal from the cached level layer
             if background_type == 'night':
-                screen.fill(NIGHT_SKY)  # Dark blue for night time
-                # Update and draw stars
-                for star in stars:
-                    star.update(time_elapsed)
-                    star.draw(screen)
+                # Dark blue for night time, with the stars (spread over the whole level)
+                if level_bounds and starfield.bounds != level_bounds:
+                    starfield = Starfield.for_level(level_bounds)
+                starfield.set_density(quality_governor.settings['stars'])
+                starfield.update(time_elapsed)
+                for star_rect in starfield.draw(screen, NIGHT_SKY, camera):
+                    dirty_regions.add(star_rect)
+                layer_redrawn = static_level_layer.draw(screen, platforms, spikes, goal, camera=camera)
             else:
-                screen.fill((135, 206, 235))  # Sky blue for day time
-            
-            # Draw platforms
-            for platform in platforms:
-                platform.draw(screen)
+                layer_redrawn = static_level_layer.draw(screen, platforms, spikes, goal, (135, 206, 235), camera)  # Sky blue for day time
             
             # Draw coins
-            for coin in coins:
-                coin.draw(screen)
-            
-            # Draw goal
-            if goal:
-                goal.draw(screen)
+            for coin_rect in coins.draw(screen, camera, quality_governor.settings['coin_spin']):
+                dirty_regions.add(coin_rect)
             
             # Draw players
-            player1.draw(screen)
-            player2.draw(screen)
+            for player in players:
+                dirty_regions.add(player.draw_interpolated(screen, alpha, camera))
             
-            # Draw spikes
-            for spike in spikes:
-                spike.draw(screen)
+            # Only the moving parts changed, unless the level was redrawn or something covers the screen
+            white_flash = any(player.is_flashing() for player in players)
+            full_frame = layer_redrawn or white_flash or show_spike_message or game_complete
         
             # Draw spike message if needed (only in playing state)
             if show_spike_message:
@@ -2011,24 +3333,24 @@ def main():
                 if spike_message_timer <= 0:
                     show_spike_message = False
                 
-                message_text = font_large.render("DANGER! SPIKES!", True, RED)
+                message_text = text_cache.render(font_large, "DANGER! SPIKES!", True, RED)
                 message_rect = message_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
                 pygame.draw.rect(screen, WHITE, message_rect.inflate(40, 20))
                 pygame.draw.rect(screen, BLACK, message_rect.inflate(40, 20), 3)
                 screen.blit(message_text, message_rect)
                 
-                sub_message = font_medium.render("Returning to beginning of world...", True, BLACK)
+                sub_message = text_cache.render(font_medium, "Returning to beginning of world...", True, BLACK)
                 sub_rect = sub_message.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
                 screen.blit(sub_message, sub_rect)
             
             # Draw UI with dynamic text color
-            collected_coins = player1.collected_coins + player2.collected_coins
-            score_text = font_medium.render(f"Coins: {collected_coins}/{total_coins}", True, text_color)
-            screen.blit(score_text, (20, 20))
+            collected_coins = sum(player.collected_coins for player in players)
+            score_text = text_cache.render(font_medium, f"Coins: {collected_coins}/{total_coins}", True, text_color)
+            dirty_regions.add(screen.blit(score_text, (20, 20)))
             
             # Display current world and level with dynamic text color
-            level_text = font_medium.render(f"World: {level_manager.current_world} Level: {level_manager.current_level}", True, text_color)
-            screen.blit(level_text, (20, 60))
+            level_text = text_cache.render(font_medium, f"World: {level_manager.current_world} Level: {level_manager.current_level}", True, text_color)
+            dirty_regions.add(screen.blit(level_text, (20, 60)))
             
             # Draw instructions with dynamic text color
             instructions = [
@@ -2041,30 +3363,30 @@ def main():
             ]
             
             for i, instruction in enumerate(instructions):
-                inst_text = font_small.render(instruction, True, text_color)
+                inst_text = text_cache.render(font_small, instruction, True, text_color)
                 screen.blit(inst_text, (20, SCREEN_HEIGHT - 120 + i * 18))
             
             # Draw completion messages
             if game_complete:
                 if all_levels_complete:
                     # Final victory message
-                    victory_text = font_large.render("ALL WORLDS COMPLETE!", True, GREEN)
+                    victory_text = text_cache.render(font_large, "ALL WORLDS COMPLETE!", True, GREEN)
                     victory_rect = victory_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
                     pygame.draw.rect(screen, WHITE, victory_rect.inflate(40, 20))
                     pygame.draw.rect(screen, BLACK, victory_rect.inflate(40, 20), 3)
                     screen.blit(victory_text, victory_rect)
                     
-                    continue_text = font_medium.render("Press ESC to return to level select", True, BLACK)
+                    continue_text = text_cache.render(font_medium, "Press ESC to return to level select", True, BLACK)
                     continue_rect = continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
                     screen.blit(continue_text, continue_rect)
                 else:
                     # Level complete message
                     if level_manager.current_level == 3 and level_manager.current_world < level_manager.max_worlds:
                         # End of world message
-                        victory_text = font_large.render(f"WORLD {level_manager.current_world} COMPLETE!", True, GREEN)
+                        victory_text = text_cache.render(font_large, f"WORLD {level_manager.current_world} COMPLETE!", True, GREEN)
                     else:
                         # Regular level complete message
-                        victory_text = font_large.render(f"WORLD {level_manager.current_world} LEVEL {level_manager.current_level} COMPLETE!", True, GREEN)
+                        victory_text = text_cache.render(font_large, f"WORLD {level_manager.current_world} LEVEL {level_manager.current_level} COMPLETE!", True, GREEN)
                         
                     victory_rect = victory_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
                     pygame.draw.rect(screen, WHITE, victory_rect.inflate(40, 20))
@@ -2072,24 +3394,29 @@ def main():
                     screen.blit(victory_text, victory_rect)
                     
                     if level_manager.current_level < level_manager.max_levels or level_manager.current_world < level_manager.max_worlds:
-                        continue_text = font_medium.render("Press N for next level, R to replay, or ESC for level select", True, BLACK)
+                        continue_text = text_cache.render(font_medium, "Press N for next level, R to replay, or ESC for level select", True, BLACK)
                     else:
-                        continue_text = font_medium.render("Press N to finish, R to replay, or ESC for level select", True, BLACK)
+                        continue_text = text_cache.render(font_medium, "Press N to finish, R to replay, or ESC for level select", True, BLACK)
                         
                     continue_rect = continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
                     screen.blit(continue_text, continue_rect)
             
             # Play level complete sound when game is won
-            if (goal and player1.rect.colliderect(goal.rect) and 
-                player2.rect.colliderect(goal.rect) and 
+            if (goal and enough_players_at(goal.rect, players) and 
                 len(coins) == 0 and
                 not game_complete):  # Only play once when first completing
                 level_complete_sound.play()
                 game_complete = True
         
+        # Frame time and effect levels on top of everything
+        if show_quality_overlay:
+            dirty_regions.add(quality_governor.draw_overlay(screen, font_small))
+        
         # Update display
-        pygame.display.flip()
-        clock.tick(FPS)
+        dirty_regions.present(full_frame)
+        frame_time = clock.tick(FPS) / 1000.0
+        # Turn effects down (or back up) by how long the frame's work took, without the wait
+        quality_governor.record(clock.get_rawtime() / 1000.0)
     
     pygame.quit()
     sys.exit()
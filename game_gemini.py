@@ -5,35 +5,25 @@ import random
 import json
 import os
 import re # For parsing level filenames
+from collections import OrderedDict, deque
+from text_cache import text_cache # Rendered HUD/menu text, shared with the editor
+from screen_effects import screen_effects # Reused full-screen flash/fade overlays
+from logical_display import logical_display # Fixed-size drawing surface, scaled to the window
+try: import numpy # Optional: sound synthesis and the explosion particle pool
+except ImportError: numpy = None
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()  # Initialize the mixer for sound playback
+# Initialize Pygame fonts only; main() opens the window and mixer so the game logic can run headless
+pygame.font.init()
 
-# Set up the display
-infoObject = pygame.display.Info()
-SCREEN_WIDTH = infoObject.current_w
-SCREEN_HEIGHT = infoObject.current_h
+# Screen size: the game is drawn at this size (see LOGICAL_RESOLUTION)
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+screen = None # Created by setup_display()
 
 # You can switch between fullscreen and windowed mode
 FULLSCREEN = False
-
-if FULLSCREEN:
-    try:
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-    except pygame.error as e:
-        print(f"Fullscreen failed: {e}, falling back to windowed.")
-        FULLSCREEN = False
-        SCREEN_WIDTH = 1280
-        SCREEN_HEIGHT = 720
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-else:
-    SCREEN_WIDTH = 1280
-    SCREEN_HEIGHT = 720
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-
-print(f"Display mode: {'Fullscreen' if FULLSCREEN else 'Windowed'} - {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
-pygame.display.set_caption("Classroom Platformer")
+LOGICAL_RESOLUTION = True # Draw at SCREEN_WIDTH x SCREEN_HEIGHT and scale to the window/monitor (letterboxed); False = draw at the monitor's size in fullscreen
+RENDER_SCALE_MODE = "fit" # "fit", "integer" or "smooth" (see logical_display.py)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -48,10 +38,12 @@ BROWN = (139, 69, 19)
 EXPLOSION_COLORS = [(255, 0, 0), (255, 128, 0), (255, 255, 0), (255, 255, 255)]
 NIGHT_SKY = (25, 25, 50)
 STAR_COLOR = (255, 255, 200)
+STAR_COUNT = 100
 
 # Clock for controlling frame rate
 clock = pygame.time.Clock()
 FPS = 60
+DIRTY_RECT_RENDERING = False # Only send the regions that changed to the window (see DirtyRegions)
 
 # Fonts
 font_large = pygame.font.Font(None, 72)
@@ -63,6 +55,16 @@ GRAVITY = 0.8
 JUMP_STRENGTH = -15
 MOVE_SPEED = 5
 FRICTION = 0.9
+GRID_CELL_SIZE = 128 # Spatial hash cell size for platform collision broad phase
+LOG_COLLIDER_COALESCING = False # Print how many platforms each level load merged into colliders
+PARTICLE_POOL_SIZE = 2048 # Explosion particles alive at once, shared by both players
+ADAPTIVE_QUALITY = True # Turn effects down while frames miss the 1/FPS budget, back up with headroom (QualityGovernor)
+QUALITY_WINDOW = 30 # Frames per rolling frame-time average
+SHOW_QUALITY_OVERLAY = False # Frame time + effect levels in the corner (toggle with F3)
+QUALITY_LEVELS = [ # From full quality down: share of explosion particles, share of stars, white death flash
+    {'particles': 1.0, 'stars': 1.0, 'flash': True}, {'particles': 0.5, 'stars': 1.0, 'flash': True},
+    {'particles': 0.5, 'stars': 0.5, 'flash': True}, {'particles': 0.25, 'stars': 0.25, 'flash': True},
+    {'particles': 0.25, 'stars': 0.25, 'flash': False}]
 
 # Game states
 GAME_STATE_LEVEL_SELECT = "LEVEL_SELECT"
@@ -70,14 +72,25 @@ GAME_STATE_VERSION_SELECT = "VERSION_SELECT"
 GAME_STATE_PLAYING = "PLAYING"
 
 # --- Synthesized sound generation functions ---
+# Sounds are computed for all samples at once as NumPy arrays over the sample times t, in the same arithmetic order as
+# the old per-sample loops, so the samples are identical
+def stereo_sound(wave): # Float samples -> int16 (truncated like int()) on both channels
+    samples = wave.astype(numpy.int16); return pygame.sndarray.make_sound(numpy.column_stack((samples, samples)))
+
+def note_schedule(melody, t): # Per sample of t: the (freq, duration) note playing, time into it, its duration, and whether one is
+    freq, note_t, note_dur, playing = numpy.zeros_like(t), numpy.zeros_like(t), numpy.ones_like(t), numpy.zeros(t.shape, dtype=bool)
+    note_time = 0
+    for note_freq, dur in melody:
+        cur = ~playing & (note_time <= t) & (t < note_time + dur)
+        freq[cur], note_t[cur], note_dur[cur] = note_freq, t[cur] - note_time, dur; playing |= cur; note_time += dur
+    return freq, note_t, note_dur, playing
+
 def generate_tone(frequency, duration, sample_rate=22050, volume=0.5):
     """Generate a sine wave tone"""
     try:
         import numpy
-        frames = int(duration * sample_rate)
-        arr = numpy.array([4096 * volume * math.sin(2 * math.pi * frequency * i / sample_rate) for i in range(frames)])
-        arr = numpy.column_stack((arr, arr)).astype(numpy.int16) # Stereo
-        return pygame.sndarray.make_sound(arr)
+        i = numpy.arange(int(duration * sample_rate))
+        return stereo_sound(4096 * volume * numpy.sin(2 * math.pi * frequency * i / sample_rate))
     except ImportError:
         print("NumPy not found for generate_tone. Sound will be silent.")
         return DummySound() # Fallback if numpy isn't there for this simple tone too
@@ -85,86 +98,57 @@ def generate_tone(frequency, duration, sample_rate=22050, volume=0.5):
 def generate_coin_sound():
     try:
         import numpy
-        sample_rate = 22050; duration = 0.5; frames = int(duration * sample_rate); arr = []
-        notes = [523, 659, 784, 1047]; note_duration = duration / len(notes)
-        for i in range(frames):
-            t = i / sample_rate; note_index = min(int(t / note_duration), len(notes) - 1)
-            note_t = (t % note_duration) / note_duration; freq = notes[note_index]
-            fundamental = math.sin(2 * math.pi * freq * t)
-            harmonic2 = 0.3 * math.sin(2 * math.pi * freq * 2 * t)
-            harmonic3 = 0.1 * math.sin(2 * math.pi * freq * 3 * t)
-            envelope = math.exp(-note_t * 3) * math.sin(math.pi * note_t)
-            wave = 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope
-            arr.append([int(wave), int(wave)])
-        return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+        sample_rate = 22050; duration = 0.5; t = numpy.arange(int(duration * sample_rate)) / sample_rate
+        notes = numpy.array([523, 659, 784, 1047]); note_duration = duration / len(notes)
+        freq = notes[numpy.minimum((t / note_duration).astype(int), len(notes) - 1)]; note_t = (t % note_duration) / note_duration
+        fundamental = numpy.sin(2 * math.pi * freq * t)
+        harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq * 2 * t)
+        harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq * 3 * t)
+        envelope = numpy.exp(-note_t * 3) * numpy.sin(math.pi * note_t)
+        return stereo_sound(2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope)
     except ImportError: return generate_tone(523, 0.2, volume=0.3)
 
 def generate_jump_sound():
     try:
         import numpy
-        sample_rate = 22050; duration = 0.25; frames = int(duration * sample_rate); arr = []
+        sample_rate = 22050; duration = 0.25; t = numpy.arange(int(duration * sample_rate)) / sample_rate; progress = t / duration
         start_freq, end_freq = 262, 392
-        for i in range(frames):
-            t = i / sample_rate; progress = t / duration
-            freq_progress = 0.5 * (1 - math.cos(math.pi * progress))
-            freq = start_freq + (end_freq - start_freq) * freq_progress
-            fundamental = math.sin(2 * math.pi * freq * t)
-            harmonic2 = 0.2 * math.sin(2 * math.pi * freq * 2 * t)
-            if progress < 0.1: envelope = progress / 0.1
-            elif progress < 0.7: envelope = 1.0
-            else: envelope = (1.0 - progress) / 0.3
-            wave = 2048 * 0.6 * (fundamental + harmonic2) * envelope
-            arr.append([int(wave), int(wave)])
-        return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+        freq_progress = 0.5 * (1 - numpy.cos(math.pi * progress))
+        freq = start_freq + (end_freq - start_freq) * freq_progress
+        fundamental = numpy.sin(2 * math.pi * freq * t)
+        harmonic2 = 0.2 * numpy.sin(2 * math.pi * freq * 2 * t)
+        envelope = numpy.select([progress < 0.1, progress < 0.7], [progress / 0.1, 1.0], (1.0 - progress) / 0.3) # Attack, sustain, decay
+        return stereo_sound(2048 * 0.6 * (fundamental + harmonic2) * envelope)
     except ImportError: return generate_tone(300, 0.1, volume=0.2)
 
 def generate_level_complete_sound():
     try:
         import numpy
-        sample_rate = 22050; duration = 1.5; frames = int(duration * sample_rate); arr = []
+        sample_rate = 22050; duration = 1.5; t = numpy.arange(int(duration * sample_rate)) / sample_rate
         melody = [(523, 0.1), (523, 0.1), (523, 0.1), (523, 0.1), (784, 0.1), (784, 0.1), (784, 0.1), (784, 0.1), (880, 0.15), (880, 0.15), (880, 0.15), (1047, 0.4)]
-        for i in range(frames):
-            t = i / sample_rate; wave = 0; note_time = 0; current_note = None
-            for note_freq, note_dur in melody:
-                if note_time <= t < note_time + note_dur: current_note = (note_freq, t - note_time, note_dur); break
-                note_time += note_dur
-            if current_note:
-                freq, note_t, note_dur = current_note
-                fundamental = math.sin(2 * math.pi * freq * t)
-                harmonic2 = 0.3 * math.sin(2 * math.pi * freq * 2 * t)
-                harmonic3 = 0.1 * math.sin(2 * math.pi * freq * 3 * t)
-                note_progress = note_t / note_dur
-                if note_progress < 0.1: envelope = note_progress / 0.1
-                elif note_progress < 0.8: envelope = 1.0
-                else: envelope = (1.0 - note_progress) / 0.2
-                wave = 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope
-            arr.append([int(wave), int(wave)])
-        return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+        freq, note_t, note_dur, playing = note_schedule(melody, t)
+        fundamental = numpy.sin(2 * math.pi * freq * t)
+        harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq * 2 * t)
+        harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq * 3 * t)
+        note_progress = note_t / note_dur
+        envelope = numpy.select([note_progress < 0.1, note_progress < 0.8], [note_progress / 0.1, 1.0], (1.0 - note_progress) / 0.2)
+        return stereo_sound(numpy.where(playing, 2048 * 0.4 * (fundamental + harmonic2 + harmonic3) * envelope, 0)) # Silent after the melody
     except ImportError: return generate_tone(659, 0.5, volume=0.5)
 
 def generate_explosion_sound():
     try:
         import numpy
-        sample_rate = 22050; duration = 1.2; frames = int(duration * sample_rate); arr = []
+        sample_rate = 22050; duration = 1.2; t = numpy.arange(int(duration * sample_rate)) / sample_rate
         melody = [(784, 0.2), (698, 0.2), (622, 0.2), (587, 0.3), (523, 0.3)]
-        for i in range(frames):
-            t = i / sample_rate; wave = 0; note_time = 0; current_note = None
-            for note_freq, note_dur in melody:
-                if note_time <= t < note_time + note_dur: current_note = (note_freq, t - note_time, note_dur); break
-                note_time += note_dur
-            if current_note:
-                freq, note_t, note_dur = current_note; note_progress = note_t / note_dur
-                vibrato_freq = 5; vibrato_depth = 0.02
-                freq_with_vibrato = freq * (1 + vibrato_depth * math.sin(2 * math.pi * vibrato_freq * t))
-                fundamental = math.sin(2 * math.pi * freq_with_vibrato * t)
-                harmonic2 = 0.3 * math.sin(2 * math.pi * freq_with_vibrato * 2 * t)
-                harmonic3 = 0.1 * math.sin(2 * math.pi * freq_with_vibrato * 3 * t)
-                if note_progress < 0.1: envelope = note_progress / 0.1
-                else: envelope = math.exp(-(note_progress - 0.1) * 2) * (1 - note_progress * 0.3)
-                phrase_progress = t / duration; overall_volume = (1 - phrase_progress * 0.7)
-                wave = 2048 * 0.5 * (fundamental + harmonic2 + harmonic3) * envelope * overall_volume
-            arr.append([int(wave), int(wave)])
-        return pygame.sndarray.make_sound(numpy.array(arr, dtype=numpy.int16))
+        freq, note_t, note_dur, playing = note_schedule(melody, t); note_progress = note_t / note_dur
+        vibrato_freq = 5; vibrato_depth = 0.02
+        freq_with_vibrato = freq * (1 + vibrato_depth * numpy.sin(2 * math.pi * vibrato_freq * t))
+        fundamental = numpy.sin(2 * math.pi * freq_with_vibrato * t)
+        harmonic2 = 0.3 * numpy.sin(2 * math.pi * freq_with_vibrato * 2 * t)
+        harmonic3 = 0.1 * numpy.sin(2 * math.pi * freq_with_vibrato * 3 * t)
+        envelope = numpy.where(note_progress < 0.1, note_progress / 0.1, numpy.exp(-(note_progress - 0.1) * 2) * (1 - note_progress * 0.3))
+        phrase_progress = t / duration; overall_volume = (1 - phrase_progress * 0.7)
+        return stereo_sound(numpy.where(playing, 2048 * 0.5 * (fundamental + harmonic2 + harmonic3) * envelope * overall_volume, 0))
     except ImportError: return generate_tone(100, 0.3, volume=0.8)
 
 # DummySound class for fallback
@@ -172,36 +156,38 @@ class DummySound:
     def play(self): pass
     def set_volume(self, vol): pass
 
-# Generate sounds
-try:
-    coin_sound = generate_coin_sound()
-    level_complete_sound = generate_level_complete_sound()
-    jump_sound = generate_jump_sound()
-    explosion_sound = generate_explosion_sound()
-    print("Successfully generated synthesized sounds (or using fallbacks).")
-except Exception as e:
-    print(f"Warning: Sound synthesis failed: {e}. Using DummySounds.")
-    coin_sound = DummySound()
-    level_complete_sound = DummySound()
-    jump_sound = DummySound()
-    explosion_sound = DummySound()
+# Silent until init_sounds() runs (main() calls it; headless runs never do)
+coin_sound = level_complete_sound = jump_sound = explosion_sound = DummySound()
+
+def init_sounds():
+    global coin_sound, level_complete_sound, jump_sound, explosion_sound
+    try:
+        pygame.mixer.init() # Initialize the mixer for sound playback
+        coin_sound = generate_coin_sound()
+        level_complete_sound = generate_level_complete_sound()
+        jump_sound = generate_jump_sound()
+        explosion_sound = generate_explosion_sound()
+        print("Successfully generated synthesized sounds (or using fallbacks).")
+    except Exception as e:
+        print(f"Warning: Sound synthesis failed: {e}. Using DummySounds.")
+        coin_sound = level_complete_sound = jump_sound = explosion_sound = DummySound()
 
 # --- Helper functions ---
 def setup_display():
     global screen, SCREEN_WIDTH, SCREEN_HEIGHT, FULLSCREEN
-    infoObject = pygame.display.Info()
+    infoObject = pygame.display.Info(); logical_display.scale_mode = RENDER_SCALE_MODE
     if FULLSCREEN:
         try:
-            SCREEN_WIDTH = infoObject.current_w
-            SCREEN_HEIGHT = infoObject.current_h
-            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+            if not LOGICAL_RESOLUTION: SCREEN_WIDTH, SCREEN_HEIGHT = infoObject.current_w, infoObject.current_h
+            screen = logical_display.set_mode((infoObject.current_w, infoObject.current_h), pygame.FULLSCREEN, (SCREEN_WIDTH, SCREEN_HEIGHT))
         except pygame.error:
             FULLSCREEN = False # Fallback
     if not FULLSCREEN: # If initially false or fallback
         SCREEN_WIDTH = 1280
         SCREEN_HEIGHT = 720
-        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    print(f"Display updated: {'Fullscreen' if FULLSCREEN else 'Windowed'} - {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+        screen = logical_display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE if LOGICAL_RESOLUTION else 0, (SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Classroom Platformer"); static_level_layer.invalidate() # Redraw the level in the new display format
+    print(f"Display updated: {'Fullscreen' if FULLSCREEN else 'Windowed'} - {'x'.join(map(str, logical_display.window_size))}, drawing at {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
 
 def get_text_color(background_color):
     if isinstance(background_color, tuple) and len(background_color) >= 3:
@@ -215,6 +201,13 @@ def get_current_background_color(level_data):
 
 # --- Game Object Classes ---
 class Player:
+    __slots__ = ('rect', 'vel_x', 'vel_y', 'color', 'is_jumping', 'on_ground', 'player_num', 'spawn_x',
+                 'spawn_y', 'collected_coins', 'standing_on_player', 'touching_wall', 'can_wall_jump',
+                 'wall_slide_speed', 'wall_jump_direction', 'last_wall_id', 'bounce_timer',
+                 'ignore_wall_contact', 'happy_face', 'is_dying', 'death_timer',
+                 'death_sound_played', 'death_phase', 'death_center_x', 'death_center_y',
+                 'surprised_face', 'eye_direction', 'white_flash_timer')
+
     def __init__(self, x, y, color, player_num):
         self.rect = pygame.Rect(x, y, 40, 40)
         self.vel_x = 0; self.vel_y = 0; self.color = color
@@ -225,11 +218,11 @@ class Player:
         self.wall_jump_direction = 0; self.last_wall_id = None
         self.bounce_timer = 0; self.ignore_wall_contact = False
         self.happy_face = False; self.is_dying = False; self.death_timer = 0
-        self.death_particles = []; self.death_sound_played = False
+        self.death_sound_played = False
         self.death_phase = 0; self.death_center_x = 0; self.death_center_y = 0
-        self.surprised_face = False; self.eye_direction = 0
+        self.surprised_face = False; self.white_flash_timer = 0; self.eye_direction = 0
 
-    def update(self, platforms, coins_list, keys_pressed, other_players=None):
+    def update(self, platforms, coins, keys_pressed, other_players=None, platform_grid=None):
         if self.is_dying: self.update_death_animation(); return
 
         if self.bounce_timer > 0:
@@ -259,7 +252,10 @@ class Player:
 
         # Horizontal collisions
         self.touching_wall = False; current_wall_id = None
-        for platform in platforms:
+        nearby_platforms = platform_grid.query(self.rect) if platform_grid else platforms # Broad phase
+        # Every level platform is its own wall for wall jumps (stacked tiles = many walls): resolve against the level platforms of merged colliders we hit
+        reached = [p for p in nearby_platforms if isinstance(p, MergedPlatform) and self.rect.colliderect(p.rect)]
+        for platform in (merged_parts(reached) if reached else nearby_platforms):
             if self.rect.colliderect(platform.rect):
                 if self.vel_x > 0: self.rect.right = platform.rect.left
                 elif self.vel_x < 0: self.rect.left = platform.rect.right
@@ -283,7 +279,8 @@ class Player:
 
         # Vertical collisions
         self.on_ground = False; self.standing_on_player = False
-        for platform in platforms:
+        nearby_platforms = platform_grid.query(self.rect) if platform_grid else platforms
+        for platform in nearby_platforms:
             if self.rect.colliderect(platform.rect):
                 if self.vel_y > 0: self.rect.bottom = platform.rect.top; self.on_ground = True
                 elif self.vel_y < 0: self.rect.top = platform.rect.bottom
@@ -304,17 +301,14 @@ class Player:
                     self.standing_on_player = True; self.on_ground = True # Treat as on_ground for jumping logic
 
         # Collect coins
-        for coin_item in coins_list[:]:
-            if self.rect.colliderect(coin_item.rect):
-                coins_list.remove(coin_item)
-                self.collected_coins += 1
-                coin_sound.play()
+        collected = coins.collect(self.rect)
+        if collected: self.collected_coins += collected; coin_sound.play()
         
         if self.on_ground: self.is_jumping = False; self.last_wall_id = None
         if self.rect.top > SCREEN_HEIGHT: self.start_death_animation()
 
     def start_death_animation(self):
-        self.is_dying = True; self.death_timer = 90; self.death_particles = []
+        self.is_dying = True; self.death_timer = 90; particle_pool.release(self.player_num)
         self.death_sound_played = False; self.death_phase = 0; self.surprised_face = True
         self.death_center_x = self.rect.centerx; self.death_center_y = SCREEN_HEIGHT // 3
         explosion_sound.set_volume(1.0); explosion_sound.play()
@@ -334,15 +328,9 @@ class Player:
                 self.rect.width, self.rect.height = int(40 * growth_factor), int(40 * growth_factor)
                 self.rect.centerx, self.rect.centery = center_x, center_y
                 if growth_factor >= 2.8:
-                    for _ in range(80):
-                        p = ExplosionParticle(self.rect.centerx, self.rect.centery)
-                        p.size = random.randint(3, 8); p.vel_x = random.uniform(-10, 10); p.vel_y = random.uniform(-10, 10)
-                        self.death_particles.append(p)
+                    particle_pool.spawn(self.rect.centerx, self.rect.centery, round(80 * quality_governor.settings['particles']), self.player_num) # Moved once per step by particle_pool.update()
                     explosion_sound.play(); self.death_phase = 3; self.white_flash_timer = 10
-        elif self.death_phase == 3 and hasattr(self, 'white_flash_timer'): self.white_flash_timer -= 1
-        
-        for p in self.death_particles[:]: p.update();
-        if p.life <= 0: self.death_particles.remove(p)
+        elif self.death_phase == 3: self.white_flash_timer -= 1
         self.death_timer -= 1
         if self.death_timer <= 0:
             self.is_dying = False; self.surprised_face = False
@@ -352,69 +340,165 @@ class Player:
         self.rect.x, self.rect.y = self.spawn_x, self.spawn_y
         self.vel_x, self.vel_y = 0, 0
         self.last_wall_id = None; self.can_wall_jump = False
+        particle_pool.release(self.player_num) # Explosion ends with the death animation
         self.collected_coins = 0 # Reset coins on respawn
         self.is_dying = False # Ensure not stuck in death anim
         self.death_phase = 0
 
+    def is_flashing(self): return self.is_dying and self.death_phase == 3 and self.white_flash_timer > 0 and quality_governor.settings['flash']
     def draw(self, screen):
-        if self.is_dying and self.death_phase == 3 and hasattr(self, 'white_flash_timer') and self.white_flash_timer > 0:
-            flash_alpha = min(200, self.white_flash_timer * 25)
-            flash_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            flash_surface.fill((255, 255, 255, flash_alpha)); screen.blit(flash_surface, (0, 0))
+        if self.is_flashing():
+            screen_effects.flash(screen, min(200, self.white_flash_timer * 25)) # Reused overlay, no per-frame allocation
         
         if self.is_dying:
-            if self.death_phase < 3 and self.death_timer > 15:
-                pygame.draw.rect(screen, self.color, self.rect); pygame.draw.rect(screen, BLACK, self.rect, 2)
-                scale_factor = self.rect.width / 40
-                eye_size, pupil_size = int(10 * scale_factor), int(3 * scale_factor)
-                left_eye_x, right_eye_x = self.rect.left + int(12 * scale_factor), self.rect.right - int(12 * scale_factor)
-                eye_y = self.rect.top + int(15 * scale_factor)
-                pygame.draw.circle(screen, WHITE, (left_eye_x, eye_y), eye_size); pygame.draw.circle(screen, WHITE, (right_eye_x, eye_y), eye_size)
-                pygame.draw.circle(screen, BLACK, (left_eye_x, eye_y), pupil_size); pygame.draw.circle(screen, BLACK, (right_eye_x, eye_y), pupil_size)
-                mouth_size, mouth_y = int(8 * scale_factor), self.rect.top + int(28 * scale_factor)
-                pygame.draw.circle(screen, BLACK, (self.rect.centerx, mouth_y), mouth_size)
-            for particle in self.death_particles: particle.draw(screen)
+            if self.death_phase < 3 and self.death_timer > 15: screen.blit(player_sprite(self.color, self.rect.size, 0, False, True), self.rect)
+            particle_pool.draw(screen, self.player_num)
         else:
-            pygame.draw.rect(screen, self.color, self.rect); pygame.draw.rect(screen, BLACK, self.rect, 2)
-            eye_size, pupil_size, pupil_offset = 8, 4, 2
-            left_eye_center, right_eye_center = (self.rect.left + 12, self.rect.top + 15), (self.rect.right - 12, self.rect.top + 15)
-            pygame.draw.circle(screen, WHITE, left_eye_center, eye_size); pygame.draw.circle(screen, WHITE, right_eye_center, eye_size)
-            
-            pupil_x_offset = self.eye_direction * pupil_offset
-            left_pupil_pos = (left_eye_center[0] + pupil_x_offset, left_eye_center[1])
-            right_pupil_pos = (right_eye_center[0] + pupil_x_offset, right_eye_center[1])
-            pygame.draw.circle(screen, BLACK, left_pupil_pos, pupil_size); pygame.draw.circle(screen, BLACK, right_pupil_pos, pupil_size)
-            
-            mouth_y = self.rect.top + 28
-            if self.happy_face: pygame.draw.arc(screen, BLACK, (self.rect.left + 10, mouth_y - 5, 20, 15), math.pi, 2*math.pi, 2)
-            else: pygame.draw.arc(screen, BLACK, (self.rect.left + 10, mouth_y, 20, 10), 0, math.pi, 2)
-            
+            screen.blit(player_sprite(self.color, self.rect.size, self.eye_direction, self.happy_face, False), self.rect)
             if self.touching_wall and not self.on_ground:
                 side_x = self.rect.right - 3 if self.wall_jump_direction == -1 else self.rect.left
                 pygame.draw.rect(screen, WHITE, (side_x, self.rect.y + 5, 3, self.rect.height - 10))
 
+_player_sprites = OrderedDict(); PLAYER_SPRITE_CACHE_SIZE = 256
+def player_sprite(color, size, eye_direction, happy_face, surprised_face): # Body + face drawn once per look, least recently used dropped when full
+    key = (tuple(color), size, eye_direction, happy_face, surprised_face)
+    if key in _player_sprites: _player_sprites.move_to_end(key); return _player_sprites[key]
+    if len(_player_sprites) >= PLAYER_SPRITE_CACHE_SIZE: _player_sprites.popitem(last=False)
+    sprite = pygame.Surface(size); sprite = sprite.convert() if pygame.display.get_surface() else sprite; rect = sprite.get_rect()
+    pygame.draw.rect(sprite, color, rect); pygame.draw.rect(sprite, BLACK, rect, 2)
+    if surprised_face:
+        scale_factor = rect.width / 40
+        eye_size, pupil_size = int(10 * scale_factor), int(3 * scale_factor)
+        left_eye_x, right_eye_x = rect.left + int(12 * scale_factor), rect.right - int(12 * scale_factor)
+        eye_y = rect.top + int(15 * scale_factor)
+        pygame.draw.circle(sprite, WHITE, (left_eye_x, eye_y), eye_size); pygame.draw.circle(sprite, WHITE, (right_eye_x, eye_y), eye_size)
+        pygame.draw.circle(sprite, BLACK, (left_eye_x, eye_y), pupil_size); pygame.draw.circle(sprite, BLACK, (right_eye_x, eye_y), pupil_size)
+        mouth_size, mouth_y = int(8 * scale_factor), rect.top + int(28 * scale_factor)
+        pygame.draw.circle(sprite, BLACK, (rect.centerx, mouth_y), mouth_size)
+    else:
+        eye_size, pupil_size, pupil_offset = 8, 4, 2
+        left_eye_center, right_eye_center = (rect.left + 12, rect.top + 15), (rect.right - 12, rect.top + 15)
+        pygame.draw.circle(sprite, WHITE, left_eye_center, eye_size); pygame.draw.circle(sprite, WHITE, right_eye_center, eye_size)
+        
+        pupil_x_offset = eye_direction * pupil_offset
+        left_pupil_pos = (left_eye_center[0] + pupil_x_offset, left_eye_center[1])
+        right_pupil_pos = (right_eye_center[0] + pupil_x_offset, right_eye_center[1])
+        pygame.draw.circle(sprite, BLACK, left_pupil_pos, pupil_size); pygame.draw.circle(sprite, BLACK, right_pupil_pos, pupil_size)
+        
+        mouth_y = rect.top + 28
+        if happy_face: pygame.draw.arc(sprite, BLACK, (rect.left + 10, mouth_y - 5, 20, 15), math.pi, 2*math.pi, 2)
+        else: pygame.draw.arc(sprite, BLACK, (rect.left + 10, mouth_y, 20, 10), 0, math.pi, 2)
+    _player_sprites[key] = sprite; return sprite
+
 class Platform:
+    __slots__ = ('rect', 'color')
+
     def __init__(self, x, y, width, height, color=BROWN):
         self.rect = pygame.Rect(x, y, width, height); self.color = color
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect); pygame.draw.rect(screen, BLACK, self.rect, 2)
 
+class MergedPlatform(Platform):
+    """Collider from coalesce_platforms(); parts = the level platforms it covers as (level index, platform)"""
+    __slots__ = ('parts',)
+    def __init__(self, x, y, width, height, color, parts): super().__init__(x, y, width, height, color); self.parts = parts
+
+def merged_parts(colliders): # The level platforms the merged colliders were made from, in level order
+    return [p for _, p in sorted(part for c in colliders for part in c.parts)]
+
+class PlatformGrid:
+    """Uniform-grid spatial hash; query() returns only platforms in the cells a rect overlaps"""
+    def __init__(self, platforms, cell_size=GRID_CELL_SIZE):
+        self.platforms, self.cell_size = platforms, cell_size
+        self.cells = {} # (cell_x, cell_y) -> platform indices
+        for index, platform in enumerate(platforms):
+            for cell in self.cells_for_rect(platform.rect): self.cells.setdefault(cell, []).append(index)
+    def cells_for_rect(self, rect):
+        size = self.cell_size
+        for cell_x in range(rect.left // size, max(rect.left, rect.right - 1) // size + 1):
+            for cell_y in range(rect.top // size, max(rect.top, rect.bottom - 1) // size + 1):
+                yield (cell_x, cell_y)
+    def query_indices(self, rect):
+        indices = set()
+        for cell in self.cells_for_rect(rect): indices.update(self.cells.get(cell, ()))
+        return sorted(indices) # Level order, same as a full scan
+    def query(self, rect): return [self.platforms[i] for i in self.query_indices(rect)]
+
+class HazardGrid(PlatformGrid):
+    """Static grid over a level's spikes, built once at load"""
+    def contacts(self, players):
+        """(player, spike) for every spike touching a living player, in player then level order"""
+        return [(player, spike) for player in players if not player.is_dying
+                for spike in self.query(player.rect) if player.rect.colliderect(spike.rect)]
+
+def coalesce_platforms(platforms):
+    """Merge adjacent/overlapping same-colour platforms whose union is a rect. Returns (colliders, removed_count);
+    colliders are MergedPlatforms remembering the platforms they cover."""
+    rects = [(tuple(p.color), pygame.Rect(p.rect)) for p in platforms]
+    # Drop rects fully covered by another same-colour rect (first of any exact duplicates survives); the coverer takes their platforms
+    covered_by = {i: next((j for j, (oc, o) in enumerate(rects) if j != i and oc == c and o.contains(r) and (o != r or j < i)), None)
+                  for i, (c, r) in enumerate(rects)}
+    owners = {i: [i] for i, j in covered_by.items() if j is None}
+    for i, j in covered_by.items():
+        while j is not None and covered_by[j] is not None: j = covered_by[j] # Covered by a rect that is itself covered
+        if j is not None: owners[j].append(i)
+    rects = [(c, r, owners[i]) for i, (c, r) in enumerate(rects) if i in owners]
+    changed = True
+    while changed: # Alternate row merges and column merges until nothing changes
+        changed = False
+        for horizontal in (True, False):
+            if horizontal: ordered = sorted(rects, key=lambda cr: (cr[0], cr[1].y, cr[1].height, cr[1].x))
+            else: ordered = sorted(rects, key=lambda cr: (cr[0], cr[1].x, cr[1].width, cr[1].y))
+            merged = []
+            for color, rect, indices in ordered:
+                if merged:
+                    last_color, last, last_indices = merged[-1]
+                    if horizontal: touching = last.y == rect.y and last.height == rect.height and rect.left <= last.right
+                    else: touching = last.x == rect.x and last.width == rect.width and rect.top <= last.bottom
+                    if last_color == color and touching: merged[-1] = (color, last.union(rect), last_indices + indices); continue
+                merged.append((color, rect, indices))
+            if len(merged) < len(rects): changed = True
+            rects = merged
+    colliders = [MergedPlatform(r.x, r.y, r.width, r.height, c, sorted((i, platforms[i]) for i in ix)) for c, r, ix in rects]
+    colliders.sort(key=lambda c: c.parts[0][0]) # Level order (first platform of each), which collision ties rely on
+    return colliders, len(platforms) - len(colliders)
+
 class Coin:
-    def __init__(self, x, y):
-        self.rect = pygame.Rect(x, y, 30, 30); self.color = YELLOW; self.angle = 0
-    def update(self): self.angle = (self.angle + 5) % 360 # Faster rotation
+    __slots__ = ('rect', 'color')
+
+    def __init__(self, x, y): self.rect = pygame.Rect(x, y, 30, 30); self.color = YELLOW
     def draw(self, screen):
-        center = self.rect.center; points = []
-        # Draw a simpler filled circle with an inner highlight for coin
-        pygame.draw.circle(screen, self.color, center, 15)
-        pygame.draw.circle(screen, BLACK, center, 15, 2)
-        pygame.draw.circle(screen, (255,255,150), center, 10) # Highlight
-        # Optional: Add a subtle spin effect if desired (e.g., slight width change)
-        # scale_x = 15 * (0.8 + 0.2 * abs(math.cos(math.radians(self.angle))))
-        # pygame.draw.ellipse(screen, self.color, (center[0]-scale_x, center[1]-15, scale_x*2, 30))
-        # pygame.draw.ellipse(screen, BLACK, (center[0]-scale_x, center[1]-15, scale_x*2, 30),2)
+        sprite = coin_sprite(); return screen.blit(sprite, sprite.get_rect(center=self.rect.center))
+
+_coin_sprite = None
+def coin_sprite(): # The coin is round so it looks the same at every angle: render it once, anti-aliased (4x supersampled)
+    global _coin_sprite
+    if _coin_sprite is None:
+        big = pygame.Surface((136, 136), pygame.SRCALPHA); c = (68, 68)
+        pygame.draw.circle(big, YELLOW, c, 60); pygame.draw.circle(big, BLACK, c, 60, 8)
+        pygame.draw.circle(big, (255,255,150), c, 40) # Highlight
+        _coin_sprite = pygame.transform.smoothscale(big, (34, 34))
+        if pygame.display.get_surface(): _coin_sprite = _coin_sprite.convert_alpha()
+    return _coin_sprite
+
+class CoinStore:
+    """A level's coins in a PlatformGrid with an alive flag each: collecting is a grid lookup, removing a coin O(1).
+    len() and iteration only see uncollected coins, like the plain list it replaces. Coins are round, so nothing spins per step."""
+    def __init__(self, coins=()):
+        self.coins = list(coins); self.alive = bytearray([1]) * len(self.coins)
+        self.remaining = len(self.coins); self.grid = PlatformGrid(self.coins)
+    def __len__(self): return self.remaining
+    def __iter__(self): return (coin for coin, alive in zip(self.coins, self.alive) if alive)
+    def collect(self, rect):
+        """Remove every coin touching rect and return how many were collected"""
+        collected = 0
+        for index in self.grid.query_indices(rect):
+            if self.alive[index] and rect.colliderect(self.coins[index].rect): self.alive[index] = 0; collected += 1
+        self.remaining -= collected; return collected
 
 class Goal:
+    __slots__ = ('rect', 'color', 'is_door', 'door_open')
+
     def __init__(self, x, y, is_door=False):
         self.rect = pygame.Rect(x, y, 60, 80); self.color = GREEN
         self.is_door = is_door; self.door_open = False
@@ -434,38 +518,179 @@ class Goal:
             pygame.draw.polygon(screen, self.color, [(self.rect.x + 35, self.rect.y), (self.rect.x + 60, self.rect.y + 20), (self.rect.x + 35, self.rect.y + 40)])
 
 class Spike:
+    __slots__ = ('rect', 'color')
+
     def __init__(self, x, y, width=30, height=15):
         self.rect = pygame.Rect(x, y, width, height); self.color = (200, 200, 200)
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, (self.rect.x, self.rect.y + self.rect.height - 5, self.rect.width, 5))
-        num_spikes = self.rect.width // 10
-        for i in range(num_spikes):
-            spike_x = self.rect.x + i * 10 + 5
-            pygame.draw.polygon(screen, self.color, [(spike_x - 5, self.rect.y + self.rect.height - 5), (spike_x, self.rect.y), (spike_x + 5, self.rect.y + self.rect.height - 5)])
-
-class ExplosionParticle:
-    def __init__(self, x, y):
-        self.x, self.y = x, y; self.size = random.randint(3, 8)
-        self.color = random.choice(EXPLOSION_COLORS)
-        self.vel_x, self.vel_y = random.uniform(-5, 5), random.uniform(-8, -2)
-        self.gravity = 0.2; self.life = random.randint(20, 40)
+        strip, top = spike_strip(self.rect.height, self.color); x, teeth = self.rect.x, self.rect.width // 10
+        while teeth > 0: # One blit per SPIKE_STRIP_TEETH teeth; fewer teeth are the strip's right-hand end
+            count = min(teeth, SPIKE_STRIP_TEETH); width = count * 10 + 1
+            screen.blit(strip, (x, self.rect.y + top), (strip.get_width() - width, 0, width, strip.get_height())); x += count * 10; teeth -= count
+
+_spike_strips = {}; SPIKE_STRIP_TEETH = 32
+def spike_strip(height, color): # A row of spike teeth per (height, colour), drawn once; returns it and its top relative to the spike
+    key = (height, tuple(color))
+    if key not in _spike_strips:
+        top = min(0, height - 5); base_y, tip_y = height - 5 - top, -top
+        strip = pygame.Surface((SPIKE_STRIP_TEETH * 10 + 1, abs(height - 5) + 1), pygame.SRCALPHA)
+        for i in range(SPIKE_STRIP_TEETH): pygame.draw.polygon(strip, color, [(i * 10, base_y), (i * 10 + 5, tip_y), (i * 10 + 10, base_y)])
+        _spike_strips[key] = (strip.convert_alpha() if pygame.display.get_surface() else strip, top)
+    return _spike_strips[key]
+
+class ParticlePool:
+    """Explosion particles in preallocated NumPy arrays, updated in one vectorized step; free slots are reused.
+    Particles are tagged with the spawning player's number so each death animation draws its own. No-op without NumPy."""
+    def __init__(self, capacity=PARTICLE_POOL_SIZE):
+        self.enabled, self.circle_sprites = numpy is not None, {} # (color index, radius) -> circle Surface
+        if not self.enabled: return
+        self.x, self.y, self.vel_x, self.vel_y, self.size = (numpy.zeros(capacity) for _ in range(5))
+        self.life, self.color, self.owner = (numpy.zeros(capacity, dtype=numpy.int64) for _ in range(3)) # life 0 = free slot
+        self.gravity, self.rng = 0.2, numpy.random.default_rng()
+    def spawn(self, x, y, count, owner):
+        if not self.enabled: return
+        slots = numpy.flatnonzero(self.life <= 0)[:count]; count = len(slots)
+        self.x[slots], self.y[slots], self.owner[slots] = x, y, owner
+        self.vel_x[slots], self.vel_y[slots] = self.rng.uniform(-10, 10, count), self.rng.uniform(-10, 10, count)
+        self.size[slots], self.life[slots] = self.rng.integers(3, 9, count), self.rng.integers(20, 41, count)
+        self.color[slots] = self.rng.integers(0, len(EXPLOSION_COLORS), count)
     def update(self):
-        self.vel_y += self.gravity; self.x += self.vel_x; self.y += self.vel_y
-        self.life -= 1;
-        if self.life < 10: self.size = max(1, self.size - 0.2)
-    def draw(self, screen): pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(self.size))
-
-class Star:
-    def __init__(self):
-        self.x, self.y = random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT - 100)
-        self.size = random.randint(1, 3); self.twinkle_speed = random.uniform(0.01, 0.05)
-        self.brightness = random.uniform(0.5, 1.0); self.twinkle_offset = random.uniform(0, 2 * math.pi)
-    def update(self, time): self.brightness = 0.5 + 0.5 * math.sin(time * self.twinkle_speed + self.twinkle_offset)
-    def draw(self, screen):
-        color = (int(STAR_COLOR[0] * self.brightness), int(STAR_COLOR[1] * self.brightness), int(STAR_COLOR[2] * self.brightness))
-        pygame.draw.circle(screen, color, (self.x, self.y), self.size)
+        if not self.enabled: return
+        live = self.life > 0
+        self.vel_y[live] += self.gravity; self.x[live] += self.vel_x[live]; self.y[live] += self.vel_y[live]; self.life[live] -= 1
+        fading = live & (self.life < 10); self.size[fading] = numpy.maximum(1, self.size[fading] - 0.2)
+    def release(self, owner):
+        if self.enabled: self.life[self.owner == owner] = 0
+    def get_circle_sprite(self, color_index, radius):
+        if (color_index, radius) not in self.circle_sprites:
+            sprite = pygame.Surface((radius * 2, radius * 2)); sprite.set_colorkey(BLACK)
+            pygame.draw.circle(sprite, EXPLOSION_COLORS[color_index], (radius, radius), radius)
+            self.circle_sprites[(color_index, radius)] = sprite
+        return self.circle_sprites[(color_index, radius)]
+    def get_bounds(self, owner):
+        """Rect around owner's live particles, or None"""
+        slots = numpy.flatnonzero((self.life > 0) & (self.owner == owner)) if self.enabled else []
+        if len(slots) == 0: return None
+        radius = int(self.size[slots].max()) + 1; left, top = int(self.x[slots].min()) - radius, int(self.y[slots].min()) - radius
+        return pygame.Rect(left, top, int(self.x[slots].max()) + radius - left + 1, int(self.y[slots].max()) + radius - top + 1)
+    def draw(self, screen, owner):
+        if not self.enabled: return
+        slots = numpy.flatnonzero((self.life > 0) & (self.owner == owner))
+        xs, ys, radii = self.x[slots].astype(int).tolist(), self.y[slots].astype(int).tolist(), self.size[slots].astype(int).tolist()
+        screen.blits([(self.get_circle_sprite(c, r), (x - r, y - r)) for x, y, r, c in zip(xs, ys, radii, self.color[slots].tolist())], doreturn=False)
+
+particle_pool = ParticlePool()
+
+class StaticLevelLayer:
+    """The level's platforms, goal and spikes drawn once onto a screen-sized surface in the display format, so a frame
+    blits them in one go. Redrawn for a new level (platforms list), door open/closed, background or screen size, or
+    after invalidate(), which setup_display() calls on any mode change."""
+    def __init__(self): self.surface, self.level, self.key = None, None, None
+    def invalidate(self): self.surface = None
+    def draw(self, screen, platforms, spikes, goal, background_color=None):
+        """Opaque with a background_color (replaces screen.fill()), transparent without one (over the night sky)"""
+        level, key = (platforms, spikes, goal), (goal.door_open if goal else None, background_color, screen.get_size())
+        if self.level is None or any(a is not b for a, b in zip(level, self.level)) or key != self.key:
+            self.level, self.key = level, key # Holding the level keeps the identity check valid
+            self.invalidate()
+        if self.surface is None:
+            if background_color is None: self.surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA).convert_alpha(); self.surface.fill((0, 0, 0, 0))
+            else: self.surface = pygame.Surface(screen.get_size()).convert(); self.surface.fill(background_color)
+            [p.draw(self.surface) for p in platforms]
+            if goal: goal.draw(self.surface)
+            [s.draw(self.surface) for s in spikes]
+        screen.blit(self.surface, (0, 0))
+
+static_level_layer = StaticLevelLayer()
+
+class DirtyRegions:
+    """Opt-in dirty-rect presenting (DIRTY_RECT_RENDERING): add() the bounds of what moved this frame, then present()
+    updates only those plus last frame's regions. Full frames (and the one after, to erase overlays) flip everything."""
+    def __init__(self, enabled=DIRTY_RECT_RENDERING): self.enabled, self.current, self.previous, self.watched = enabled, [], None, None
+    def add(self, rect):
+        if rect: self.current.append(pygame.Rect(rect)) # Skips None and empty rects
+    def changed(self, *values):
+        """True if any value differs from the last call (new level, door opened, resized...)"""
+        changed = self.watched is None or any(a is not b and a != b for a, b in zip(values, self.watched))
+        self.watched = values; return changed
+    def present(self, full=False):
+        if not self.enabled or full or self.previous is None: logical_display.present()
+        else: logical_display.present(self.previous + self.current)
+        self.previous, self.current = None if full else self.current, []
+
+class QualityGovernor:
+    """Trades effects for frame rate: record() each frame's work time (without the frame-cap wait); every full window, an
+    average over the 1/FPS budget drops one QUALITY_LEVELS step and RECOVERY_WINDOWS averages in a row under UP_THRESHOLD
+    of it raise one. Effects read the current level from settings."""
+    UP_THRESHOLD, RECOVERY_WINDOWS = 0.6, 3
+    def __init__(self, budget=1.0 / FPS, window=QUALITY_WINDOW, enabled=ADAPTIVE_QUALITY):
+        self.budget, self.enabled, self.frame_times, self.average = budget, enabled, deque(maxlen=window), 0.0; self.set_level(0)
+    def set_level(self, level): self.level, self.settings, self.calm_windows = level, QUALITY_LEVELS[level], 0; self.frame_times.clear()
+    def record(self, frame_time):
+        if not self.enabled: return
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) < self.frame_times.maxlen: return
+        self.average = sum(self.frame_times) / len(self.frame_times); self.frame_times.clear()
+        if self.average > self.budget:
+            self.calm_windows = 0
+            if self.level < len(QUALITY_LEVELS) - 1: self.set_level(self.level + 1)
+        elif self.average < self.budget * self.UP_THRESHOLD:
+            self.calm_windows += 1
+            if self.calm_windows >= self.RECOVERY_WINDOWS and self.level > 0: self.set_level(self.level - 1)
+        else: self.calm_windows = 0
+    def draw_overlay(self, screen, font): # Frame time and each effect's level, top right; returns the box drawn
+        st = self.settings; lines = [f"Frame {self.average * 1000:.1f} ms / {self.budget * 1000:.1f} ms budget",
+            f"Quality {len(QUALITY_LEVELS) - self.level}/{len(QUALITY_LEVELS)}" + ("" if self.enabled else " (fixed)"),
+            f"Particles {st['particles']:.0%}", f"Stars {st['stars']:.0%}", f"Flash {'on' if st['flash'] else 'off'}"]
+        texts = [text_cache.render(font, line, True, WHITE) for line in lines]; lh = font.get_linesize()
+        box = pygame.Rect(0, 0, max(t.get_width() for t in texts) + 20, lh * len(texts) + 16); box.topright = (screen.get_width() - 10, 10)
+        pygame.draw.rect(screen, BLACK, box); [screen.blit(t, (box.x + 10, box.y + 8 + i * lh)) for i, t in enumerate(texts)]
+        return box
+
+quality_governor = QualityGovernor()
+
+class Starfield: # Stars in NumPy arrays: one vectorized twinkle step, pixels written into a cached sky layer via surfarray
+    def __init__(self, count=STAR_COUNT):
+        cols = [(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT - 100), random.randint(1, 3),
+                 random.uniform(0.01, 0.05), random.uniform(0, 2 * math.pi)) for _ in range(count)]
+        self.x, self.y, self.size, self.twinkle_speed, self.twinkle_offset = (list(c) for c in zip(*cols)) if cols else ([],)*5
+        if numpy is not None:
+            self.x, self.y, self.size, self.twinkle_speed, self.twinkle_offset = (numpy.array(c) for c in (self.x, self.y, self.size, self.twinkle_speed, self.twinkle_offset))
+        self.brightness, self.layer, self.layer_key, self.rects, self.shown = [1.0] * count, None, None, [], count # Only the first `shown` stars are drawn
+    def set_density(self, density): self.shown = round(len(self.brightness) * density) # Stars are in random order, so any share is spread evenly
+    def update(self, time):
+        if numpy is None: self.brightness = [0.5 + 0.5 * math.sin(time * sp + off) for sp, off in zip(self.twinkle_speed, self.twinkle_offset)]
+        else: self.brightness = 0.5 + 0.5 * numpy.sin(time * self.twinkle_speed + self.twinkle_offset)
+    def build_layer(self, size, bg_color):
+        self.layer = pygame.Surface(size); self.layer = self.layer.convert() if pygame.display.get_surface() else self.layer
+        self.layer.fill(bg_color); self.layer_key = (size, bg_color, self.shown); bounds = self.layer.get_rect()
+        offsets = {} # Pixels pygame.draw.circle() sets around the centre, per radius
+        for r in numpy.unique(self.size).tolist():
+            stamp = pygame.Surface((r * 2 + 3, r * 2 + 3)); pygame.draw.circle(stamp, WHITE, (r + 1, r + 1), r)
+            offsets[r] = numpy.argwhere(pygame.surfarray.array_red(stamp)) - (r + 1)
+        xs, ys, owners, self.rects = [numpy.zeros(0, dtype=int)], [numpy.zeros(0, dtype=int)], [numpy.zeros(0, dtype=int)], []
+        for i, (x, y, r) in enumerate(zip(self.x[:self.shown].tolist(), self.y[:self.shown].tolist(), self.size[:self.shown].tolist())):
+            px, py = x + offsets[r][:, 0], y + offsets[r][:, 1]
+            keep = (px >= 0) & (px < bounds.width) & (py >= 0) & (py < bounds.height)
+            xs.append(px[keep]); ys.append(py[keep]); owners.append(numpy.full(keep.sum(), i))
+            self.rects.append(pygame.Rect(x - r, y - r, r * 2, r * 2).clip(bounds))
+        self.pixels_x, self.pixels_y, self.pixels_star = numpy.concatenate(xs), numpy.concatenate(ys), numpy.concatenate(owners)
+    def draw(self, screen, bg_color): # Fills the screen with bg_color and the stars; returns the stars' rects
+        if numpy is None:
+            screen.fill(bg_color)
+            return [pygame.draw.circle(screen, (int(STAR_COLOR[0] * b), int(STAR_COLOR[1] * b), int(STAR_COLOR[2] * b)), (x, y), r)
+                    for x, y, r, b in zip(self.x[:self.shown], self.y, self.size, self.brightness)]
+        if self.layer is None or self.layer_key != (screen.get_size(), bg_color, self.shown): self.build_layer(screen.get_size(), bg_color)
+        pixels = pygame.surfarray.pixels3d(self.layer)
+        pixels[self.pixels_x, self.pixels_y] = (numpy.array(STAR_COLOR) * self.brightness[:, numpy.newaxis]).astype(numpy.uint8)[self.pixels_star]
+        del pixels; screen.blit(self.layer, (0, 0)) # Unlock before blitting
+        return self.rects
 
 class LevelPortal:
+    __slots__ = ('rect', 'world', 'level_num', 'base_level_name', 'portal_type', 'is_available',
+                 'glow_time', 'both_players_touching', 'color', 'accent_color')
+
     def __init__(self, x, y, world, level_num, portal_type="door", base_level_name="Level"):
         self.rect = pygame.Rect(x, y, 80, 100)
         self.world, self.level_num = world, level_num
@@ -494,17 +719,17 @@ class LevelPortal:
             display_text_str = f"{self.level_num}"
             # if len(self.base_level_name) < 12 and not self.base_level_name.startswith("Level "):
             #     display_text_str = self.base_level_name # Keep it simple with just number for now
-            level_text_surf = font_medium.render(display_text_str, True, WHITE)
+            level_text_surf = text_cache.render(font_medium, display_text_str, True, WHITE)
             text_rect = level_text_surf.get_rect(center=(self.rect.centerx, self.rect.centery - 10))
             screen.blit(level_text_surf, text_rect)
-            world_id_text = font_small.render(f"W{self.world}", True, WHITE)
+            world_id_text = text_cache.render(font_small, f"W{self.world}", True, WHITE)
             screen.blit(world_id_text, world_id_text.get_rect(center=(self.rect.centerx, self.rect.centery + 20)))
 
         elif self.portal_type == "pipe":
             pygame.draw.rect(screen, GREEN, self.rect); pygame.draw.rect(screen, BLACK, self.rect, 3)
             opening_rect = pygame.Rect(self.rect.x - 5, self.rect.y - 10, self.rect.width + 10, 20)
             pygame.draw.rect(screen, (0, 150, 0), opening_rect); pygame.draw.rect(screen, BLACK, opening_rect, 3)
-            level_text_surf = font_medium.render(f"{self.level_num}", True, WHITE)
+            level_text_surf = text_cache.render(font_medium, f"{self.level_num}", True, WHITE)
             screen.blit(level_text_surf, level_text_surf.get_rect(center=(self.rect.centerx, self.rect.top + 30)))
             
         elif self.portal_type == "portal":
@@ -514,7 +739,7 @@ class LevelPortal:
                 inner_x, inner_y = self.rect.centerx + 30 * math.cos(angle), self.rect.centery + 30 * math.sin(angle)
                 pygame.draw.circle(screen, self.color, (int(inner_x), int(inner_y)), 8)
             pygame.draw.circle(screen, (0,0,0, glow_alpha + 100), self.rect.center, 25) # Inner portal with alpha
-            level_text_surf = font_medium.render(f"{self.level_num}", True, self.accent_color)
+            level_text_surf = text_cache.render(font_medium, f"{self.level_num}", True, self.accent_color)
             screen.blit(level_text_surf, level_text_surf.get_rect(center=self.rect.center))
         
         if self.both_players_touching:
@@ -523,7 +748,7 @@ class LevelPortal:
             screen.blit(glow_surface, (self.rect.x - 10, self.rect.y - 10))
         
         # Base level name above portal
-        base_name_text = font_small.render(self.base_level_name, True, WHITE)
+        base_name_text = text_cache.render(font_small, self.base_level_name, True, WHITE)
         base_name_rect = base_name_text.get_rect(center=(self.rect.centerx, self.rect.y - 15))
         pygame.draw.rect(screen, (50,50,50,150), base_name_rect.inflate(10,4), border_radius=3) # semi-transparent bg
         screen.blit(base_name_text, base_name_rect)
@@ -538,6 +763,9 @@ class LevelManager:
         self.current_level = 1 # Base level number
         self.current_selected_version_id = None
         self.current_level_data = {} # Data of the currently loaded level version
+        self.collision_platforms, self.colliders_removed = [], 0 # Coalesced colliders for the loaded level
+        self.platform_grid = None # Spatial hash over collision_platforms
+        self.hazard_grid = None # Spatial hash over the loaded level's spikes
         self.scan_available_levels()
 
         self.max_worlds = max([meta['world'] for meta in self.base_levels_meta]) if self.base_levels_meta else 1
@@ -634,21 +862,29 @@ class LevelManager:
 
     def parse_level_data(self, level_data_to_parse): # Takes the full data dict
         platforms = [Platform(p['x'], p['y'], p['width'], p['height'], tuple(p.get('color', BROWN))) for p in level_data_to_parse.get('platforms', [])]
-        coins = [Coin(c['x'], c['y']) for c in level_data_to_parse.get('coins', [])]
+        coins = CoinStore(Coin(c['x'], c['y']) for c in level_data_to_parse.get('coins', []))
         spikes = [Spike(s['x'], s['y'], s.get('width', 30), s.get('height', 15)) for s in level_data_to_parse.get('spikes', [])]
         total_coins = len(coins)
+        self.build_colliders(platforms, spikes) # Built once per level load; platforms are still returned for drawing
         # self.current_level_data is already set by load_level_from_json before calling this
         return platforms, coins, total_coins, spikes
 
     def create_fallback_level(self):
         print("Loading fallback level.")
         platforms = [Platform(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 40)]
-        coins = [Coin(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)]
+        coins = CoinStore([Coin(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)])
+        self.build_colliders(platforms)
         # self.current_level_data should be set by the caller to reflect fallback state
         self.current_level_data.setdefault('goal', {'x': SCREEN_WIDTH - 100, 'y': SCREEN_HEIGHT - 120, 'is_door': False})
         self.current_level_data.setdefault('player_spawns', [{'x':100, 'y':SCREEN_HEIGHT-100}, {'x':150, 'y':SCREEN_HEIGHT-100}])
         return platforms, coins, 1, []
 
+    def build_colliders(self, platforms, spikes=()):
+        self.collision_platforms, self.colliders_removed = coalesce_platforms(platforms)
+        self.platform_grid = PlatformGrid(self.collision_platforms)
+        self.hazard_grid = HazardGrid(list(spikes))
+        if self.colliders_removed and LOG_COLLIDER_COALESCING: print(f"Coalesced {len(platforms)} platforms into {len(self.collision_platforms)} colliders ({self.colliders_removed} removed)")
+
     def get_level(self, version_id_to_load): # Must provide version_id
         # self.current_world and self.current_level (base) should be set by caller
         self.current_selected_version_id = version_id_to_load
@@ -668,7 +904,7 @@ class LevelManager:
 class LevelSelectMap:
     def __init__(self, level_manager):
         self.level_manager = level_manager
-        self.platforms = []; self.portals = []
+        self.platforms = []; self.portals = []; self.background = None # Cached static map
         self.create_level_select_map()
 
     def create_level_select_map(self):
@@ -708,30 +944,40 @@ class LevelSelectMap:
             
             self.portals.append(LevelPortal(x, y, world, level_num, config['type'], base_name))
             portals_in_world_count[world] +=1
+        self.platform_grid = PlatformGrid(self.platforms)
 
     def update(self, player1, player2): [p.update(player1, player2) for p in self.portals]
     def check_portal_activation(self, player1, player2):
         for portal in self.portals:
             if portal.both_players_touching: return portal.world, portal.level_num
         return None, None
-    def draw(self, screen):
-        for y_grad in range(SCREEN_HEIGHT): # Gradient sky
-            ratio = y_grad / SCREEN_HEIGHT
+    def invalidate(self): self.background = None # Rebuilt by the next draw()
+
+    def build_background(self, size): # Sky, platforms, title and instructions never move: draw them once
+        (width, height), bg = size, pygame.Surface(size).convert()
+        for y_grad in range(height): # Gradient sky
+            ratio = y_grad / height
             r,g,b = int(135*(1-ratio)+25*ratio), int(206*(1-ratio)+25*ratio), int(235*(1-ratio)+50*ratio)
-            pygame.draw.line(screen, (r,g,b), (0, y_grad), (SCREEN_WIDTH, y_grad))
+            pygame.draw.line(bg, (r,g,b), (0, y_grad), (width, y_grad))
         
-        [p.draw(screen) for p in self.platforms]; [p.draw(screen) for p in self.portals]
+        [p.draw(bg) for p in self.platforms]
         
-        title_text = font_large.render("LEVEL SELECT", True, BLACK)
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 50))
-        pygame.draw.rect(screen, WHITE, title_rect.inflate(40, 20), border_radius=5)
-        pygame.draw.rect(screen, BLACK, title_rect.inflate(40, 20), 3, border_radius=5)
-        screen.blit(title_text, title_rect)
+        title_text = text_cache.render(font_large, "LEVEL SELECT", True, BLACK)
+        title_rect = title_text.get_rect(center=(width//2, 50))
+        pygame.draw.rect(bg, WHITE, title_rect.inflate(40, 20), border_radius=5)
+        pygame.draw.rect(bg, BLACK, title_rect.inflate(40, 20), 3, border_radius=5)
+        bg.blit(title_text, title_rect)
         
-        instr_text = font_medium.render("Move both players to a portal and press SPACE/ENTER", True, BLACK)
-        instr_rect = instr_text.get_rect(center=(SCREEN_WIDTH//2, 110))
-        pygame.draw.rect(screen, (*WHITE, 200), instr_rect.inflate(20,10), border_radius=3) # semi-transparent
-        screen.blit(instr_text, instr_rect)
+        instr_text = text_cache.render(font_medium, "Move both players to a portal and press SPACE/ENTER", True, BLACK)
+        instr_rect = instr_text.get_rect(center=(width//2, 110))
+        pygame.draw.rect(bg, (*WHITE, 200), instr_rect.inflate(20,10), border_radius=3) # semi-transparent
+        bg.blit(instr_text, instr_rect)
+        return bg
+
+    def draw(self, screen):
+        if self.background is None or self.background.get_size() != screen.get_size(): # Resized / fullscreen
+            self.background = self.build_background(screen.get_size())
+        screen.blit(self.background, (0, 0)); [p.draw(screen) for p in self.portals]
 
 # --- Utility functions for game ---
 def create_goal_from_level_data(level_manager):
@@ -745,8 +991,67 @@ def update_player_spawn_points(level_manager, player1, player2):
     player1.spawn_x, player1.spawn_y = p1_spawn.get('x', 100), p1_spawn.get('y', SCREEN_HEIGHT - 100)
     player2.spawn_x, player2.spawn_y = p2_spawn.get('x', 150), p2_spawn.get('y', SCREEN_HEIGHT - 100)
 
+def update_playing_state(player1, player2, platforms, coins_list, spikes, goal, keys_pressed, platform_grid=None, hazard_grid=None):
+    """One physics step of a level (players, coins, spikes, goal/door). Returns True once the level is won."""
+    player1.update(platforms, coins_list, keys_pressed, [player2], platform_grid)
+    player2.update(platforms, coins_list, keys_pressed, [player1], platform_grid)
+    particle_pool.update()
+    for player, spike_obj in (hazard_grid or HazardGrid(spikes)).contacts((player1, player2)):
+        if not player.is_dying: player.start_death_animation() # Only the first spike touched counts
+    player1.happy_face = player2.happy_face = not coins_list
+    if goal and goal.is_door: goal.door_open = not coins_list
+    return bool(goal and player1.rect.colliderect(goal.rect) and player2.rect.colliderect(goal.rect) and not coins_list)
+
+class KeyState:
+    """Stand-in for pygame.key.get_pressed(): indexable by key code, True for keys held this step"""
+    def __init__(self, held_keys=()): self.held_keys = set(held_keys)
+    def __getitem__(self, key): return key in self.held_keys
+
+class HeadlessGame:
+    """Level simulation with no window or audio. step(inputs) takes the held pygame key codes and returns the state."""
+    def __init__(self, world=1, level_num=1, version_id=None, level_manager=None):
+        self.level_manager = level_manager or LevelManager()
+        self.player1 = Player(100, SCREEN_HEIGHT - 100, BLUE, 1); self.player2 = Player(150, SCREEN_HEIGHT - 100, RED, 2)
+        self.load_level(world, level_num, version_id)
+
+    def load_level(self, world, level_num, version_id=None):
+        if version_id is None: # Default to the first version of the base level
+            versions = self.level_manager.get_versions_for_level(world, level_num)
+            version_id = versions[0]['id'] if versions else "default"
+        self.level_manager.current_world, self.level_manager.current_level = world, level_num
+        self.platforms, self.coins_list, self.total_coins, self.spikes = self.level_manager.get_level(version_id)
+        self.goal = create_goal_from_level_data(self.level_manager)
+        update_player_spawn_points(self.level_manager, self.player1, self.player2)
+        for player in (self.player1, self.player2):
+            player.rect.width, player.rect.height = 40, 40; player.respawn()
+        self.frame, self.deaths, self.level_complete = 0, 0, False
+
+    def step(self, inputs=()):
+        if not self.level_complete:
+            was_dying = [self.player1.is_dying, self.player2.is_dying]
+            self.level_complete = update_playing_state(self.player1, self.player2, self.platforms, self.coins_list, self.spikes,
+                                                       self.goal, KeyState(inputs), self.level_manager.platform_grid, self.level_manager.hazard_grid)
+            self.deaths += sum(1 for p, before in zip((self.player1, self.player2), was_dying) if p.is_dying and not before)
+        self.frame += 1
+        return self.get_state()
+
+    def run(self, input_frames):
+        state = self.get_state()
+        for inputs in input_frames: state = self.step(inputs)
+        return state
+
+    def get_state(self):
+        players = [{'x': p.rect.x, 'y': p.rect.y, 'vel_x': p.vel_x, 'vel_y': p.vel_y, 'on_ground': p.on_ground,
+                    'is_dying': p.is_dying, 'collected_coins': p.collected_coins} for p in (self.player1, self.player2)]
+        return {'frame': self.frame, 'world': self.level_manager.current_world, 'level': self.level_manager.current_level,
+                'version_id': self.level_manager.current_selected_version_id, 'players': players,
+                'coins_remaining': len(self.coins_list), 'total_coins': self.total_coins,
+                'deaths': self.deaths, 'level_complete': self.level_complete}
+
 # --- Main Game Loop ---
 def main():
+    global FULLSCREEN # Toggled by F11
+    pygame.init(); setup_display(); init_sounds() # Window and audio only start here
     level_manager = LevelManager()
     game_state = GAME_STATE_LEVEL_SELECT
     level_select_map = LevelSelectMap(level_manager) # Create once
@@ -754,8 +1059,10 @@ def main():
     player1 = Player(100, SCREEN_HEIGHT - 100, BLUE, 1) # Initial spawn for level select
     player2 = Player(150, SCREEN_HEIGHT - 100, RED, 2)  # Initial spawn for level select
 
-    platforms, coins_list, total_coins, spikes, goal = [], [], 0, [], None
-    stars = [Star() for _ in range(100)]; time_elapsed = 0
+    platforms, coins_list, total_coins, spikes, goal = [], CoinStore(), 0, [], None
+    starfield = Starfield(); time_elapsed = 0
+    dirty_regions = DirtyRegions() # Whole window each frame unless DIRTY_RECT_RENDERING
+    show_quality_overlay = SHOW_QUALITY_OVERLAY
     
     # For VERSION_SELECT state
     selected_base_world, selected_base_level_num = None, None
@@ -766,7 +1073,7 @@ def main():
     while running:
         time_elapsed += 0.1; keys_pressed = pygame.key.get_pressed()
         
-        for event in pygame.event.get():
+        for event in map(logical_display.map_event, pygame.event.get()): # Mouse/touch positions in logical coordinates
             if event.type == pygame.QUIT: running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
@@ -806,30 +1113,21 @@ def main():
                 elif event.key == pygame.K_n and game_state == GAME_STATE_PLAYING and game_complete_flag:
                     game_state = GAME_STATE_LEVEL_SELECT; level_manager.reset_level_tracking() # Return to map
 
-                elif event.key == pygame.K_F11: FULLSCREEN = not FULLSCREEN; setup_display()
+                elif event.key == pygame.K_F11: FULLSCREEN = not FULLSCREEN; setup_display(); level_select_map.invalidate()
+                elif event.key == pygame.K_F3: show_quality_overlay = not show_quality_overlay # Frame time / quality overlay
         
         # Updates
         if game_state == GAME_STATE_LEVEL_SELECT:
             level_select_map.update(player1, player2)
-            player1.update(level_select_map.platforms, [], keys_pressed, [player2])
-            player2.update(level_select_map.platforms, [], keys_pressed, [player1])
+            player1.update(level_select_map.platforms, CoinStore(), keys_pressed, [player2], level_select_map.platform_grid)
+            player2.update(level_select_map.platforms, CoinStore(), keys_pressed, [player1], level_select_map.platform_grid)
+            particle_pool.update()
         elif game_state == GAME_STATE_PLAYING and not game_complete_flag:
-            player1.update(platforms, coins_list, keys_pressed, [player2])
-            player2.update(platforms, coins_list, keys_pressed, [player1])
-            [c.update() for c in coins_list]
-            
-            for spike_obj in spikes: # Renamed to avoid conflict
-                if not player1.is_dying and player1.rect.colliderect(spike_obj.rect): player1.start_death_animation()
-                if not player2.is_dying and player2.rect.colliderect(spike_obj.rect): player2.start_death_animation()
-
-            if (goal and player1.rect.colliderect(goal.rect) and player2.rect.colliderect(goal.rect) and not coins_list):
-                if not game_complete_flag: level_complete_sound.play()
-                game_complete_flag = True
-            
-            player1.happy_face = player2.happy_face = not coins_list
-            if goal and goal.is_door: goal.door_open = not coins_list
+            if update_playing_state(player1, player2, platforms, coins_list, spikes, goal, keys_pressed, level_manager.platform_grid, level_manager.hazard_grid):
+                level_complete_sound.play(); game_complete_flag = True
 
         # Drawing
+        full_frame = True # The playing state narrows this down to dirty regions
         if game_state == GAME_STATE_LEVEL_SELECT:
             level_select_map.draw(screen)
             player1.draw(screen); player2.draw(screen)
@@ -837,72 +1135,72 @@ def main():
             if aw:
                 portal_obj = next((p for p in level_select_map.portals if p.world == aw and p.level_num == aln), None)
                 p_name = portal_obj.base_level_name if portal_obj else f"L{aln}"
-                prompt = font_medium.render(f"SPACE for {p_name} (W{aw})", True, GREEN)
+                prompt = text_cache.render(font_medium, f"SPACE for {p_name} (W{aw})", True, GREEN)
                 pr_rect = prompt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30))
                 pygame.draw.rect(screen, (*WHITE,200), pr_rect.inflate(10,5), border_radius=3)
                 screen.blit(prompt, pr_rect)
 
         elif game_state == GAME_STATE_VERSION_SELECT:
-            screen.fill(NIGHT_SKY) # Darker bg for selection
-            for s in stars:
-                s.update(time_elapsed)
-                s.draw(screen)
+            starfield.update(time_elapsed); starfield.draw(screen, NIGHT_SKY) # Darker bg for selection
             title_str = f"World {selected_base_world} - Level {selected_base_level_num}: Select Version"
-            title_surf = font_large.render(title_str, True, WHITE)
+            title_surf = text_cache.render(font_large, title_str, True, WHITE)
             screen.blit(title_surf, title_surf.get_rect(center=(SCREEN_WIDTH // 2, 80)))
 
             if not available_versions_for_selection:
-                screen.blit(font_medium.render("No versions found!", True, RED), (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2))
+                screen.blit(text_cache.render(font_medium, "No versions found!", True, RED), (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2))
             else:
                 for i, ver_info in enumerate(available_versions_for_selection):
                     text = f"{ver_info['display_name']} (ID: {ver_info['id']})"
                     color = YELLOW if i == current_version_selection_idx else WHITE
-                    surf = font_medium.render(text, True, color)
+                    surf = text_cache.render(font_medium, text, True, color)
                     rect = surf.get_rect(center=(SCREEN_WIDTH // 2, 200 + i * 60))
                     bg_rect_color = (*GRAY, 100) if i == current_version_selection_idx else (*GRAY, 50)
                     pygame.draw.rect(screen, bg_rect_color, rect.inflate(20,10), border_radius=5)
                     screen.blit(surf, rect)
-            instr = font_small.render("UP/DOWN, SPACE/ENTER to Select, ESC for Map", True, WHITE)
+            instr = text_cache.render(font_small, "UP/DOWN, SPACE/ENTER to Select, ESC for Map", True, WHITE)
             screen.blit(instr, instr.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50)))
 
         elif game_state == GAME_STATE_PLAYING:
             level_data = level_manager.get_current_level_data()
             bg_color = get_current_background_color(level_data)
             txt_color = get_text_color(bg_color)
-            screen.fill(bg_color)
             if level_data.get('background_type') == 'night':
-                for s in stars:
-                    s.update(time_elapsed)
-                    s.draw(screen)
+                starfield.set_density(quality_governor.settings['stars']); starfield.update(time_elapsed); [dirty_regions.add(r) for r in starfield.draw(screen, bg_color)]
+                static_level_layer.draw(screen, platforms, spikes, goal)
+            else: static_level_layer.draw(screen, platforms, spikes, goal, bg_color) # Also clears the screen
 
-            [p.draw(screen) for p in platforms]; [c.draw(screen) for c in coins_list]
-            if goal: goal.draw(screen)
-            [s.draw(screen) for s in spikes] # Renamed for clarity
+            [dirty_regions.add(c.draw(screen)) for c in coins_list] # Coins over the static layer
             player1.draw(screen); player2.draw(screen)
+            for player in (player1, player2):
+                dirty_regions.add(player.rect.inflate(4, 4)); dirty_regions.add(particle_pool.get_bounds(player.player_num))
+            white_flash = any(p.is_flashing() for p in (player1, player2))
+            level_changed = dirty_regions.changed(platforms, goal, goal.door_open if goal else None, bg_color, screen.get_size())
+            full_frame = level_changed or white_flash or game_complete_flag
             
             # UI Text
             lvl_name = level_data.get('name', "Unnamed Level")
             ver_id = level_data.get('version_id', "N/A")
-            screen.blit(font_medium.render(f"{lvl_name} (v: {ver_id})", True, txt_color), (20, 20))
+            dirty_regions.add(screen.blit(text_cache.render(font_medium, f"{lvl_name} (v: {ver_id})", True, txt_color), (20, 20)))
             collected = player1.collected_coins + player2.collected_coins
-            screen.blit(font_medium.render(f"Coins: {collected}/{total_coins}", True, txt_color), (20, 60))
+            dirty_regions.add(screen.blit(text_cache.render(font_medium, f"Coins: {collected}/{total_coins}", True, txt_color), (20, 60)))
 
             if game_complete_flag:
-                comp_text = font_large.render("LEVEL COMPLETE!", True, GREEN)
+                comp_text = text_cache.render(font_large, "LEVEL COMPLETE!", True, GREEN)
                 comp_rect = comp_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 40))
                 pygame.draw.rect(screen,WHITE,comp_rect.inflate(20,10), border_radius=5); screen.blit(comp_text,comp_rect)
-                next_text = font_medium.render("N for Level Select, R to Replay", True, BLACK)
+                next_text = text_cache.render(font_medium, "N for Level Select, R to Replay", True, BLACK)
                 screen.blit(next_text, next_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 30)))
             
             # Basic instructions on playing screen
             instr_y_start = SCREEN_HEIGHT - 100
             instructions_playing = ["P1: WASD, P2: Arrows", "R: Restart, ESC: Map"]
             for i, txt in enumerate(instructions_playing):
-                screen.blit(font_small.render(txt, True, txt_color), (20, instr_y_start + i * 20))
+                screen.blit(text_cache.render(font_small, txt, True, txt_color), (20, instr_y_start + i * 20))
 
 
-        pygame.display.flip()
-        clock.tick(FPS)
+        if show_quality_overlay: dirty_regions.add(quality_governor.draw_overlay(screen, font_small))
+        dirty_regions.present(full_frame)
+        clock.tick(FPS); quality_governor.record(clock.get_rawtime() / 1000.0) # Work time only, not the frame-cap wait
     
     pygame.quit()
     sys.exit()
@@ -4,6 +4,8 @@ import math
 import os
 import glob
 import re
+from text_cache import text_cache
+from screen_effects import screen_effects
 
 # Initialize pygame
 pygame.init()
@@ -242,14 +244,8 @@ class LevelBrowser:
         # Update dimensions in case screen size changed
         self.update_dimensions()
         
-        # Get current screen dimensions
-        screen_width, screen_height = screen.get_size()
-        
         # Draw semi-transparent overlay
-        overlay = pygame.Surface((screen_width, screen_height))
-        overlay.set_alpha(128)
-        overlay.fill(BLACK)
-        screen.blit(overlay, (0, 0))
+        screen_effects.fade(screen, 128)
         
         # Draw main browser window
         pygame.draw.rect(screen, DARK_GRAY, self.browser_rect)
@@ -257,7 +253,7 @@ class LevelBrowser:
         
         # Draw title
         title = "Load Level" if self.mode == "load" else "Save Level"
-        title_surface = self.title_font.render(title, True, WHITE)
+        title_surface = text_cache.render(self.title_font, title, True, WHITE)
         title_x = self.browser_rect.x + (self.browser_rect.width - title_surface.get_width()) // 2
         screen.blit(title_surface, (title_x, self.browser_rect.y + 10))
         
@@ -272,8 +268,8 @@ class LevelBrowser:
         pygame.draw.rect(screen, load_color, load_tab, 2)
         pygame.draw.rect(screen, save_color, save_tab, 2)
         
-        load_text = self.font.render("Load", True, load_color)
-        save_text = self.font.render("Save", True, save_color)
+        load_text = text_cache.render(self.font, "Load", True, load_color)
+        save_text = text_cache.render(self.font, "Save", True, save_color)
         
         screen.blit(load_text, (load_tab.x + 35, load_tab.y + 5))
         screen.blit(save_text, (save_tab.x + 35, save_tab.y + 5))
@@ -297,11 +293,11 @@ class LevelBrowser:
         pygame.draw.rect(screen, WHITE, self.list_rect, 2)
         
         # Draw list header
-        header_text = self.font.render("Available Levels", True, WHITE)
+        header_text = text_cache.render(self.font, "Available Levels", True, WHITE)
         screen.blit(header_text, (self.list_rect.x + 10, self.list_rect.y - 25))
         
         if not self.levels:
-            no_levels_text = self.font.render("No levels found", True, GRAY)
+            no_levels_text = text_cache.render(self.font, "No levels found", True, GRAY)
             text_x = self.list_rect.x + (self.list_rect.width - no_levels_text.get_width()) // 2
             text_y = self.list_rect.y + (self.list_rect.height - no_levels_text.get_height()) // 2
             screen.blit(no_levels_text, (text_x, text_y))
@@ -328,8 +324,8 @@ class LevelBrowser:
             world_level = f"W{level['world']}L{level['level']}"
             name = level['name'][:30] + "..." if len(level['name']) > 30 else level['name']
             
-            world_text = self.small_font.render(world_level, True, WHITE)
-            name_text = self.small_font.render(name, True, WHITE)
+            world_text = text_cache.render(self.small_font, world_level, True, WHITE)
+            name_text = text_cache.render(self.small_font, name, True, WHITE)
             
             screen.blit(world_text, (self.list_rect.x + 5, y + 2))
             screen.blit(name_text, (self.list_rect.x + 60, y + 2))
@@ -340,7 +336,7 @@ class LevelBrowser:
         pygame.draw.rect(screen, WHITE, self.preview_rect, 2)
         
         # Draw preview header
-        header_text = self.font.render("Level Preview", True, WHITE)
+        header_text = text_cache.render(self.font, "Level Preview", True, WHITE)
         screen.blit(header_text, (self.preview_rect.x + 10, self.preview_rect.y - 25))
         
         if not self.levels or self.selected_index >= len(self.levels):
@@ -361,7 +357,7 @@ class LevelBrowser:
         ]
         
         for detail in details:
-            text = self.small_font.render(detail, True, WHITE)
+            text = text_cache.render(self.small_font, detail, True, WHITE)
             screen.blit(text, (self.preview_rect.x + 10, y_pos))
             y_pos += 20
         
@@ -413,7 +409,7 @@ class LevelBrowser:
         pygame.draw.rect(screen, WHITE if self.typing_filename else GRAY, input_rect, 2)
         
         # Draw label
-        label_text = self.font.render("Filename:", True, WHITE)
+        label_text = text_cache.render(self.font, "Filename:", True, WHITE)
         screen.blit(label_text, (input_rect.x - 80, input_rect.y + 5))
         
         # Draw filename
@@ -421,7 +417,7 @@ class LevelBrowser:
         if self.typing_filename and pygame.time.get_ticks() % 1000 < 500:
             display_text += "|"  # Blinking cursor
         
-        filename_text = self.font.render(display_text, True, BLACK if self.typing_filename else WHITE)
+        filename_text = text_cache.render(self.font, display_text, True, BLACK if self.typing_filename else WHITE)
         screen.blit(filename_text, (input_rect.x + 5, input_rect.y + 5))
     
     def draw_instructions(self, screen):
@@ -435,7 +431,7 @@ class LevelBrowser:
         
         y_pos = self.browser_rect.bottom + 10
         for instruction in instructions:
-            text = self.small_font.render(instruction, True, WHITE)
+            text = text_cache.render(self.small_font, instruction, True, WHITE)
             screen.blit(text, (self.browser_rect.x, y_pos))
             y_pos += 18
 
@@ -449,6 +445,7 @@ class LevelEditor:
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 24)
         self.small_font = pygame.font.Font(None, 18)
+        self.help_title_font = pygame.font.Font(None, 36)
         
         # Level data
         self.platforms = []
@@ -918,7 +915,7 @@ class LevelEditor:
             texts.append(f"Selected Spawn: {self.selected_spawn + 1}")
         
         for text in texts:
-            surface = self.font.render(text, True, WHITE)
+            surface = text_cache.render(self.font, text, True, WHITE)
             self.screen.blit(surface, (20, y_pos))
             y_pos += 20
     
@@ -930,11 +927,8 @@ class LevelEditor:
         # Get current screen dimensions
         screen_width, screen_height = self.screen.get_size()
         
-        # Create semi-transparent overlay
-        overlay = pygame.Surface((screen_width, screen_height))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        # Draw semi-transparent overlay
+        screen_effects.fade(self.screen, 200)
         
         # Help panel dimensions
         panel_width = min(800, screen_width - 100)
@@ -948,8 +942,7 @@ class LevelEditor:
         pygame.draw.rect(self.screen, WHITE, help_rect, 3)
         
         # Title
-        title_font = pygame.font.Font(None, 36)
-        title_text = title_font.render("Level Editor - Shortcut Keys", True, WHITE)
+        title_text = text_cache.render(self.help_title_font, "Level Editor - Shortcut Keys", True, WHITE)
         title_x = panel_x + (panel_width - title_text.get_width()) // 2
         self.screen.blit(title_text, (title_x, panel_y + 20))
         
@@ -1004,9 +997,9 @@ class LevelEditor:
         for text, color in left_content:
             if text:
                 if color == WHITE:  # Headers
-                    surface = self.font.render(text, True, color)
+                    surface = text_cache.render(self.font, text, True, color)
                 else:  # Regular items
-                    surface = self.small_font.render(text, True, color)
+                    surface = text_cache.render(self.small_font, text, True, color)
                 self.screen.blit(surface, (left_x, y_pos))
             y_pos += 25 if color == WHITE else 20
         
@@ -1015,14 +1008,14 @@ class LevelEditor:
         for text, color in right_content:
             if text:
                 if color == WHITE:  # Headers
-                    surface = self.font.render(text, True, color)
+                    surface = text_cache.render(self.font, text, True, color)
                 else:  # Regular items
-                    surface = self.small_font.render(text, True, color)
+                    surface = text_cache.render(self.small_font, text, True, color)
                 self.screen.blit(surface, (right_x, y_pos))
             y_pos += 25 if color == WHITE else 20
         
         # Footer instruction
-        footer_text = self.font.render("Press H to close this help", True, YELLOW)
+        footer_text = text_cache.render(self.font, "Press H to close this help", True, YELLOW)
         footer_x = panel_x + (panel_width - footer_text.get_width()) // 2
         footer_y = panel_y + panel_height - 40
         self.screen.blit(footer_text, (footer_x, footer_y))
@@ -0,0 +1,150 @@
+"""
+A fixed-size logical screen for game.py and game_gemini.py, presented scaled to whatever
+window or monitor the game runs on.
+
+The games draw everything at LOGICAL_SIZE (the 1280x720 the levels are authored for), so
+a 4K smartboard costs the same fill work as a laptop. present() scales the finished frame
+to the window once, keeping its aspect ratio and centring it between black bars. Mouse and
+touch events are mapped back to logical coordinates with map_event(). A fixed-size window
+of the logical size is itself the drawing surface and nothing is scaled; a resizable
+window always gets a separate logical surface, which stays the same Surface however the
+window is resized, so the game can keep drawing on the one set_mode() returned.
+
+    from logical_display import logical_display
+    screen = logical_display.set_mode((0, 0), pygame.FULLSCREEN)  # Monitor size, drawn at 1280x720
+    ...
+    event = logical_display.map_event(event)  # Clicks and touches in logical coordinates
+    logical_display.present()                  # Instead of pygame.display.flip()
+
+Scale modes:
+    "fit"      Nearest-neighbour scale (pygame.transform.scale) to the largest size that fits
+    "integer"  Nearest-neighbour at the largest whole multiple that fits, for sharp pixels
+               ("fit" when the window is smaller than the logical size)
+    "smooth"   Bilinear scale (pygame.transform.smoothscale) to the largest size that fits
+"""
+
+import pygame
+
+LOGICAL_SIZE = (1280, 720)
+SCALE_MODES = ("fit", "integer", "smooth")
+LETTERBOX_COLOR = (0, 0, 0)
+
+MOUSE_EVENTS = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+FINGER_EVENTS = (pygame.FINGERMOTION, pygame.FINGERDOWN, pygame.FINGERUP)
+
+class LogicalDisplay:
+    def __init__(self, size=LOGICAL_SIZE, scale_mode="fit"):
+        if scale_mode not in SCALE_MODES:
+            raise ValueError(f"Unknown scale mode {scale_mode!r}, expected one of {SCALE_MODES}")
+        self.size = tuple(size)
+        self.scale_mode = scale_mode
+        self.window = None
+        self.window_size = None
+        self.surface = None  # What the game draws on
+        self.offscreen = False  # Always draw on a separate surface (resizable windows)
+        self.dest = pygame.Rect((0, 0), self.size)  # Where the logical screen lands in the window
+        self.target = None  # The window's subsurface at dest, scaled into by present()
+
+    def set_mode(self, window_size=(0, 0), flags=0, size=None):
+        """Open the window (pygame.display.set_mode arguments) and return the surface to draw on"""
+        if size is not None:
+            self.size = tuple(size)
+        pygame.display.set_mode(window_size, flags)
+        self.offscreen = bool(flags & pygame.RESIZABLE)
+        self.surface = None  # A new one, in the new display's format
+        self.resize()
+        return self.surface
+
+    def resize(self):
+        """Fit the logical screen to the window's current size"""
+        self.window = pygame.display.get_surface()
+        self.window_size = self.window.get_size()
+        if self.window_size == self.size and not self.offscreen:
+            self.surface = self.window
+            self.dest = self.window.get_rect()
+            self.target = None
+            return
+
+        window_width, window_height = self.window_size
+        width, height = self.size
+        scale = min(window_width / width, window_height / height)
+        if self.scale_mode == "integer" and scale >= 1:
+            scale = int(scale)
+        self.dest = pygame.Rect(0, 0, max(1, round(width * scale)), max(1, round(height * scale)))
+        self.dest.center = (window_width // 2, window_height // 2)
+
+        if self.surface is None or self.surface is self.window or self.surface.get_size() != self.size:
+            self.surface = pygame.Surface(self.size).convert()
+        self.window.fill(LETTERBOX_COLOR)
+        self.target = self.window.subsurface(self.dest)
+
+    @property
+    def scaled(self):
+        """Whether the game draws on a surface of its own, copied (or scaled) to the window"""
+        return self.target is not None
+
+    def present(self, rects=None):
+        """Show the frame: pygame.display.flip(), or update(rects) for logical rects only"""
+        if self.window is not None and self.window.get_size() != self.window_size:
+            self.resize()  # A resizable window was resized; this frame's bars are refilled
+            rects = None
+        if self.scaled:
+            if self.dest.size == self.size:
+                self.target.blit(self.surface, (0, 0))
+            elif self.scale_mode == "smooth":
+                pygame.transform.smoothscale(self.surface, self.dest.size, self.target)
+            else:
+                pygame.transform.scale(self.surface, self.dest.size, self.target)
+            if rects is not None:
+                rects = [self.to_window_rect(rect) for rect in rects]
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+    def to_logical(self, pos):
+        """A window position as a logical one; positions on the bars land on the nearest edge"""
+        x = (pos[0] - self.dest.x) * self.size[0] // self.dest.width
+        y = (pos[1] - self.dest.y) * self.size[1] // self.dest.height
+        return (min(max(x, 0), self.size[0] - 1), min(max(y, 0), self.size[1] - 1))
+
+    def to_window_rect(self, rect):
+        """The window area a logical rect is scaled to, rounded out (plus a pixel for smoothing)"""
+        rect = pygame.Rect(rect)
+        scale_x = self.dest.width / self.size[0]
+        scale_y = self.dest.height / self.size[1]
+        left = self.dest.x + int(rect.left * scale_x) - 1
+        top = self.dest.y + int(rect.top * scale_y) - 1
+        right = self.dest.x + int(rect.right * scale_x + 0.999) + 1
+        bottom = self.dest.y + int(rect.bottom * scale_y + 0.999) + 1
+        return pygame.Rect(left, top, right - left, bottom - top).clip(self.dest)
+
+    def map_event(self, event):
+        """The event with mouse and touch positions in logical coordinates (others unchanged)"""
+        if not self.scaled:
+            return event
+        if event.type in MOUSE_EVENTS:
+            attributes = dict(event.dict, pos=self.to_logical(event.pos))
+            if 'rel' in attributes:
+                attributes['rel'] = (event.rel[0] * self.size[0] // self.dest.width,
+                                     event.rel[1] * self.size[1] // self.dest.height)
+            return pygame.event.Event(event.type, attributes)
+        if event.type in FINGER_EVENTS:
+            # Touch positions are fractions of the window; make them fractions of the logical screen
+            window_width, window_height = self.window_size
+            x = (event.x * window_width - self.dest.x) / self.dest.width
+            y = (event.y * window_height - self.dest.y) / self.dest.height
+            return pygame.event.Event(event.type, dict(
+                event.dict,
+                x=min(max(x, 0.0), 1.0),
+                y=min(max(y, 0.0), 1.0),
+                dx=event.dx * window_width / self.dest.width,
+                dy=event.dy * window_height / self.dest.height))
+        return event
+
+    def mouse_pos(self):
+        """pygame.mouse.get_pos() in logical coordinates"""
+        pos = pygame.mouse.get_pos()
+        return self.to_logical(pos) if self.scaled else pos
+
+logical_display = LogicalDisplay()
@@ -0,0 +1,43 @@
+"""
+Full-screen overlays (the death flash, fades, the editor's dimmed backgrounds) drawn from
+surfaces that are kept between frames, used by game.py, game_gemini.py and the level
+editor.
+
+Each overlay colour gets one screen-sized opaque Surface, filled once; the strength of
+the effect is its surface alpha. A new Surface is only made when the display size
+changes, instead of a screen-sized allocation and fill on every frame.
+
+    from screen_effects import screen_effects
+    screen_effects.flash(screen, 200)       # White, mostly opaque
+    screen_effects.fade(screen, 128)        # Black, half transparent
+"""
+
+import pygame
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+class ScreenEffects:
+    def __init__(self):
+        self.overlays = {}  # Colour -> screen-sized Surface filled with it
+
+    def overlay(self, screen, color, alpha):
+        """Blend color over the whole screen at the given alpha (0-255) and return the blit rect"""
+        color = tuple(color)
+        surface = self.overlays.get(color)
+        if surface is None or surface.get_size() != screen.get_size():
+            surface = pygame.Surface(screen.get_size())
+            if pygame.display.get_surface():
+                surface = surface.convert()
+            surface.fill(color)
+            self.overlays[color] = surface
+        surface.set_alpha(alpha)
+        return screen.blit(surface, (0, 0))
+
+    def flash(self, screen, alpha, color=WHITE):
+        return self.overlay(screen, color, alpha)
+
+    def fade(self, screen, alpha, color=BLACK):
+        return self.overlay(screen, color, alpha)
+
+screen_effects = ScreenEffects()
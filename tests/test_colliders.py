@@ -0,0 +1,52 @@
+"""Coalesced colliders must play exactly like the level's own platforms."""
+
+import random
+
+import pygame
+import pytest
+
+import game
+import game_gemini
+
+LEVELS = [(world, level) for world in (1, 2, 3) for level in (1, 2, 3)]
+SEEDS = range(40)
+STEPS = 720
+INPUT_KEYS = [pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP]
+
+def play(headless, world, level, seed):
+    """Player positions after every step of a run with inputs re-randomized every 12 steps"""
+    rng = random.Random(seed * 7 + world * 3 + level)
+    trajectory = []
+    for step in range(STEPS):
+        if step % 12 == 0:
+            inputs = {key for key in INPUT_KEYS if rng.random() < 0.4}
+        state = headless.step(inputs)
+        trajectory.append([(player['x'], player['y']) for player in state['players']])
+    return trajectory
+
+def uncoalesced(headless, module):
+    """Make headless collide with the level's platforms as listed, in level order"""
+    headless.level_manager.platform_grid = module.PlatformGrid(headless.platforms)
+    return headless
+
+@pytest.mark.parametrize("world, level", LEVELS)
+def test_game_coalesced_trajectories_match_level_platforms(world, level):
+    for seed in SEEDS:
+        coalesced = game.HeadlessGame(world, level)
+        raw = uncoalesced(game.HeadlessGame(world, level, level_manager=game.LevelManager()), game)
+        assert play(coalesced, world, level, seed) == play(raw, world, level, seed), f"seed {seed}"
+
+@pytest.mark.parametrize("world, level", LEVELS)
+def test_gemini_coalesced_trajectories_match_level_platforms(world, level):
+    for seed in SEEDS:
+        coalesced = game_gemini.HeadlessGame(world, level)
+        raw = uncoalesced(game_gemini.HeadlessGame(world, level, level_manager=game_gemini.LevelManager()), game_gemini)
+        assert play(coalesced, world, level, seed) == play(raw, world, level, seed), f"seed {seed}"
+
+def test_colliders_keep_level_order():
+    # A wall listed before the floor must still be tested before it
+    platforms = [game.Platform(600, 300, 100, 20), game.Platform(0, 0, 20, 680),
+                 game.Platform(0, 680, 400, 40), game.Platform(400, 680, 400, 40)]
+    colliders, removed = game.coalesce_platforms(platforms)
+    assert removed == 1
+    assert [collider.parts[0][0] for collider in colliders] == [0, 1, 2]
@@ -0,0 +1,39 @@
+"""HeadlessGame must not touch the running game's state."""
+
+import pygame
+
+import game
+
+def particle_state(pool):
+    if not pool.enabled:
+        return None
+    return pool.life.tobytes(), pool.x.tobytes(), pool.rng.bit_generator.state
+
+def test_headless_game_leaves_the_game_globals_alone():
+    game.camera.x, game.camera.y = 300, -120
+    session_rng = game.session_rng.getstate()
+    particles = particle_state(game.particle_pool)
+    
+    headless = game.HeadlessGame(3, 3, seed=7)
+    # Kill a player on a spike and let the death animation run through its explosion
+    victim = headless.players[0]
+    victim.rect.midbottom = headless.spikes[0].rect.midbottom
+    victim.vel_x = victim.vel_y = 0
+    for _ in range(120):
+        headless.step({pygame.K_d, pygame.K_RIGHT})
+    assert headless.deaths >= 1
+    
+    assert (game.camera.x, game.camera.y) == (300, -120)
+    assert game.session_rng.getstate() == session_rng
+    assert particle_state(game.particle_pool) == particles
+    game.camera.reset()
+
+def test_headless_explosions_use_its_own_particles():
+    headless = game.HeadlessGame(1, 1, seed=7)
+    if not headless.particle_pool.enabled:
+        return  # No NumPy, no particles
+    headless.players[0].start_death_animation(headless.particle_pool, headless.camera)
+    for _ in range(80):
+        headless.step()
+    assert (headless.particle_pool.life > 0).any()
+    assert not (game.particle_pool.life > 0).any()
@@ -0,0 +1,65 @@
+"""Levels must stay playable with a classroom of players."""
+
+import pygame
+import pytest
+
+import game
+
+LEVELS = [(world, level) for world in (1, 2, 3) for level in (1, 2, 3)]
+
+def put_on(player, rect):
+    """Move player onto rect, standing still"""
+    player.rect.midbottom = rect.midbottom
+    player.vel_x = player.vel_y = 0
+
+def collect_all_coins(headless, player):
+    for coin in list(headless.coins):
+        put_on(player, coin.rect)
+        headless.step()
+
+def test_eight_players_can_finish_a_level():
+    headless = game.HeadlessGame(1, 1, num_players=8)
+    collect_all_coins(headless, headless.players[0])
+    assert headless.get_state()['coins_remaining'] == 0
+    
+    # Two players reaching the goal is enough; the other six never get there
+    first, second = headless.players[:2]
+    put_on(first, headless.goal.rect)
+    put_on(second, headless.goal.rect)
+    second.rect.x += 20  # Side by side, partly on the goal
+    state = headless.step()
+    assert all(not player.rect.colliderect(headless.goal.rect) for player in headless.players[2:])
+    assert state['level_complete']
+
+def test_two_players_both_have_to_reach_the_goal():
+    headless = game.HeadlessGame(1, 1, num_players=2)
+    collect_all_coins(headless, headless.players[0])
+    put_on(headless.players[0], headless.goal.rect)
+    assert not headless.step()['level_complete']
+    put_on(headless.players[1], headless.goal.rect)
+    headless.players[1].rect.x += 20
+    assert headless.step()['level_complete']
+
+def test_enough_players_enter_a_portal():
+    players = game.create_players(8)
+    portal = game.LevelPortal(800, 500, 1, 1)  # Away from where the players start
+    put_on(players[0], portal.rect)
+    portal.update(players)
+    assert not portal.enough_players_touching
+    put_on(players[1], portal.rect)
+    players[1].rect.x += 40
+    portal.update(players)
+    assert portal.enough_players_touching
+
+@pytest.mark.parametrize("world, level", LEVELS)
+def test_thirty_players_spawn_apart_inside_the_level(world, level):
+    headless = game.HeadlessGame(world, level, num_players=30)
+    bounds = headless.level_manager.level_bounds
+    spawns = [pygame.Rect(player.spawn_x, player.spawn_y, 40, 40) for player in headless.players]
+    for index, spawn in enumerate(spawns):
+        assert bounds.contains(spawn), f"player {index + 1} spawns outside the level"
+        assert spawn.collidelist(spawns[index + 1:]) == -1, f"player {index + 1} spawns on another player"
+    # The level's own spawns are where its author put them; the extra players' are free
+    platforms = [platform.rect for platform in headless.level_manager.collision_platforms]
+    for index, spawn in enumerate(spawns[2:], 2):
+        assert spawn.collidelist(platforms) == -1, f"player {index + 1} spawns inside a platform"
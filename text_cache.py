@@ -0,0 +1,55 @@
+"""
+Shared cache of rendered text, used by game.py, game_gemini.py and the level editor.
+
+HUD and menu text is mostly the same from one frame to the next, so font.render() is
+only called the first time a (font, text, colour, antialias) combination is drawn. The
+least recently used surfaces are dropped once the cache is full. The returned surfaces
+are shared: blit them, don't draw on them.
+
+    from text_cache import text_cache
+    screen.blit(text_cache.render(font, "Coins: 3/10", True, BLACK), (10, 10))
+    print(text_cache.hits, text_cache.misses)
+"""
+
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 512  # Rendered strings kept
+
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """font.render(text, antialias, color), from the cache when possible"""
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.surfaces[key] = font.render(text, antialias, color)
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Hit/miss counts and the hit rate, for checking the cache is doing its job"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.surfaces),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+text_cache = TextCache()